@@ -0,0 +1,270 @@
+"""
+Benchmark suite for the backtest pipeline on a synthetic universe.
+
+Times each stage of a V2 backtest separately, fully offline:
+    - fundamentals_ingest_cold: parse us-income-annual.csv and build the cache
+    - fundamentals_ingest_warm: memory-map the cached FundamentalsStore
+    - screener_setup:           Screener + momentum matrix for the universe
+    - selection:                value + multi-factor picks for every rebalance
+    - valuation:                daily valuation of both strategies (picks precomputed)
+    - backtest_annual / backtest_monthly: multi-factor selection + valuation end to end
+                                on the annual and on a monthly calendar
+    - backtest_shared:          value + multi-factor + SPY in one shared pass
+                                (strategies.run_strategies, annual calendar)
+    - backtest_monthly_asof:    the monthly run with fundamentals resolved as of
+                                each rebalance date (publish-date index)
+    - calc_metrics:             metrics for both strategies and SPY
+    - bootstrap:                BOOTSTRAP_PATHS block-bootstrap paths of both
+                                strategies and SPY (robustness.py, in-process)
+    - results_export:           Parquet results directory (daily values, metrics)
+    - excel_export:             backtest-results-v2.xlsx equivalent (write-only mode)
+    - chart_render:             backtest-charts-v2.png equivalent
+    - chart_render_many:        CHART_BATCH 40-year charts rendered in parallel workers
+
+Every stage runs --repeat times; min / median / all runs are appended as one
+JSON line to --output together with the universe size and environment, so
+results can be compared across commits.
+
+Usage:
+    python -m benchmarks.run_benchmarks --tickers 500 5000 --repeat 3
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from benchmarks.synthetic import MAX_TICKERS, SyntheticUniverse, write_simfin_csv
+from src.backtest import charts, engine, export
+from src.backtest.config import ANNUAL_INVESTMENT, NUM_STOCKS, REBALANCE_DATES
+from src.backtest.factors import FactorCache
+from src.backtest.fundamentals import FundamentalsStore
+from src.backtest.metrics import calc_metrics
+from src.backtest.robustness import bootstrap, return_matrix
+from src.backtest.run_backtest_v2 import plot_charts, run_spy_benchmark, save_results
+from src.backtest.schedule import period_investment, rebalance_schedule
+from src.backtest.strategies import run_strategies
+
+DEFAULT_OUTPUT = Path(__file__).resolve().parent / 'results.jsonl'
+STRATEGIES = {'Value-Only': 'select_value', 'Multi-Factor': 'select_multifactor'}
+CHART_BATCH = 8
+BOOTSTRAP_PATHS = 2000
+CHART_YEARS = 40
+
+
+def timed(func, repeat):
+    """Run func() repeat times; return (last result, list of wall times in seconds)."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return result, times
+
+
+def summarize(times, **extra):
+    stage = {'min': min(times), 'median': statistics.median(times), 'runs': times}
+    stage.update(extra)
+    return stage
+
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                             cwd=Path(__file__).resolve().parent, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_universe(num_tickers, seed=0, repeat=3, workdir=None):
+    """Run every stage for one synthetic universe and return {stage: timings}."""
+    universe = SyntheticUniverse(num_tickers, seed=seed)
+    workdir = Path(workdir)
+    csv_path = workdir / f'us-income-annual-{num_tickers}.csv'
+    write_simfin_csv(universe.income, csv_path)
+    cache_dir = workdir / f'cache-{num_tickers}'
+    stages = {}
+
+    # Fundamentals ingest: cold (CSV parse + cache write) and warm (mmap)
+    def ingest_cold():
+        for path in cache_dir.glob('*'):
+            path.unlink()
+        return FundamentalsStore.load(csv_path, cache_dir=cache_dir)
+
+    _, times = timed(ingest_cold, repeat)
+    stages['fundamentals_ingest_cold'] = summarize(times, rows=len(universe.income))
+    fundamentals, times = timed(lambda: FundamentalsStore.load(csv_path, cache_dir=cache_dir), repeat)
+    stages['fundamentals_ingest_warm'] = summarize(times)
+
+    data = universe.backtest_data(fundamentals)
+
+    def setup():
+        data.factors = FactorCache(data.prices)  # cold: no momentum computed yet
+        screener = data.screener()
+        screener.factors.precompute([screener.momentum_lookback])
+        return screener
+
+    screener, times = timed(setup, repeat)
+    stages['screener_setup'] = summarize(times)
+
+    # Selection per rebalance (dates mapped to trading days like the engine does)
+    positions = engine.rebalance_positions(data.prices.index, REBALANCE_DATES)
+    rebalance_days = data.prices.index[positions]
+
+    def select_all():
+        return {
+            name: {date: getattr(screener, method)(date, NUM_STOCKS) for date in rebalance_days}
+            for name, method in STRATEGIES.items()
+        }
+
+    picks, times = timed(select_all, repeat)
+    stages['selection'] = summarize(
+        times, rebalances=len(rebalance_days) * len(STRATEGIES),
+        per_rebalance=min(times) / (len(rebalance_days) * len(STRATEGIES)),
+    )
+
+    # Daily valuation with selection replaced by a lookup of the picks above
+    def value_all():
+        return {
+            name: engine.run_backtest(lambda prices_df, date, n, name=name: picks[name][date],
+                                      data.prices, name, REBALANCE_DATES, ANNUAL_INVESTMENT,
+                                      NUM_STOCKS, verbose=False)
+            for name in STRATEGIES
+        }
+
+    portfolios, times = timed(value_all, repeat)
+    stages['valuation'] = summarize(times, days=len(data.prices))
+
+    # Full selection + valuation per calendar (fundamentals cached per fiscal year)
+    for frequency in ('annual', 'monthly'):
+        calendar = rebalance_schedule(frequency)
+
+        def backtest(calendar=calendar, frequency=frequency):
+            return engine.run_backtest(lambda prices_df, date, n: screener.select_multifactor(date, n),
+                                       data.prices, frequency, calendar, period_investment(frequency),
+                                       NUM_STOCKS, verbose=False)
+
+        _, times = timed(backtest, repeat)
+        stages[f'backtest_{frequency}'] = summarize(times, rebalances=len(calendar))
+
+    def backtest_shared():
+        return run_strategies(data, {'Value-Only': 'value', 'Multi-Factor': 'multifactor'},
+                              {'S&P 500': data.spy}, base_screener=screener)
+
+    _, times = timed(backtest_shared, repeat)
+    stages['backtest_shared'] = summarize(times, rebalances=len(REBALANCE_DATES))
+
+    asof_screener = data.screener(asof=True)
+
+    def backtest_asof(calendar=calendar):
+        return engine.run_backtest(lambda prices_df, date, n: asof_screener.select_multifactor(date, n),
+                                   data.prices, 'monthly', calendar, period_investment('monthly'),
+                                   NUM_STOCKS, verbose=False)
+
+    _, times = timed(backtest_asof, repeat)
+    stages['backtest_monthly_asof'] = summarize(times, rebalances=len(calendar))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        spy_portfolio = run_spy_benchmark(data.spy)
+    value_portfolio, mf_portfolio = portfolios['Value-Only'], portfolios['Multi-Factor']
+
+    def metrics_all():
+        return (calc_metrics(value_portfolio, 'Value-Only'), calc_metrics(mf_portfolio, 'Multi-Factor'),
+                calc_metrics(spy_portfolio, 'S&P 500 (SPY)'))
+
+    (value_m, mf_m, spy_m), times = timed(metrics_all, repeat)
+    stages['calc_metrics'] = summarize(times)
+
+    returns = return_matrix({'Value-Only': value_portfolio, 'Multi-Factor': mf_portfolio, 'S&P 500': spy_portfolio})
+    _, times = timed(lambda: bootstrap(returns, BOOTSTRAP_PATHS, processes=1), repeat)
+    stages['bootstrap'] = summarize(times, paths=BOOTSTRAP_PATHS, days=len(returns))
+
+    results = (value_m, mf_m, spy_m, value_portfolio, mf_portfolio, spy_portfolio)
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, times = timed(lambda: save_results(*results, path=workdir / 'results'), repeat)
+        stages['results_export'] = summarize(times)
+    sheets = {
+        'Summary': pd.DataFrame([value_m, mf_m, spy_m]),
+        'Daily Values': pd.DataFrame({name: df['value'] for name, df in
+                                      zip(['Value-Only', 'Multi-Factor', 'S&P 500'], results[3:])}),
+    }
+    _, times = timed(lambda: export.write_excel(workdir / 'results.xlsx', sheets), repeat)
+    stages['excel_export'] = summarize(times)
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, times = timed(lambda: plot_charts(*results, path=workdir / 'charts.png'), repeat)
+        stages['chart_render'] = summarize(times)
+
+    # Long histories (sweep-style batch): downsampling plus parallel rendering
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('1985-01-01', periods=CHART_YEARS * 252)
+    names = list(STRATEGIES) + ['S&P 500']
+    metrics = [value_m, mf_m, spy_m]
+
+    def render_batch():
+        jobs = []
+        for i in range(CHART_BATCH):
+            walk = np.exp(np.cumsum(rng.normal(0.0003, 0.012, (len(dates), len(names))), axis=0))
+            daily = pd.DataFrame(1000 * walk, index=dates, columns=names)
+            chart = charts.prepare_chart(daily, metrics, invested=1000, benchmark='S&P 500')
+            jobs.append((chart, workdir / f'chart-{i}.png'))
+        return charts.render_many(jobs)
+
+    _, times = timed(render_batch, repeat)
+    stages['chart_render_many'] = summarize(times, charts=CHART_BATCH, days=len(dates))
+
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the backtest pipeline on synthetic data')
+    parser.add_argument('--tickers', nargs='+', type=int, default=[500],
+                        help=f'Universe sizes to benchmark (max {MAX_TICKERS})')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per stage')
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT,
+                        help='JSON Lines file the results are appended to')
+    args = parser.parse_args()
+
+    record = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'universes': {},
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for num_tickers in args.tickers:
+            print(f'\nBenchmarking {num_tickers} tickers...')
+            stages = bench_universe(num_tickers, args.seed, args.repeat, workdir)
+            record['universes'][str(num_tickers)] = stages
+            for name, stage in stages.items():
+                print(f'  {name:<26} min {stage["min"] * 1000:9.1f} ms   median {stage["median"] * 1000:9.1f} ms')
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+    print(f'\nResults appended to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
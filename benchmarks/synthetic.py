@@ -0,0 +1,205 @@
+"""
+Seeded synthetic universe for benchmarking the backtest pipeline offline.
+
+Generates everything load_backtest_data() would return, without network
+access or a SimFin download:
+    - a forward/back-filled (date x ticker) price matrix plus an SPY series
+    - a SimFin-format us-income-annual table (same columns, ';'-separated)
+    - optionally the matching us-shareprices-daily table
+    - the yfinance 2025 EPS fallback and current market caps
+
+Prices follow a one-factor random walk; fundamentals are scaled so that a
+realistic share of the universe passes the large-cap and P/E filters. The
+same seed always produces the same universe.
+"""
+import numpy as np
+import pandas as pd
+
+from src.backtest.config import DATA_START_DATE, END_DATE
+from src.backtest.data import BacktestData
+
+MAX_TICKERS = 5000
+
+# Column layout of SimFin's us-income-annual.csv
+SIMFIN_INCOME_COLUMNS = [
+    'Ticker', 'SimFinId', 'Currency', 'Fiscal Year', 'Fiscal Period', 'Report Date',
+    'Publish Date', 'Restated Date', 'Shares (Basic)', 'Shares (Diluted)', 'Revenue',
+    'Cost of Revenue', 'Gross Profit', 'Operating Expenses', 'Selling, General & Administrative',
+    'Research & Development', 'Depreciation & Amortization', 'Operating Income (Loss)',
+    'Non-Operating Income (Loss)', 'Interest Expense, Net', 'Pretax Income (Loss), Adj.',
+    'Abnormal Gains (Losses)', 'Pretax Income (Loss)', 'Income Tax (Expense) Benefit, Net',
+    'Income (Loss) from Continuing Operations', 'Net Extraordinary Gains (Losses)',
+    'Net Income', 'Net Income (Common)',
+]
+
+
+def make_tickers(n):
+    """n distinct ticker-like symbols (A, B, ..., Z, AA, AB, ...)."""
+    tickers = []
+    i = 0
+    while len(tickers) < n:
+        symbol = ''
+        k = i
+        while True:
+            symbol = chr(ord('A') + k % 26) + symbol
+            k = k // 26 - 1
+            if k < 0:
+                break
+        if symbol != 'SPY':
+            tickers.append(symbol)
+        i += 1
+    return tickers
+
+
+def make_prices(tickers, dates, rng, late_listing=0.05):
+    """
+    Daily closes for tickers: market factor + idiosyncratic noise.
+
+    A late_listing share of tickers has no prices before a random date, and
+    the matrix is then forward/back-filled like load_backtest_data() does.
+    Returns (prices, spy).
+    """
+    n_days, n_tickers = len(dates), len(tickers)
+    market = rng.normal(0.0004, 0.011, n_days)
+    beta = rng.normal(1.0, 0.3, n_tickers)
+    idio_vol = rng.uniform(0.01, 0.03, n_tickers)
+    log_returns = market[:, None] * beta + rng.standard_normal((n_days, n_tickers)) * idio_vol
+    start_price = rng.lognormal(np.log(80), 0.9, n_tickers)
+    values = start_price * np.exp(np.cumsum(log_returns, axis=0))
+
+    late = np.flatnonzero(rng.random(n_tickers) < late_listing)
+    listed = rng.integers(1, n_days, len(late))
+    for col, row in zip(late, listed):
+        values[:row, col] = np.nan
+
+    prices = pd.DataFrame(values, index=dates, columns=tickers).ffill().bfill()
+    spy = pd.Series(400 * np.exp(np.cumsum(market)), index=dates, name='SPY')
+    return prices, spy
+
+
+def make_income(tickers, prices, rng, first_year=2018, last_year=2024, missing=0.05):
+    """
+    SimFin-format annual income statements for every ticker and fiscal year.
+
+    EPS is tied to the year-end price through a lognormal P/E (with ~8%
+    loss-making rows), so P/E and market-cap screens behave like real data.
+    """
+    years = np.arange(first_year, last_year + 1)
+    n_tickers, n_years = len(tickers), len(years)
+
+    shares = rng.lognormal(np.log(6e8), 1.1, n_tickers)
+    share_drift = np.exp(np.cumsum(rng.normal(-0.01, 0.02, (n_tickers, n_years)), axis=1))
+    diluted = shares[:, None] * share_drift
+
+    # Year-end prices (years before the price history use the first price)
+    year_end = []
+    for year in years:
+        pos = prices.index.searchsorted(pd.Timestamp(f'{year}-12-31'), side='right') - 1
+        year_end.append(prices.to_numpy()[max(pos, 0)])
+    year_end = np.array(year_end).T
+
+    pe = rng.lognormal(np.log(22), 0.6, (n_tickers, n_years))
+    eps = year_end / pe
+    eps = np.where(rng.random((n_tickers, n_years)) < 0.08, -0.3 * eps, eps)
+    net_income = eps * diluted
+
+    margin = rng.uniform(0.05, 0.3, (n_tickers, 1))
+    revenue = np.abs(net_income) / margin
+    gross = revenue * rng.uniform(0.3, 0.7, (n_tickers, 1))
+    opex = gross - net_income * 1.3
+    pretax = net_income * 1.25
+
+    ticker_col = np.repeat(np.asarray(tickers, dtype=object), n_years)
+    year_col = np.tile(years, n_tickers)
+    report = pd.to_datetime([f'{y}-12-31' for y in year_col])
+    publish = report + pd.to_timedelta(rng.integers(30, 90, len(year_col)), unit='D')
+    restated = publish + pd.to_timedelta(365, unit='D')
+
+    df = pd.DataFrame({
+        'Ticker': ticker_col,
+        'SimFinId': np.repeat(np.arange(n_tickers) + 10000, n_years),
+        'Currency': 'USD',
+        'Fiscal Year': year_col,
+        'Fiscal Period': 'FY',
+        'Report Date': report.strftime('%Y-%m-%d'),
+        'Publish Date': publish.strftime('%Y-%m-%d'),
+        'Restated Date': restated.strftime('%Y-%m-%d'),
+        'Shares (Basic)': np.round(diluted.ravel() * 0.99),
+        'Shares (Diluted)': np.round(diluted.ravel()),
+        'Revenue': np.round(revenue.ravel()),
+        'Cost of Revenue': -np.round((revenue - gross).ravel()),
+        'Gross Profit': np.round(gross.ravel()),
+        'Operating Expenses': -np.round(opex.ravel()),
+        'Selling, General & Administrative': -np.round(opex.ravel() * 0.6),
+        'Research & Development': -np.round(opex.ravel() * 0.3),
+        'Depreciation & Amortization': -np.round(opex.ravel() * 0.1),
+        'Operating Income (Loss)': np.round((gross - opex).ravel()),
+        'Non-Operating Income (Loss)': 0.0,
+        'Interest Expense, Net': -np.round(((gross - opex) - pretax).ravel()),
+        'Pretax Income (Loss), Adj.': np.round(pretax.ravel()),
+        'Abnormal Gains (Losses)': 0.0,
+        'Pretax Income (Loss)': np.round(pretax.ravel()),
+        'Income Tax (Expense) Benefit, Net': -np.round((pretax - net_income).ravel()),
+        'Income (Loss) from Continuing Operations': np.round(net_income.ravel()),
+        'Net Extraordinary Gains (Losses)': 0.0,
+        'Net Income': np.round(net_income.ravel()),
+        'Net Income (Common)': np.round(net_income.ravel()),
+    }, columns=SIMFIN_INCOME_COLUMNS)
+
+    # Not every company files every year
+    return df[rng.random(len(df)) >= missing].reset_index(drop=True)
+
+
+def make_shareprices(prices):
+    """SimFin-format us-shareprices-daily rows (sorted by ticker, then date)."""
+    n_days, n_tickers = prices.shape
+    close = prices.to_numpy().T.ravel()
+    return pd.DataFrame({
+        'Ticker': np.repeat(np.asarray(prices.columns, dtype=object), n_days),
+        'SimFinId': np.repeat(np.arange(n_tickers) + 10000, n_days),
+        'Date': np.tile(prices.index.strftime('%Y-%m-%d'), n_tickers),
+        'Open': close,
+        'High': close,
+        'Low': close,
+        'Close': close,
+        'Adj. Close': close,
+        'Volume': 1e6,
+        'Dividend': np.nan,
+        'Shares Outstanding': np.nan,
+    })
+
+
+def write_simfin_csv(df, path):
+    """Write a table the way SimFin ships its bulk files (';'-separated)."""
+    df.to_csv(path, sep=';', index=False)
+
+
+class SyntheticUniverse:
+    """Prices, SimFin income table and yfinance snapshots for one seed."""
+
+    def __init__(self, num_tickers=500, seed=0, start=DATA_START_DATE, end=END_DATE):
+        if not 0 < num_tickers <= MAX_TICKERS:
+            raise ValueError(f'num_tickers must be between 1 and {MAX_TICKERS}')
+        rng = np.random.default_rng(seed)
+        self.num_tickers = num_tickers
+        self.seed = seed
+        self.tickers = make_tickers(num_tickers)
+        self.dates = pd.bdate_range(start, end)
+        self.prices, self.spy = make_prices(self.tickers, self.dates, rng)
+        self.income = make_income(self.tickers, self.prices, rng)
+
+        # yfinance snapshots: 2025 EPS and current market caps for most tickers
+        last = self.prices.iloc[-1].to_numpy()
+        latest_shares = self.income.drop_duplicates('Ticker', keep='last').set_index('Ticker')['Shares (Diluted)']
+        latest_shares = latest_shares.reindex(self.tickers).to_numpy()
+        eps_2025 = last / rng.lognormal(np.log(22), 0.6, num_tickers)
+        has_eps = rng.random(num_tickers) < 0.85
+        has_cap = (rng.random(num_tickers) < 0.95) & ~np.isnan(latest_shares)
+        self.eps_2025 = {t: {'eps': float(e), 'year': 2025}
+                         for t, e, ok in zip(self.tickers, eps_2025, has_eps) if ok}
+        self.market_caps = {t: float(p * s)
+                            for t, p, s, ok in zip(self.tickers, last, latest_shares, has_cap) if ok}
+
+    def backtest_data(self, fundamentals):
+        """BacktestData over this universe with an already loaded FundamentalsStore."""
+        return BacktestData(self.prices, self.spy, fundamentals, self.eps_2025, self.market_caps)
@@ -6,10 +6,14 @@ The Multi-Factor strategy requires EPS growth, which needs two consecutive
 years of data (e.g., FY2019 and FY2020 for April 2021 rebalancing).
 """
 import pandas as pd
+import sys
 from pathlib import Path
 import requests
 from io import StringIO
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.data_collection.simfin_reader import read_simfin
+
 # Load SimFin data
 SIMFIN_DATA_DIR = Path.home() / 'simfin_data'
 simfin_file = SIMFIN_DATA_DIR / 'us-income-annual.csv'
@@ -18,7 +22,7 @@ print('='*60)
 print('SIMFIN DATA COVERAGE ANALYSIS')
 print('='*60)
 
-df = pd.read_csv(simfin_file, sep=';')
+df = read_simfin(simfin_file)
 print(f'\nLoaded {len(df)} records for {df["Ticker"].nunique()} tickers')
 
 # Count records per fiscal year
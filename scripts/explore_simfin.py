@@ -23,8 +23,12 @@ print('=== SimFin Data Exploration ===\n')
 # The simfin package has compatibility issues with newer pandas
 # Let's read the downloaded CSV files directly
 import glob
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.data_collection.simfin_reader import read_columns, read_simfin
+
 data_dir = Path.home() / 'simfin_data'
 print(f'Data directory: {data_dir}')
 print(f'Files found: {list(data_dir.glob("*.csv")) if data_dir.exists() else "None"}')
@@ -33,9 +37,14 @@ print(f'Files found: {list(data_dir.glob("*.csv")) if data_dir.exists() else "No
 income_file = data_dir / 'us-income-annual.csv'
 if income_file.exists():
     print(f'\nLoading income data from: {income_file}')
-    df_income = pd.read_csv(income_file, sep=';')
-    print(f'Shape: {df_income.shape}')
-    print(f'Columns: {list(df_income.columns)}')
+    # Only the columns used below, read in typed chunks
+    columns = read_columns(income_file)
+    df_income = read_simfin(income_file, columns=[
+        c for c in ['Ticker', 'Fiscal Year', 'Report Date', 'Revenue', 'Net Income', 'Shares (Diluted)']
+        if c in columns
+    ])
+    print(f'Shape: ({len(df_income)}, {len(columns)})')
+    print(f'Columns: {columns}')
 
     # Check date range
     if 'Fiscal Year' in df_income.columns:
@@ -82,7 +91,8 @@ print('='*60)
 prices_file = data_dir / 'us-shareprices-daily.csv'
 if prices_file.exists():
     print(f'Share prices file exists: {prices_file}')
-    # Don't load it all - it's huge
+    # Don't load it all - it's huge. To use it as a backtest price source,
+    # stream it into a price store with: python -m src.data_collection.simfin_prices
     df_prices_sample = pd.read_csv(prices_file, sep=';', nrows=1000)
     print(f'Sample columns: {list(df_prices_sample.columns)}')
     print(f'Sample tickers: {df_prices_sample["Ticker"].unique()[:10]}')
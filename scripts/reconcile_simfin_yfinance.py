@@ -0,0 +1,224 @@
+"""
+Reconcile SimFin EPS against yfinance for every ticker in the universe.
+
+test_data_sources.py spot-checks ten tickers. This job compares every
+overlapping fiscal year of every ticker (the S&P 500 by default) and writes
+the result as one columnar discrepancy table:
+
+    python scripts/reconcile_simfin_yfinance.py                # S&P 500
+    python scripts/reconcile_simfin_yfinance.py --all-simfin   # every SimFin ticker
+    python scripts/reconcile_simfin_yfinance.py --offline      # cached statements only
+
+SimFin EPS (Net Income / diluted shares) comes from the cached
+FundamentalsStore, i.e. the CSV is grouped into a (ticker x fiscal year)
+matrix once. yfinance income statements are fetched with fetch.fetch_all
+(concurrent, rate limited, retried) and kept in a Parquet cache, written
+after every batch; later runs only fetch tickers that are missing or older
+than --max-age days. The two sources are joined with one array lookup and
+the differences computed column-wise, using the same rules as
+test_data_sources.compare_eps.
+"""
+import argparse
+import sys
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from pathlib import Path
+warnings.filterwarnings('ignore')
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.backtest.config import CACHE_DIR, SIMFIN_INCOME_FILE
+from src.backtest.fetch import DEFAULT_RATE, DEFAULT_WORKERS, fetch_all, report_errors
+from src.backtest.fundamentals import FundamentalsStore
+
+YF_ROWS = {'Basic EPS': 'basic_eps', 'Diluted EPS': 'diluted_eps', 'Net Income': 'net_income',
+           'Diluted Average Shares': 'diluted_shares'}
+CACHE_COLUMNS = ['ticker', 'period_end'] + list(YF_ROWS.values()) + ['fetched']
+BATCH = 100  # tickers fetched between cache writes
+MAX_AGE_DAYS = 30
+TOLERANCE = 0.15
+
+
+# =============================================================================
+# yfinance income statements (cached)
+# =============================================================================
+
+def load_yf_cache(path):
+    """Cached statement rows; tickers without data have one row with no period_end."""
+    path = Path(path)
+    cache = pd.read_parquet(path) if path.exists() else pd.DataFrame(columns=CACHE_COLUMNS)
+    # An empty frame has object columns; reconcile() needs .dt on period_end
+    return cache.assign(period_end=pd.to_datetime(cache['period_end']), fetched=pd.to_datetime(cache['fetched']))
+
+
+def fetch_income_rows(ticker):
+    """Annual EPS / net income / shares rows of one ticker from yfinance."""
+    import yfinance as yf
+    income = yf.Ticker(ticker).income_stmt
+    if income is None or income.empty:
+        return []
+    rows = income.reindex(list(YF_ROWS)).T
+    return [{'period_end': date, **{YF_ROWS[k]: float(v) if pd.notna(v) else np.nan for k, v in values.items()}}
+            for date, values in rows.iterrows()]
+
+
+def update_yf_cache(path, tickers, max_age_days=MAX_AGE_DAYS, **fetch_kwargs):
+    """Fetch statements for tickers missing from the cache (or stale) and return the cache."""
+    path = Path(path)
+    cache = load_yf_cache(path)
+    fetched = cache.groupby('ticker')['fetched'].max() if len(cache) else pd.Series(dtype='datetime64[ns]')
+    cutoff = pd.Timestamp.now() - pd.Timedelta(days=max_age_days)
+    todo = [t for t in tickers if t not in fetched.index or fetched[t] < cutoff]
+    print(f'  {len(tickers) - len(todo)} tickers cached, {len(todo)} to fetch')
+
+    for start in range(0, len(todo), BATCH):
+        batch = todo[start:start + BATCH]
+        results, errors = fetch_all(batch, fetch_income_rows, progress_every=0, **fetch_kwargs)
+        report_errors(errors)
+        now = pd.Timestamp(datetime.now())
+        frames = []
+        for ticker in batch:
+            if ticker in errors:
+                continue
+            rows = results.get(ticker) or [{'period_end': pd.NaT}]
+            frames.append(pd.DataFrame(rows).assign(ticker=ticker, fetched=now))
+        if not frames:
+            continue
+        fresh = pd.concat(frames, ignore_index=True).reindex(columns=CACHE_COLUMNS)
+        cache = pd.concat([cache[~cache['ticker'].isin(fresh['ticker'])], fresh], ignore_index=True)
+        cache['period_end'] = pd.to_datetime(cache['period_end'])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        cache.to_parquet(path, compression='zstd', index=False)
+        print(f'  Fetched {min(start + BATCH, len(todo))}/{len(todo)}')
+    return cache
+
+
+# =============================================================================
+# Reconciliation
+# =============================================================================
+
+def diff_pct(simfin, yfinance):
+    """
+    Relative difference in percent of the yfinance value: 0 when both are
+    zero, 100 when only one is (as in test_data_sources.compare_eps).
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        diff = np.abs(simfin - yfinance) / np.abs(yfinance) * 100
+    one_zero = (simfin == 0) != (yfinance == 0)
+    diff = np.where(one_zero, 100.0, diff)
+    return np.where((simfin == 0) & (yfinance == 0), 0.0, diff)
+
+
+def reconcile(store, statements, tickers, tolerance=TOLERANCE):
+    """
+    One row per (ticker, fiscal year) present in both sources: SimFin EPS,
+    yfinance basic / diluted EPS and their differences. The fiscal year of a
+    yfinance statement is the year of its period end.
+    """
+    yf_rows = statements[statements['ticker'].isin(tickers) & statements['period_end'].notna()
+                         & statements['basic_eps'].notna()]
+    yf_rows = yf_rows.assign(fiscal_year=yf_rows['period_end'].dt.year.astype(np.int64))
+    yf_rows = yf_rows.drop_duplicates(['ticker', 'fiscal_year'], keep='last')
+
+    rows = store.rows_for(list(yf_rows['ticker']))
+    cols = yf_rows['fiscal_year'].to_numpy() - store.first_year
+    found = (rows >= 0) & (cols >= 0) & (cols < len(store.years))
+    found[found] = np.asarray(store.valid)[rows[found], cols[found]]
+    simfin_eps = np.full(len(rows), np.nan)
+    simfin_eps[found] = np.asarray(store.eps)[rows[found], cols[found]]
+
+    table = pd.DataFrame({
+        'ticker': yf_rows['ticker'].to_numpy(),
+        'fiscal_year': yf_rows['fiscal_year'].to_numpy(),
+        'period_end': yf_rows['period_end'].to_numpy(),
+        'simfin_eps': simfin_eps,
+        'yf_basic_eps': yf_rows['basic_eps'].to_numpy(dtype=np.float64),
+        'yf_diluted_eps': yf_rows['diluted_eps'].to_numpy(dtype=np.float64),
+    })[found]
+    table['diff_pct'] = diff_pct(table['simfin_eps'].to_numpy(), table['yf_basic_eps'].to_numpy())
+    table['diff_pct_diluted'] = diff_pct(table['simfin_eps'].to_numpy(), table['yf_diluted_eps'].to_numpy())
+    table['passed'] = table['diff_pct'] <= tolerance * 100
+    return table.sort_values(['ticker', 'fiscal_year'], ignore_index=True)
+
+
+def print_summary(table, tickers, store, statements):
+    print('\n' + '=' * 70)
+    print('RECONCILIATION SUMMARY: SimFin vs yfinance')
+    print('=' * 70)
+    in_simfin = set(store.tickers)
+    with_yf = set(statements.loc[statements['period_end'].notna(), 'ticker'])
+    print(f'Universe:            {len(tickers)} tickers')
+    print(f'  no SimFin data:    {sum(t not in in_simfin for t in tickers)}')
+    print(f'  no yfinance data:  {sum(t not in with_yf for t in tickers)}')
+    print(f'  compared:          {table["ticker"].nunique()}')
+    if not len(table):
+        return
+    passed = table['passed'].mean() * 100
+    print(f'Ticker-years:        {len(table)} ({passed:.1f}% within tolerance)')
+    print(f'Tickers all passing: {table.groupby("ticker")["passed"].all().mean() * 100:.1f}%')
+
+    print('\nBy fiscal year:')
+    by_year = table.groupby('fiscal_year').agg(rows=('passed', 'size'), passed=('passed', 'mean'),
+                                               median_diff=('diff_pct', 'median'))
+    for row in by_year.itertuples():
+        print(f'  {row.Index}: {row.rows:5d} rows, {row.passed * 100:5.1f}% pass, '
+              f'median diff {row.median_diff:.1f}%')
+
+    print('\nLargest discrepancies:')
+    for _, row in table.nlargest(10, 'diff_pct').iterrows():
+        print(f'  {row["ticker"]:<6} {row["fiscal_year"]}: SimFin=${row["simfin_eps"]:.2f}, '
+              f'yfinance=${row["yf_basic_eps"]:.2f}, diff={row["diff_pct"]:.1f}%')
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def main():
+    from src.backtest.data import load_sp500_tickers
+
+    parser = argparse.ArgumentParser(description='Reconcile SimFin EPS against yfinance for a whole universe')
+    parser.add_argument('--tickers', nargs='+', default=None, help='Explicit tickers (default: S&P 500)')
+    parser.add_argument('--all-simfin', action='store_true', help='Every ticker in the SimFin file')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='Allowed relative difference')
+    parser.add_argument('--max-age', type=float, default=MAX_AGE_DAYS, help='Re-fetch cached statements older than this (days)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help='yfinance requests per second')
+    parser.add_argument('--offline', action='store_true', help='Use cached statements only')
+    parser.add_argument('--simfin-file', type=Path, default=SIMFIN_INCOME_FILE)
+    parser.add_argument('--cache-dir', type=Path, default=CACHE_DIR)
+    parser.add_argument('--output', type=Path, default=Path('simfin-yfinance-reconciliation.parquet'))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    print('Loading SimFin fundamentals...')
+    store = FundamentalsStore.load(args.simfin_file)
+    if args.tickers:
+        tickers = args.tickers
+    elif args.all_simfin:
+        tickers = list(store.tickers)
+    else:
+        tickers = load_sp500_tickers(args.cache_dir, offline=args.offline)
+    print(f'  {len(store)} SimFin tickers, {len(tickers)} to reconcile')
+
+    print('\nLoading yfinance income statements...')
+    cache_path = args.cache_dir / 'yf_income_stmt.parquet'
+    if args.offline:
+        statements = load_yf_cache(cache_path)
+    else:
+        statements = update_yf_cache(cache_path, tickers, args.max_age, max_workers=args.workers, rate=args.rate)
+    if not statements['period_end'].notna().any():
+        print('  no cached statements, run without --offline' if args.offline
+              else '  no yfinance statements could be fetched')
+        return
+
+    table = reconcile(store, statements, tickers, args.tolerance)
+    table.to_parquet(args.output, compression='zstd', index=False)
+    print_summary(table, tickers, store, statements)
+    print(f'\nDiscrepancy table saved to {args.output} ({time.perf_counter() - start:.1f}s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -4,11 +4,15 @@ for overlapping years.
 """
 import pandas as pd
 import numpy as np
+import sys
 import yfinance as yf
 from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.data_collection.simfin_reader import read_simfin
+
 # Load SimFin data
 SIMFIN_DATA_DIR = Path.home() / 'simfin_data'
 SIMFIN_INCOME_FILE = SIMFIN_DATA_DIR / 'us-income-annual.csv'
@@ -17,7 +21,7 @@ def load_simfin_data():
     """Load SimFin income statement data."""
     if not SIMFIN_INCOME_FILE.exists():
         raise FileNotFoundError(f"SimFin data not found at {SIMFIN_INCOME_FILE}")
-    return pd.read_csv(SIMFIN_INCOME_FILE, sep=';')
+    return read_simfin(SIMFIN_INCOME_FILE)
 
 def get_simfin_eps(df, ticker):
     """Get EPS by year from SimFin data."""
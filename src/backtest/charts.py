@@ -0,0 +1,304 @@
+"""
+Headless, downsampled chart rendering for backtest results.
+
+The 2x2 results figure (portfolio value, annual returns, drawdown, key
+metrics) is built in two steps:
+
+    chart = prepare_chart(daily, metrics, invested=5000)   # cheap, picklable
+    render(chart, 'backtest-charts-v2.png')
+
+prepare_chart() does all the number crunching on the full daily history and
+then downsamples the value and drawdown lines for display with LTTB
+(largest-triangle-three-buckets), which keeps the visual shape of a series
+with a fixed number of points. The peak and trough of every series' maximum
+drawdown are always kept, so the worst drawdown is drawn at its true depth.
+
+Rendering uses the Agg canvas directly (no pyplot, no GUI backend). A
+ChartRenderer builds its figure once and afterwards only swaps data into the
+existing artists, so rendering many charts reuses the same figure, and
+render_many() spreads a list of charts over worker processes that each keep
+their own renderer.
+"""
+import multiprocessing
+import os
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PolyCollection
+from matplotlib.dates import date2num
+from matplotlib.figure import Figure
+
+MAX_POINTS = 1000
+DPI = 150
+FIGSIZE = (14, 10)
+COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f']
+METRIC_LABELS = [('cagr', 'CAGR (%)'), ('sharpe', 'Sharpe Ratio'), ('max_dd', 'Max DD (%)')]
+
+
+# =============================================================================
+# Downsampling
+# =============================================================================
+
+def lttb(x, y, num_points):
+    """
+    Indices of the num_points samples of (x, y) chosen by largest-triangle-
+    three-buckets. The first and last points are always kept.
+    """
+    n = len(y)
+    if num_points >= n or num_points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+
+    # Interior points split into num_points - 2 buckets
+    edges = np.linspace(1, n - 1, num_points - 1).astype(np.int64)
+    # Next-bucket averages; the last bucket looks ahead to the final point
+    csx = np.concatenate(([0.0], np.cumsum(x)))
+    csy = np.concatenate(([0.0], np.cumsum(y)))
+    starts = np.append(edges[1:-1], n - 1)
+    ends = np.append(edges[2:], n)
+    avg_x = (csx[ends] - csx[starts]) / (ends - starts)
+    avg_y = (csy[ends] - csy[starts]) / (ends - starts)
+
+    selected = np.empty(num_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(num_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        bx, by = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - avg_x[i]) * (by - y[a]) - (x[a] - bx) * (avg_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def drawdown_points(values):
+    """Positions of the peak and trough of the maximum drawdown of values."""
+    values = np.asarray(values, dtype=np.float64)
+    peak_values = np.fmax.accumulate(values)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown = np.where(peak_values > 0, values / peak_values - 1, 0.0)
+    trough = int(np.nanargmin(drawdown)) if len(values) else 0
+    peak = int(np.nanargmax(values[:trough + 1])) if len(values) else 0
+    return np.array([peak, trough])
+
+
+def downsample(frame, max_points=MAX_POINTS, keep=()):
+    """
+    Rows of frame to draw: the union of each column's LTTB selection plus
+    the positions in keep. Short frames are returned unchanged.
+    """
+    n = len(frame)
+    if n <= max_points:
+        return frame
+    x = date2num(frame.index)
+    per_column = max(3, max_points // max(1, frame.shape[1]))
+    rows = [lttb(x, frame[col].to_numpy(), per_column) for col in frame.columns]
+    rows.append(np.asarray(keep, dtype=np.int64))
+    return frame.iloc[np.unique(np.concatenate(rows))]
+
+
+# =============================================================================
+# Chart data
+# =============================================================================
+
+def annual_returns(daily):
+    """Return (%) per calendar year for each column, first to last day of the year."""
+    years = daily.index.year
+    starts = np.flatnonzero(np.r_[True, years[1:] != years[:-1]])
+    ends = np.r_[starts[1:], len(daily)] - 1
+    valid = ends > starts
+    values = daily.to_numpy(dtype=np.float64)
+    returns = (values[ends[valid]] / values[starts[valid]] - 1) * 100
+    return pd.DataFrame(returns, index=years[starts[valid]], columns=daily.columns)
+
+
+def prepare_chart(daily, metrics, invested=None, title='Portfolio Value Over Time', benchmark=None,
+                  max_points=MAX_POINTS):
+    """
+    Everything the results figure needs, computed from the full history.
+
+    daily is a (date x series) frame of portfolio values and metrics the
+    matching calc_metrics rows. invested draws a horizontal 'Total Invested'
+    line; the benchmark column is drawn dashed. Returns a dict of small
+    arrays that is cheap to send to a worker process.
+    """
+    daily = daily.astype(np.float64)
+    names = [str(col) for col in daily.columns]
+    values = daily.to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        peaks = np.fmax.accumulate(values, axis=0)
+        drawdown = pd.DataFrame(np.where(peaks > 0, (values - peaks) / peaks * 100, 0.0),
+                                index=daily.index, columns=daily.columns)
+
+    keep = np.concatenate([drawdown_points(values[:, i]) for i in range(values.shape[1])]) \
+        if values.shape[1] else np.array([], dtype=np.int64)
+    shown = downsample(daily, max_points, keep)
+    shown_drawdown = downsample(drawdown, max_points, keep)
+
+    returns = annual_returns(daily)
+    return {
+        'names': names,
+        'title': title,
+        'invested': invested,
+        'benchmark': None if benchmark is None else str(benchmark),
+        'value_x': date2num(shown.index),
+        'values': shown.to_numpy().T,
+        'drawdown_x': date2num(shown_drawdown.index),
+        'drawdowns': shown_drawdown.to_numpy().T,
+        'years': [str(year) for year in returns.index],
+        'annual_returns': returns.to_numpy().T,
+        'metrics': np.array([[m[key] if key != 'max_dd' else abs(m[key]) for key, _ in METRIC_LABELS]
+                             for m in metrics], dtype=np.float64),
+    }
+
+
+# =============================================================================
+# Rendering
+# =============================================================================
+
+class ChartRenderer:
+    """
+    The 2x2 results figure on an Agg canvas, built once and reused.
+
+    Lines, drawdown fills and axis formatting are created the first time a
+    given set of series is rendered; later charts with the same series only
+    update artist data. Bar panels are redrawn each time (a handful of bars).
+    """
+
+    def __init__(self, dpi=DPI, figsize=FIGSIZE):
+        self.dpi = dpi
+        self.figure = Figure(figsize=figsize)
+        FigureCanvasAgg(self.figure)
+        axes = self.figure.subplots(2, 2)
+        self.value_ax, self.returns_ax = axes[0]
+        self.drawdown_ax, self.metrics_ax = axes[1]
+        self.layout = None  # (names, benchmark) the artists were built for
+
+    def _build(self, names, benchmark):
+        ax = self.value_ax
+        ax.clear()
+        self.value_lines = [
+            ax.plot([], [], label=name, linewidth=2, color=COLORS[i % len(COLORS)],
+                    linestyle='--' if name == benchmark else '-')[0]
+            for i, name in enumerate(names)
+        ]
+        self.invested_line = ax.axhline(y=0, color='gray', linestyle=':', alpha=0.7)
+        ax.set_xlabel('Date')
+        ax.set_ylabel('Portfolio Value ($)')
+        ax.grid(True, alpha=0.3)
+        ax.xaxis_date()
+
+        ax = self.drawdown_ax
+        ax.clear()
+        self.drawdown_fills = []
+        self.drawdown_lines = []
+        for i, name in enumerate(names):
+            color = COLORS[i % len(COLORS)]
+            # Filled area under the drawdown line; render() sets its vertices
+            fill = PolyCollection([], alpha=0.3, label=name, facecolor=color, edgecolor=color)
+            self.drawdown_fills.append(ax.add_collection(fill, autolim=False))
+            self.drawdown_lines.append(ax.plot([], [], color=color, linewidth=0.5)[0])
+        ax.set_title('Drawdown Over Time', fontsize=12, fontweight='bold')
+        ax.set_xlabel('Date')
+        ax.set_ylabel('Drawdown (%)')
+        ax.legend(loc='lower left')
+        ax.grid(True, alpha=0.3)
+        ax.xaxis_date()
+        self.layout = (tuple(names), benchmark)
+
+    def _bars(self, ax, labels, heights, names):
+        """Grouped bars: one group per label, one bar per series."""
+        ax.clear()
+        x = np.arange(len(labels))
+        width = 0.75 / max(1, len(names))
+        offset = (np.arange(len(names)) - (len(names) - 1) / 2) * width
+        for i, name in enumerate(names):
+            ax.bar(x + offset[i], heights[i], width, label=name, color=COLORS[i % len(COLORS)])
+        step = max(1, -(-len(labels) // 12))  # at most ~12 labelled groups
+        ax.set_xticks(x[::step])
+        ax.set_xticklabels(labels[::step])
+        ax.legend()
+        ax.grid(True, alpha=0.3, axis='y')
+
+    def render(self, chart, path):
+        """Draw chart (see prepare_chart) and save it to path."""
+        names = chart['names']
+        if self.layout != (tuple(names), chart['benchmark']):
+            self._build(names, chart['benchmark'])
+
+        ax = self.value_ax
+        for line, y in zip(self.value_lines, chart['values']):
+            line.set_data(chart['value_x'], y)
+        invested = chart['invested']
+        self.invested_line.set_visible(invested is not None)
+        if invested is not None:
+            self.invested_line.set_ydata([invested, invested])
+            self.invested_line.set_label(f'Total Invested (${invested:,.0f})')
+        else:
+            self.invested_line.set_label('_invested')
+        ax.set_title(chart['title'], fontsize=12, fontweight='bold')
+        ax.relim()
+        ax.autoscale_view()
+        ax.set_ylim(bottom=0)
+        ax.legend(loc='upper left')
+
+        ax = self.drawdown_ax
+        x = chart['drawdown_x']
+        for fill, line, y in zip(self.drawdown_fills, self.drawdown_lines, chart['drawdowns']):
+            fill.set_verts([np.column_stack([np.r_[x, x[::-1]], np.r_[y, np.zeros(len(x))]])])
+            line.set_data(x, y)
+        ax.relim()
+        ax.autoscale_view()
+
+        self._bars(self.returns_ax, chart['years'], chart['annual_returns'], names)
+        self.returns_ax.set_title('Annual Returns by Year', fontsize=12, fontweight='bold')
+        self.returns_ax.set_xlabel('Year')
+        self.returns_ax.set_ylabel('Return (%)')
+        self.returns_ax.axhline(y=0, color='black', linestyle='-', linewidth=0.5)
+
+        self._bars(self.metrics_ax, [label for _, label in METRIC_LABELS], chart['metrics'], names)
+        self.metrics_ax.set_title('Key Performance Metrics', fontsize=12, fontweight='bold')
+
+        self.figure.tight_layout()
+        self.figure.savefig(path, dpi=self.dpi, bbox_inches='tight')
+        return path
+
+
+# One renderer per process, created on first use
+_renderer = None
+
+
+def get_renderer(dpi=DPI):
+    """This process's shared ChartRenderer."""
+    global _renderer
+    if _renderer is None or _renderer.dpi != dpi:
+        _renderer = ChartRenderer(dpi)
+    return _renderer
+
+
+def render(chart, path, dpi=DPI):
+    """Render one prepared chart with the shared renderer."""
+    return get_renderer(dpi).render(chart, path)
+
+
+def _init_worker(dpi):
+    get_renderer(dpi)
+
+
+def _render_worker(job):
+    chart, path, dpi = job
+    return render(chart, path, dpi)
+
+
+def render_many(jobs, processes=None, dpi=DPI):
+    """
+    Render (chart, path) pairs, in parallel worker processes when there is
+    more than one core and more than one chart. Returns the paths in order.
+    """
+    jobs = [(chart, path, dpi) for chart, path in jobs]
+    processes = min(processes or os.cpu_count() or 1, len(jobs))
+    if processes <= 1:
+        return [_render_worker(job) for job in jobs]
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(dpi,)) as pool:
+        return pool.map(_render_worker, jobs, chunksize=max(1, len(jobs) // (processes * 4)))
@@ -0,0 +1,30 @@
+"""
+Configuration for the V2 backtest (real SimFin + yfinance data).
+
+Shared by run_backtest_v2.py and the tools built on the same data (parameter
+sweeps, sessions), so they all run the same experiment unless told otherwise.
+"""
+from pathlib import Path
+
+DATA_START_DATE = '2020-06-01'  # Start earlier for momentum calculation
+BACKTEST_START_DATE = '2021-01-01'
+END_DATE = '2026-01-22'
+ANNUAL_INVESTMENT = 1000.0
+NUM_STOCKS = 25
+
+REBALANCE_DATES = [
+    '2021-04-01',  # April rebalancing - annual reports available by then
+    '2022-04-01',
+    '2023-04-03',  # April 1-2 were weekend
+    '2024-04-01',
+    '2025-04-01',
+]
+
+# Screening rules
+MIN_MARKET_CAP = 10e9  # Large cap ($10B+)
+PE_MULTIPLIER = 0.5  # P/E < 0.5 * Market Cap (billions)
+MOMENTUM_LOOKBACK = 126  # ~6 months of trading days
+
+SIMFIN_DATA_DIR = Path.home() / 'simfin_data'
+SIMFIN_INCOME_FILE = SIMFIN_DATA_DIR / 'us-income-annual.csv'
+CACHE_DIR = Path.home() / 'stocks_cache'
@@ -0,0 +1,245 @@
+"""
+Data loading shared by the backtest scripts.
+
+Everything fetched over the network is also written to a local cache so the
+same run can be repeated with offline=True (no network access at all):
+    - S&P 500 constituents: dated snapshots and change log (universe.py)
+    - Daily prices: incremental PriceStore (only missing ranges downloaded)
+    - yfinance fundamentals: JSON snapshot of the last online fetch
+
+Per-ticker yfinance calls go through fetch.fetch_all (concurrent, rate
+limited, retried); extra keyword arguments are passed on to it.
+"""
+import json
+import pandas as pd
+import yfinance as yf
+from datetime import datetime
+from pathlib import Path
+
+from src.backtest import instrumentation
+from src.backtest.factors import FactorCache
+from src.backtest.fetch import fetch_all, report_errors
+from src.backtest.fundamentals import FundamentalsStore
+from src.backtest.price_cache import DEFAULT_CACHE_DIR, PriceStore
+from src.backtest.screener import Screener
+from src.backtest.universe import UniverseStore
+
+PRICE_SOURCES = {'yfinance': 'prices', 'simfin': 'simfin_prices'}
+UNIVERSES = ('current', 'point-in-time')
+
+
+def cached_json(path, fetch, offline=False):
+    """
+    Return fetch() and save it to path, or read path when offline.
+
+    Used for small network results (ticker lists, fundamentals snapshots)
+    that must be replayable without network access.
+    """
+    path = Path(path)
+    if offline:
+        if not path.exists():
+            raise FileNotFoundError(f'{path} not cached yet. Run once without --offline first.')
+        instrumentation.count('cache_hits')
+        return json.loads(path.read_text())['data']
+
+    data = fetch()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {'fetched': datetime.now().isoformat(timespec='seconds'), 'data': data}
+    path.write_text(json.dumps(payload))
+    return data
+
+
+def universe_store(cache_dir=DEFAULT_CACHE_DIR):
+    """UniverseStore under cache_dir, seeded from a legacy sp500_tickers.json."""
+    cache_dir = Path(cache_dir)
+    store = UniverseStore(cache_dir / 'universe')
+    legacy = cache_dir / 'sp500_tickers.json'
+    if not store.snapshot_dates() and legacy.exists():
+        store.import_ticker_list(legacy)
+    return store
+
+
+def load_sp500_tickers(cache_dir=DEFAULT_CACHE_DIR, offline=False):
+    """
+    Current S&P 500 tickers ('.' replaced by '-' for yfinance).
+
+    Read from the newest local snapshot; Wikipedia is only fetched when that
+    snapshot is missing or stale (see universe.UniverseStore.refresh).
+    """
+    store = universe_store(cache_dir)
+    store.refresh(offline=offline)
+    return store.latest()
+
+
+def price_dir(cache_dir=DEFAULT_CACHE_DIR, source='yfinance'):
+    """PriceStore directory for a price source ('yfinance' or 'simfin')."""
+    if source not in PRICE_SOURCES:
+        raise ValueError(f'Unknown price source: {source}')
+    return Path(cache_dir) / PRICE_SOURCES[source]
+
+
+def load_prices(tickers, start, end, cache_dir=DEFAULT_CACHE_DIR, offline=False, field='Adj Close',
+                source='yfinance'):
+    """
+    Daily prices for tickers as a (date x ticker) DataFrame.
+
+    Online, only ranges missing from the yfinance price cache are downloaded.
+    Offline, the cache is used as is and tickers without cached data are left
+    out. The 'simfin' source is a store converted from SimFin's bulk file
+    (see src/data_collection/simfin_prices.py) and is always read offline.
+    'Adj Close' equals the 'Close' yf.download returns with auto_adjust=True.
+    """
+    root = price_dir(cache_dir, source)
+    if source == 'simfin':
+        if not (root / 'index.json').exists():
+            raise FileNotFoundError(f'{root} not found. Run python -m src.data_collection.simfin_prices first.')
+        offline = True
+    store = PriceStore(root)
+    if not offline:
+        store.update(tickers, start, end)
+    prices = store.load_field(tickers, field, start, end)
+    if offline:
+        instrumentation.count('cache_hits', len(prices.columns))
+    missing = len(tickers) - len(prices.columns)
+    if missing:
+        print(f'  {missing} tickers have no cached prices')
+    return prices
+
+
+def fetch_yf_eps(tickers, year=2025, **fetch_kwargs):
+    """Basic EPS for fiscal year from yfinance: ticker -> {'eps', 'year'}."""
+    def fetch_one(ticker):
+        income = yf.Ticker(ticker).income_stmt
+        if income is None or 'Basic EPS' not in income.index:
+            return None
+        for date in income.columns:
+            if date.year == year:
+                eps = income.loc['Basic EPS', date]
+                if pd.notna(eps):
+                    return {'eps': float(eps), 'year': year}
+        return None
+
+    results, errors = fetch_all(tickers, fetch_one, **fetch_kwargs)
+    report_errors(errors)
+    return results
+
+
+def fetch_yf_info(tickers, keys, **fetch_kwargs):
+    """Selected Ticker.info fields: ticker -> {key: value or None}."""
+    def fetch_one(ticker):
+        info = yf.Ticker(ticker).info
+        return {key: info.get(key, None) for key in keys}
+
+    results, errors = fetch_all(tickers, fetch_one, **fetch_kwargs)
+    report_errors(errors)
+    return results
+
+
+def fetch_yf_market_caps(tickers, **fetch_kwargs):
+    """Current market caps from yfinance (only positive values kept)."""
+    info = fetch_yf_info(tickers, ['marketCap'], **fetch_kwargs)
+    return {ticker: f['marketCap'] for ticker, f in info.items() if f['marketCap'] and f['marketCap'] > 0}
+
+
+class BacktestData:
+    """
+    Everything the V2 strategies need, loaded once and reusable across runs.
+
+    prices is the forward/back-filled (date x ticker) close matrix, spy the
+    SPY close series, fundamentals a FundamentalsStore, eps_2025 the yfinance
+    fallback (ticker -> {'eps', 'year'}) and market_caps current caps.
+    universe is a universe.Membership for point-in-time screening, or None
+    to screen every ticker in prices on every date.
+    """
+
+    def __init__(self, prices, spy, fundamentals, eps_2025, market_caps, factors=None, universe=None):
+        self.prices = prices
+        self.spy = spy
+        self.fundamentals = fundamentals
+        self.eps_2025 = eps_2025
+        self.market_caps = market_caps
+        self.factors = factors if factors is not None else FactorCache(prices)
+        self.universe = universe
+
+    def screener(self, **params):
+        """Screener over the full price matrix; params override screening rules."""
+        eps_fallback = {ticker: f['eps'] for ticker, f in self.eps_2025.items()}
+        return Screener(self.prices, self.fundamentals, eps_fallback=eps_fallback,
+                        market_caps=self.market_caps, factors=self.factors, universe=self.universe, **params)
+
+
+def load_backtest_data(simfin_file, start, end, cache_dir=DEFAULT_CACHE_DIR, offline=False, price_source='yfinance',
+                       universe='current', **fetch_kwargs):
+    """
+    Load SimFin fundamentals, constituents, prices and yfinance fundamentals.
+
+    price_source='simfin' reads stock prices from the converted SimFin store;
+    SPY is not in SimFin and always comes from the yfinance cache.
+    universe='current' screens today's constituents on every date;
+    'point-in-time' loads every ticker that was a member between start and
+    end and only screens the members of each rebalance date.
+    """
+    if universe not in UNIVERSES:
+        raise ValueError(f'Unknown universe: {universe} (expected one of {UNIVERSES})')
+    cache_dir = Path(cache_dir)
+
+    # Load SimFin fundamentals
+    print('\nLoading SimFin fundamentals...')
+    simfin_file = Path(simfin_file)
+    if not simfin_file.exists():
+        raise FileNotFoundError(f"SimFin data not found. Run explore_simfin.py first.")
+
+    # Dense (ticker x fiscal year) EPS / shares arrays, memory-mapped from the
+    # cache next to the CSV after the first run
+    with instrumentation.stage('simfin_load') as stage:
+        fundamentals = FundamentalsStore.load(simfin_file)
+        stage.items = len(fundamentals)
+    print(f'  SimFin: {len(fundamentals)} tickers with EPS data')
+    print(f'  Years: {fundamentals.years[0]} - {fundamentals.years[-1]}')
+
+    # Get S&P 500 tickers
+    print('\nLoading S&P 500 constituents...')
+    with instrumentation.stage('constituents') as stage:
+        sp500_tickers = load_sp500_tickers(cache_dir, offline=offline)
+        membership = None
+        if universe == 'point-in-time':
+            membership = universe_store(cache_dir).membership()
+            sp500_tickers = membership.ever_members(start, end)
+        stage.items = len(sp500_tickers)
+    print(f'  Loaded {len(sp500_tickers)} tickers')
+    if membership is not None:
+        print(f'  Point-in-time universe: {len(membership.starts)} membership periods')
+
+    # Download price data (only ranges missing from the cache are fetched)
+    print('\nLoading price data...')
+    with instrumentation.stage('prices') as stage:
+        prices = load_prices(sp500_tickers, start, end, cache_dir, offline=offline, source=price_source)
+        prices = prices.ffill().bfill()
+        stage.items = len(prices.columns)
+    print(f'  Got prices for {len(prices.columns)} stocks')
+
+    # Download SPY
+    print('Loading SPY benchmark...')
+    with instrumentation.stage('spy_prices') as stage:
+        spy = load_prices(['SPY'], start, end, cache_dir, offline=offline)['SPY']
+        stage.items = len(spy)
+    print(f'  SPY: {len(spy)} trading days')
+
+    # Get 2025 fundamentals from yfinance (SimFin may not have them yet)
+    print('\nFetching 2025 fundamentals from yfinance...')
+    with instrumentation.stage('eps_2025') as stage:
+        eps_2025 = cached_json(cache_dir / 'yf_fundamentals_2025.json',
+                               lambda: fetch_yf_eps(prices.columns, 2025, **fetch_kwargs), offline)
+        stage.items = len(eps_2025)
+    print(f'  Got 2025 EPS for {len(eps_2025)} stocks')
+
+    # Get current market caps (for filtering)
+    print('\nFetching current market caps...')
+    with instrumentation.stage('market_caps') as stage:
+        market_caps = cached_json(cache_dir / 'market_caps.json',
+                                  lambda: fetch_yf_market_caps(prices.columns, **fetch_kwargs), offline)
+        stage.items = len(market_caps)
+    print(f'  Got market caps for {len(market_caps)} stocks')
+
+    factors = FactorCache(prices, cache_dir=cache_dir / 'factors')
+    return BacktestData(prices, spy, fundamentals, eps_2025, market_caps, factors, universe=membership)
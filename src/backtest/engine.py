@@ -0,0 +1,174 @@
+"""
+Single-pass portfolio valuation engine shared by the backtest scripts.
+
+Each rebalance runs the strategy exactly once. The selected holdings become a
+share-count vector over the held columns of the price matrix, and the daily
+portfolio value for the whole holding period is one matrix-vector product
+written into preallocated arrays.
+"""
+import numpy as np
+import pandas as pd
+
+from src.backtest import instrumentation
+
+
+def rebalance_positions(dates, rebalance_dates):
+    """
+    Row positions at which each rebalance executes.
+
+    A rebalance executes on the first trading day on or after its date, and
+    at most one rebalance executes per trading day (a later one that maps to
+    the same day moves to the next day). Rebalances past the last date are
+    dropped.
+    """
+    positions = []
+    prev = -1
+    for rebal_date in rebalance_dates:
+        pos = max(int(dates.searchsorted(pd.Timestamp(rebal_date), side='left')), prev + 1)
+        if pos >= len(dates):
+            break
+        positions.append(pos)
+        prev = pos
+    return positions
+
+
+def simulate(strategy_func, prices_df, name, rebalance_dates, investment=1000.0, num_stocks=25, verbose=True):
+    """
+    Run a strategy over prices_df.
+
+    strategy_func(prices_df, date, num_stocks) returns a list of dicts with at
+    least 'ticker' and 'price'. At each rebalance the current holdings are
+    sold, investment is added and the cash is split equally across the new
+    selection. Returns (portfolio, holdings): portfolio has daily 'value' and
+    'invested' columns indexed by date; holdings has one row per position
+    bought (date, ticker, shares, price).
+    """
+    results = simulate_many({name: strategy_func}, prices_df, rebalance_dates, investment, num_stocks, verbose)
+    return results[name]
+
+
+def simulate_many(strategies, prices_df, rebalance_dates, investment=1000.0, num_stocks=25, verbose=True,
+                  benchmarks=None):
+    """
+    Run several strategies (name -> strategy_func, see simulate()) and
+    dollar-cost-averaging benchmarks in one pass over the rebalance dates.
+
+    Every strategy is called once per rebalance, in order, so callers can
+    share work computed for a date (see strategies.SharedRows). benchmarks
+    maps a name to a price series that receives `investment` at every
+    rebalance and is never sold; it is aligned to prices_df's dates.
+    Returns name -> (portfolio, holdings) like simulate(), strategies first.
+    """
+    if not prices_df.index.is_monotonic_increasing:
+        prices_df = prices_df.sort_index()
+    all_dates = prices_df.index
+    values = prices_df.to_numpy(dtype=np.float64)
+    benchmarks = benchmarks or {}
+
+    positions = rebalance_positions(all_dates, rebalance_dates)
+    start = int(all_dates.searchsorted(pd.Timestamp(rebalance_dates[0]), side='left')) if len(rebalance_dates) else len(all_dates)
+    n = len(all_dates) - start
+
+    names = list(strategies)
+    portfolio_value = {name: np.zeros(n) for name in names}
+    invested = np.zeros(n)
+    holdings_log = {name: [] for name in names}
+
+    cols = {name: np.empty(0, dtype=np.int64) for name in names}
+    shares = {name: np.empty(0) for name in names}
+    cash = dict.fromkeys(names, 0.0)
+    total_invested = 0.0
+    period_start = start
+
+    # Selections inside the loop are recorded as nested 'selection' stages
+    with instrumentation.stage('valuation', strategy=', '.join(names), items=n):
+        for i, pos in enumerate(positions + [len(all_dates)]):
+            # Value the holding period that ends before this rebalance
+            if pos > period_start:
+                invested[period_start - start:pos - start] = total_invested
+                for name in names:
+                    block = values[period_start:pos, cols[name]]
+                    held_value = np.where(np.isnan(block), 0.0, block) @ shares[name]
+                    portfolio_value[name][period_start - start:pos - start] = held_value + cash[name]
+            if i == len(positions):
+                break
+
+            date = all_dates[pos]
+            total_invested += investment
+
+            for name in names:
+                # Sell all
+                if len(cols[name]):
+                    sell_prices = values[pos, cols[name]]
+                    cash[name] += float(np.where(np.isnan(sell_prices), 0.0, sell_prices) @ shares[name])
+                    cols[name] = np.empty(0, dtype=np.int64)
+                    shares[name] = np.empty(0)
+
+                # Add investment
+                cash[name] += investment
+
+                # Select stocks (once per rebalance)
+                with instrumentation.stage('selection', strategy=name, date=str(date.date())) as stage:
+                    selected = strategies[name](prices_df, date, num_stocks)
+                    stage.items = len(selected) if selected else 0
+                if selected:
+                    tickers = [stock['ticker'] for stock in selected]
+                    buy_prices = np.array([stock['price'] for stock in selected], dtype=np.float64)
+                    allocation = cash[name] / len(selected)
+                    col_idx = prices_df.columns.get_indexer(tickers)
+                    in_matrix = col_idx >= 0
+                    cols[name] = col_idx[in_matrix]
+                    shares[name] = allocation / buy_prices[in_matrix]
+                    for ticker, price in zip(tickers, buy_prices):
+                        holdings_log[name].append({'date': date, 'ticker': ticker, 'shares': allocation / price,
+                                                   'price': price})
+                    cash[name] = 0.0
+                    if verbose:
+                        print(f'{name} - {date.date()}: {len(selected)} stocks, invested ${total_invested:,.0f}')
+                elif verbose:
+                    print(f'{name}: No stocks selected on {date.date()}')
+
+            period_start = pos
+
+    index = pd.Index(all_dates[start:], name='date')
+    columns = ['date', 'ticker', 'shares', 'price']
+    results = {
+        name: (pd.DataFrame({'value': portfolio_value[name], 'invested': invested}, index=index),
+               pd.DataFrame(holdings_log[name], columns=columns))
+        for name in names
+    }
+    for name, series in benchmarks.items():
+        if not series.index.equals(all_dates):
+            series = series.reindex(all_dates).ffill()
+        results[name] = dca(series, name, positions, start, investment, verbose)
+    return results
+
+
+def dca(series, name, positions, start, investment=1000.0, verbose=True):
+    """
+    Buy `investment` worth of series at each rebalance position and hold.
+
+    Returns (portfolio, holdings) from row `start` of series on.
+    """
+    prices = series.to_numpy(dtype=np.float64)
+    bought = np.zeros(len(prices))
+    bought[positions] = investment / prices[positions]
+    held = np.cumsum(bought)
+    spent = np.zeros(len(prices))
+    spent[positions] = investment
+    if verbose:
+        for pos in positions:
+            print(f'{name} - {series.index[pos].date()}: Bought {bought[pos]:.2f} shares @ ${prices[pos]:.2f}')
+    portfolio = pd.DataFrame(
+        {'value': held[start:] * prices[start:], 'invested': np.cumsum(spent)[start:]},
+        index=pd.Index(series.index[start:], name='date'),
+    )
+    holdings = pd.DataFrame({'date': series.index[positions], 'ticker': name, 'shares': bought[positions],
+                             'price': prices[positions]}, columns=['date', 'ticker', 'shares', 'price'])
+    return portfolio, holdings
+
+
+def run_backtest(strategy_func, prices_df, name, rebalance_dates, investment=1000.0, num_stocks=25, verbose=True):
+    """Run backtest for a strategy and return its daily value / invested history."""
+    portfolio, _ = simulate(strategy_func, prices_df, name, rebalance_dates, investment, num_stocks, verbose)
+    return portfolio
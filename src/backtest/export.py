@@ -0,0 +1,84 @@
+"""
+Results export: compressed Parquet as the primary format, Excel on request.
+
+A results directory holds one Parquet file per table:
+    <dir>/daily.parquet      (date x series) portfolio values
+    <dir>/holdings.parquet   one row per position bought (date, ticker, ...)
+    <dir>/metrics.parquet    one metrics row per series (calc_metrics / compare_portfolios)
+
+Parquet writes are columnar and compressed, so even sweep outputs with
+thousands of series are written in well under a second. write_excel() produces a workbook for
+sharing, using openpyxl's write-only mode, which streams rows to disk instead
+of building the whole workbook in memory.
+"""
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+TABLES = ('daily', 'holdings', 'metrics')
+COMPRESSION = 'zstd'
+
+
+def save_results(directory, daily, holdings=None, metrics=None, compression=COMPRESSION):
+    """Write the given tables to directory as Parquet files and return their paths."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for name, df in zip(TABLES, (daily, holdings, metrics)):
+        if df is None:
+            continue
+        path = directory / f'{name}.parquet'
+        df = df.copy(deep=False)
+        df.columns = [str(col) for col in df.columns]  # Parquet needs string column names
+        # Dictionary pages and min/max statistics only pay off for the few
+        # non-float columns; skipping them for value series keeps wide
+        # (date x thousands of series) tables fast to write
+        other = [col for col in df.columns if not pd.api.types.is_float_dtype(df[col])]
+        df.to_parquet(path, compression=compression, use_dictionary=other, write_statistics=other)
+        paths.append(path)
+    return paths
+
+
+def load_results(directory):
+    """Read a results directory back: table name -> DataFrame (missing tables skipped)."""
+    directory = Path(directory)
+    return {name: pd.read_parquet(directory / f'{name}.parquet')
+            for name in TABLES if (directory / f'{name}.parquet').exists()}
+
+
+def _rows(df, index):
+    """Yield worksheet rows for df (index first if requested), NaN as empty cells."""
+    columns = []
+    if index:
+        idx = df.index
+        columns.append(idx.to_pydatetime() if isinstance(idx, pd.DatetimeIndex) else idx.to_numpy(dtype=object))
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            cells = np.array(values.dt.to_pydatetime(), dtype=object)
+        else:
+            cells = values.to_numpy(dtype=object)
+        cells[pd.isna(values).to_numpy()] = None
+        columns.append(cells)
+    return zip(*columns)
+
+
+def write_excel(path, sheets):
+    """
+    Write sheets (sheet name -> DataFrame) to an .xlsx file in write-only mode.
+
+    The index is written as the first column unless it is a default
+    RangeIndex, like DataFrame.to_excel(index=...) would.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for name, df in sheets.items():
+        sheet = workbook.create_sheet(title=str(name)[:31])
+        index = not isinstance(df.index, pd.RangeIndex)
+        header = ([df.index.name or ''] if index else []) + [str(col) for col in df.columns]
+        sheet.append(header)
+        for row in _rows(df, index):
+            sheet.append(row)
+    workbook.save(path)
+    return Path(path)
@@ -0,0 +1,98 @@
+"""
+Precomputed (date x ticker) factor matrices for price-derived signals.
+
+Momentum for every date and ticker is computed once with a shifted division
+over the whole price matrix, so a rebalance only reads one row. Matrices can
+be persisted as .npy files keyed by a hash of the price data and are then
+memory-mapped on later runs.
+"""
+import hashlib
+import numpy as np
+from pathlib import Path
+
+from src.backtest import instrumentation
+
+
+def price_hash(prices_df):
+    """Stable hash of a price DataFrame (values, dates and tickers)."""
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(prices_df.to_numpy(dtype=np.float64)).tobytes())
+    h.update(np.ascontiguousarray(prices_df.index.asi8).tobytes())
+    h.update('\x1f'.join(map(str, prices_df.columns)).encode())
+    return h.hexdigest()[:16]
+
+
+def momentum_matrix(values, lookback_days=126, min_history=20):
+    """
+    Momentum for every row of a (date x ticker) price array.
+
+    Row i compares the price with the one min(lookback_days, i) - 1 rows
+    earlier, i.e. the same rule as the original per-ticker calculation: use
+    up to lookback_days of history, require at least min_history rows, NaN
+    where the past price is not positive.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    out = np.full(values.shape, np.nan)
+    rows = np.arange(min_history, n)
+    rows = rows[np.minimum(lookback_days, rows) >= min_history]
+    if len(rows) == 0:
+        return out
+    past_rows = rows + 1 - np.minimum(lookback_days, rows)
+    current = values[rows]
+    past = values[past_rows]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mom = (current - past) / past
+    out[rows] = np.where(past > 0, mom, np.nan)
+    return out
+
+
+class FactorCache:
+    """
+    Lazily computed factor matrices for one price DataFrame.
+
+    With cache_dir set, matrices are stored under cache_dir/<price hash>/ and
+    memory-mapped when already present; otherwise they live in memory only.
+    """
+
+    def __init__(self, prices_df, cache_dir=None, min_history=20):
+        self.prices_df = prices_df
+        self.values = prices_df.to_numpy(dtype=np.float64)
+        self.min_history = min_history
+        self.key = price_hash(prices_df) if cache_dir is not None else None
+        self.cache_dir = Path(cache_dir) / self.key if cache_dir is not None else None
+        self.matrices = {}
+
+    def momentum(self, lookback_days=126):
+        """(date x ticker) momentum matrix for one lookback."""
+        name = f'momentum_{lookback_days}_{self.min_history}'
+        if name not in self.matrices:
+            self.matrices[name] = self._load_or_compute(
+                name, lambda: momentum_matrix(self.values, lookback_days, self.min_history))
+        return self.matrices[name]
+
+    def momentum_row(self, pos, lookback_days=126):
+        """Momentum for every ticker at row pos (all NaN if pos < 0)."""
+        if pos < 0:
+            return np.full(self.values.shape[1], np.nan)
+        return np.asarray(self.momentum(lookback_days)[pos])
+
+    def precompute(self, lookbacks):
+        """Compute (and persist) momentum for several lookbacks up front."""
+        for lookback in lookbacks:
+            self.momentum(lookback)
+
+    def _load_or_compute(self, name, compute):
+        if self.cache_dir is None:
+            return compute()
+        path = self.cache_dir / f'{name}.npy'
+        if path.exists():
+            instrumentation.count('cache_hits')
+            return np.load(path, mmap_mode='r')
+        instrumentation.count('cache_misses')
+        matrix = compute()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp.npy')
+        np.save(tmp, matrix)
+        tmp.replace(path)
+        return matrix
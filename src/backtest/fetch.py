@@ -0,0 +1,109 @@
+"""
+Concurrent, rate-limited fetching of per-ticker data.
+
+fetch_all() runs one blocking call per key on a thread pool with:
+    - a configurable concurrency limit (max_workers)
+    - a shared token bucket limiting the request rate across all threads
+    - retries with exponential backoff and jitter
+    - per-key error reporting instead of silently swallowing exceptions
+
+fetch_one can be any callable taking a key, so the same machinery can be
+pointed at a local stub HTTP server instead of yfinance.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.backtest import instrumentation
+
+DEFAULT_WORKERS = 8
+DEFAULT_RATE = 10.0  # requests per second across all workers
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5  # seconds, doubled on every retry
+
+
+class TokenBucket:
+    """Thread-safe token bucket: acquire() blocks until a token is available."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def call_with_retries(func, key, bucket=None, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+    """Call func(key), retrying failures with exponential backoff. Re-raises the last error."""
+    for attempt in range(retries + 1):
+        if bucket is not None:
+            bucket.acquire()
+        instrumentation.count('network_calls')
+        try:
+            return func(key)
+        except Exception:
+            instrumentation.count('network_errors')
+            if attempt == retries:
+                raise
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random()))
+
+
+def fetch_all(keys, fetch_one, max_workers=DEFAULT_WORKERS, rate=DEFAULT_RATE,
+              retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, progress_every=100):
+    """
+    Run fetch_one(key) for every key concurrently.
+
+    Returns (results, errors): results maps key -> value for calls that
+    returned something other than None, errors maps key -> 'ExcType: message'
+    for calls that still failed after all retries. rate=None disables rate
+    limiting.
+    """
+    keys = list(keys)
+    bucket = TokenBucket(rate) if rate else None
+    results = {}
+    errors = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(call_with_retries, fetch_one, key, bucket, retries, backoff): key
+            for key in keys
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            key = futures[future]
+            try:
+                value = future.result()
+            except Exception as e:
+                errors[key] = f'{type(e).__name__}: {e}'
+            else:
+                if value is not None:
+                    results[key] = value
+            if progress_every and done % progress_every == 0:
+                print(f'  Processed {done}/{len(keys)}...')
+
+    # Keep the input order so results do not depend on completion order
+    results = {key: results[key] for key in keys if key in results}
+    return results, errors
+
+
+def report_errors(errors, limit=5):
+    """Print a short summary of per-key fetch errors."""
+    if not errors:
+        return
+    print(f'  {len(errors)} failed:')
+    for key in sorted(errors)[:limit]:
+        print(f'    {key}: {errors[key]}')
+    if len(errors) > limit:
+        print(f'    ... and {len(errors) - limit} more')
@@ -0,0 +1,290 @@
+"""
+Point-in-time fundamentals store built from SimFin annual income statements.
+
+EPS and diluted shares are pivoted into dense (ticker x fiscal year) NumPy
+arrays with a validity mask, so lookups for the whole universe are a single
+fancy-indexing operation instead of a dict-of-dict walk per ticker.
+
+Each statement's publish date is kept as well, so fundamentals can also be
+resolved as of a date (the latest statement the market had seen) rather
+than by guessing the fiscal year from the calendar year. The as-of index
+sorts every (ticker row, publish day) pair under one composite integer key,
+so resolving a whole universe is a single searchsorted call.
+
+The arrays are cached next to the source CSV as plain .npy files and
+memory-mapped on later runs. The cache is rebuilt whenever the CSV changes
+(size or modification time).
+"""
+import json
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from src.backtest import instrumentation
+from src.data_collection.simfin_reader import DEFAULT_COLUMNS, read_columns, read_simfin
+
+CACHE_VERSION = 2
+ARRAY_NAMES = ('tickers', 'years', 'eps', 'shares', 'valid', 'published')
+DATE_COLUMNS = ('Publish Date', 'Report Date')
+# Assumed delay between period end and publication when SimFin has no
+# Publish Date (10-K deadlines are 60-90 days after fiscal year end)
+PUBLISH_LAG = np.timedelta64(90, 'D')
+_SPAN = 1 << 20  # publish days per ticker row in the composite as-of key
+
+
+class FundamentalsStore:
+    """
+    Dense EPS / shares arrays indexed by (ticker row, fiscal year column).
+
+    published holds each statement's publish date (NaT when unknown, such
+    statements are never returned by the as-of lookups).
+    """
+
+    def __init__(self, tickers, years, eps, shares, valid, published=None):
+        self.tickers = tickers
+        self.years = years
+        self.eps = eps
+        self.shares = shares
+        self.valid = valid
+        if published is None:
+            published = np.full(valid.shape, np.datetime64('NaT'), dtype='datetime64[D]')
+        self.published = published
+        self.first_year = int(years[0]) if len(years) else 0
+        self.ticker_index = {t: i for i, t in enumerate(tickers.tolist())}
+        self._build_asof_index()
+
+    def _build_asof_index(self):
+        """
+        Sort the published statements by (ticker row, publish day).
+
+        asof_keys holds row * _SPAN + day offset, asof_rows the row of each
+        key and asof_columns the newest fiscal year column published up to
+        that key for the ticker (a running max, so a late filing of an old
+        fiscal year never hides a newer one).
+        """
+        known = np.asarray(self.valid) & ~np.isnat(self.published)
+        rows, cols = np.nonzero(known)
+        days = np.asarray(self.published)[rows, cols].astype(np.int64)
+        self.day_offset = int(days.min()) if len(days) else 0
+        keys = rows * _SPAN + (days - self.day_offset)
+        order = np.argsort(keys, kind='stable')
+        self.asof_keys = keys[order]
+        self.asof_rows = rows[order]
+        ncols = max(len(self.years), 1)
+        block = self.asof_rows * ncols
+        self.asof_columns = np.maximum.accumulate(block + cols[order]) - block if len(order) else cols
+        # Every distinct publish day, to tell when the as-of state changes
+        self.publish_days = np.unique(days)
+
+    # -------------------------------------------------------------------------
+    # Construction / caching
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """
+        Build the store from a SimFin income DataFrame.
+
+        Only rows with Net Income and positive diluted shares are kept. When a
+        ticker has several rows for the same fiscal year the last one wins,
+        matching the previous row-by-row dict build. The publish date is the
+        Publish Date column, else Report Date + PUBLISH_LAG.
+        """
+        df = df[['Ticker', 'Fiscal Year', 'Net Income', 'Shares (Diluted)'] + [c for c in DATE_COLUMNS if c in df]]
+        ok = df['Net Income'].notna() & df['Shares (Diluted)'].notna() & (df['Shares (Diluted)'] > 0)
+        df = df[ok & df['Ticker'].notna() & df['Fiscal Year'].notna()]
+        df = df.drop_duplicates(['Ticker', 'Fiscal Year'], keep='last')
+
+        tickers, ticker_codes = np.unique(df['Ticker'].to_numpy(dtype=str), return_inverse=True)
+        fiscal_years = df['Fiscal Year'].to_numpy().astype(np.int64)
+        if len(fiscal_years):
+            years = np.arange(fiscal_years.min(), fiscal_years.max() + 1, dtype=np.int64)
+        else:
+            years = np.empty(0, dtype=np.int64)
+        year_codes = fiscal_years - (years[0] if len(years) else 0)
+
+        shape = (len(tickers), len(years))
+        eps = np.full(shape, np.nan)
+        shares = np.full(shape, np.nan)
+        valid = np.zeros(shape, dtype=bool)
+
+        net_income = df['Net Income'].to_numpy(dtype=np.float64)
+        diluted = df['Shares (Diluted)'].to_numpy(dtype=np.float64)
+        eps[ticker_codes, year_codes] = net_income / diluted
+        shares[ticker_codes, year_codes] = diluted
+        valid[ticker_codes, year_codes] = True
+
+        published = np.full(shape, np.datetime64('NaT'), dtype='datetime64[D]')
+        published[ticker_codes, year_codes] = _publish_dates(df)
+
+        return cls(tickers, years, eps, shares, valid, published)
+
+    @classmethod
+    def load(cls, csv_path, cache_dir=None, read_csv=None):
+        """
+        Load the store for a SimFin CSV, using the on-disk cache when fresh.
+
+        On a cache hit the arrays are memory-mapped read-only. On a miss the
+        CSV is parsed (with read_csv, default a chunked read_simfin of the
+        four columns used) and the cache is rewritten.
+        """
+        csv_path = Path(csv_path)
+        if cache_dir is None:
+            cache_dir = csv_path.parent / 'cache' / csv_path.stem
+        cache_dir = Path(cache_dir)
+        source = _source_signature(csv_path)
+
+        store = cls.from_cache(cache_dir, source)
+        if store is not None:
+            instrumentation.count('cache_hits')
+            return store
+        instrumentation.count('cache_misses')
+
+        if read_csv is None:
+            available = read_columns(csv_path)
+            df = read_simfin(csv_path, DEFAULT_COLUMNS + tuple(c for c in DATE_COLUMNS if c in available))
+        else:
+            df = read_csv(csv_path)
+        store = cls.from_dataframe(df)
+        store.save(cache_dir, source)
+        return store
+
+    @classmethod
+    def from_cache(cls, cache_dir, source=None):
+        """Memory-map a cached store, or return None if missing or stale."""
+        cache_dir = Path(cache_dir)
+        meta_file = cache_dir / 'meta.json'
+        if not meta_file.exists():
+            return None
+        try:
+            meta = json.loads(meta_file.read_text())
+        except ValueError:
+            return None
+        if meta.get('version') != CACHE_VERSION:
+            return None
+        if source is not None and meta.get('source') != source:
+            return None
+        if not all((cache_dir / f'{name}.npy').exists() for name in ARRAY_NAMES):
+            return None
+
+        arrays = {name: np.load(cache_dir / f'{name}.npy', mmap_mode='r') for name in ARRAY_NAMES}
+        return cls(**arrays)
+
+    def save(self, cache_dir, source=None):
+        """Write the arrays as .npy files plus a meta.json describing the source."""
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(cache_dir / f'{name}.npy', np.ascontiguousarray(getattr(self, name)))
+        # Written last so a partially written cache is never considered fresh
+        meta = {'version': CACHE_VERSION, 'source': source}
+        (cache_dir / 'meta.json').write_text(json.dumps(meta, indent=2))
+
+    # -------------------------------------------------------------------------
+    # Lookups (all vectorized over ticker rows)
+    # -------------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def rows_for(self, tickers):
+        """Map ticker symbols to store rows (-1 for tickers without data)."""
+        get = self.ticker_index.get
+        return np.fromiter((get(t, -1) for t in tickers), dtype=np.int64, count=len(tickers))
+
+    def _column(self, values, rows, fiscal_year):
+        """Values for the given rows in one fiscal year, NaN where unavailable."""
+        rows = np.asarray(rows, dtype=np.int64)
+        out = np.full(rows.shape, np.nan)
+        col = int(fiscal_year) - self.first_year
+        if col < 0 or col >= len(self.years):
+            return out
+        has_row = rows >= 0
+        picked = rows[has_row]
+        out[has_row] = np.where(self.valid[picked, col], values[picked, col], np.nan)
+        return out
+
+    def eps_for_year(self, rows, fiscal_year):
+        """EPS (Net Income / diluted shares) for each row, NaN if missing."""
+        return self._column(self.eps, rows, fiscal_year)
+
+    def shares_for_year(self, rows, fiscal_year):
+        """Diluted shares outstanding for each row, NaN if missing."""
+        return self._column(self.shares, rows, fiscal_year)
+
+    def eps_growth(self, rows, fiscal_year):
+        """Year-over-year EPS growth, NaN when either year is missing or prior EPS <= 0."""
+        current = self.eps_for_year(rows, fiscal_year)
+        prev = self.eps_for_year(rows, fiscal_year - 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            growth = (current - prev) / prev
+        return np.where(prev > 0, growth, np.nan)
+
+    # -------------------------------------------------------------------------
+    # As-of lookups (latest statement published on or before a date)
+    # -------------------------------------------------------------------------
+
+    def asof_key(self, date):
+        """Number of distinct publish days up to date; equal keys give equal as-of results."""
+        return int(self.publish_days.searchsorted(_day(date), side='right'))
+
+    def asof_columns_for(self, rows, date):
+        """Fiscal year column of each row's latest statement published by date (-1 if none)."""
+        rows = np.asarray(rows, dtype=np.int64)
+        out = np.full(rows.shape, -1, dtype=np.int64)
+        if not len(self.asof_keys):
+            return out
+        offset = min(max(_day(date) - self.day_offset, -1), _SPAN - 1)
+        pos = self.asof_keys.searchsorted(rows * _SPAN + offset, side='right') - 1
+        hit = (rows >= 0) & (pos >= 0)
+        hit[hit] = self.asof_rows[pos[hit]] == rows[hit]
+        out[hit] = self.asof_columns[pos[hit]]
+        return out
+
+    def _pick(self, values, rows, cols):
+        """values[row, col] for each pair, NaN where col < 0 or not valid."""
+        rows = np.asarray(rows, dtype=np.int64)
+        out = np.full(rows.shape, np.nan)
+        ok = (rows >= 0) & (cols >= 0)
+        r, c = rows[ok], cols[ok]
+        out[ok] = np.where(self.valid[r, c], values[r, c], np.nan)
+        return out
+
+    def asof(self, rows, date):
+        """
+        EPS, shares, EPS growth and fiscal year of each row's latest statement
+        published on or before date (NaN / -1 where there is none).
+        """
+        cols = self.asof_columns_for(rows, date)
+        eps = self._pick(self.eps, rows, cols)
+        prev = self._pick(self.eps, rows, np.where(cols > 0, cols - 1, -1))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            growth = np.where(prev > 0, (eps - prev) / prev, np.nan)
+        return {
+            'eps': eps,
+            'shares': self._pick(self.shares, rows, cols),
+            'eps_growth': growth,
+            'fiscal_year': np.where(cols >= 0, cols + self.first_year, -1),
+        }
+
+
+def _day(date):
+    """Days since the epoch for a date-like value."""
+    return int(np.datetime64(pd.Timestamp(date), 'D').astype(np.int64))
+
+
+def _publish_dates(df):
+    """Publish Date per row, falling back to Report Date + PUBLISH_LAG."""
+    published = np.full(len(df), np.datetime64('NaT'), dtype='datetime64[D]')
+    if 'Report Date' in df:
+        published = pd.to_datetime(df['Report Date']).to_numpy(dtype='datetime64[D]') + PUBLISH_LAG
+    if 'Publish Date' in df:
+        publish = pd.to_datetime(df['Publish Date']).to_numpy(dtype='datetime64[D]')
+        published = np.where(np.isnat(publish), published, publish)
+    return published
+
+
+def _source_signature(path):
+    """Identify a source file by size and modification time."""
+    stat = Path(path).stat()
+    return {'path': str(Path(path).resolve()), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
@@ -0,0 +1,214 @@
+"""
+Lightweight per-stage instrumentation for backtest runs.
+
+Code marks its stages and events; nothing is recorded unless profiling was
+switched on with enable():
+
+    with instrumentation.stage('prices', items=len(tickers)):
+        ...
+    instrumentation.count('network_calls')
+
+Each stage records wall time, CPU time, peak traced memory (tracemalloc),
+an item count and how much every counter (network calls, cache hits, ...)
+moved while it ran. Stages can be nested; the report keeps their depth.
+
+When profiling is off, stage() returns a shared no-op context manager and
+count() returns immediately, so instrumented code pays one global lookup
+per call.
+"""
+import json
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+_profiler = None
+
+
+class _NullStage:
+    """Stand-in returned by stage() while profiling is off."""
+    items = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Stage:
+    """One timed stage; use as a context manager (set .items inside if needed)."""
+
+    def __init__(self, profiler, name, items=None, **labels):
+        self.profiler = profiler
+        self.name = name
+        self.items = items
+        self.labels = labels
+
+    def __enter__(self):
+        p = self.profiler
+        self.depth = len(p.stack)
+        if p.trace_memory:
+            # Fold the peak so far into the enclosing stage before resetting it
+            current, peak = tracemalloc.get_traced_memory()
+            if p.stack:
+                p.stack[-1].peak = max(p.stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self.start_memory = current
+        self.peak = 0
+        with p.lock:
+            self.counters_start = dict(p.counters)
+        p.stack.append(self)
+        self.cpu_start = time.process_time()
+        self.wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.wall_start
+        cpu = time.process_time() - self.cpu_start
+        p = self.profiler
+        p.stack.pop()
+
+        record = {'name': self.name, 'depth': self.depth, 'wall': wall, 'cpu': cpu}
+        record.update(self.labels)
+        if p.trace_memory:
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            record['peak_mb'] = max(0, self.peak - self.start_memory) / 1e6
+            if p.stack:
+                p.stack[-1].peak = max(p.stack[-1].peak, self.peak)
+        if self.items is not None:
+            record['items'] = self.items
+        with p.lock:
+            counters = {key: value - self.counters_start.get(key, 0)
+                        for key, value in p.counters.items() if value != self.counters_start.get(key, 0)}
+        if counters:
+            record['counters'] = counters
+        p.stages.append(record)
+        return False
+
+
+class Profiler:
+    """Collects stage records and event counters for one run."""
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.stages = []
+        self.counters = {}
+        self.stack = []
+        self.lock = threading.Lock()  # counters are bumped from fetch threads
+        self.started = time.perf_counter()
+        self.started_tracemalloc = False
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+
+    def close(self):
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+
+    def report(self):
+        """Stages in completion order (nested stages first) plus run totals."""
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        # ru_maxrss is in kilobytes on Linux, bytes on macOS
+        max_rss = usage.ru_maxrss / (1e6 if sys.platform == 'darwin' else 1e3)
+        return {
+            'wall': time.perf_counter() - self.started,
+            'cpu': usage.ru_utime + usage.ru_stime,
+            'max_rss_mb': max_rss,
+            'counters': dict(sorted(self.counters.items())),
+            'stages': list(self.stages),
+        }
+
+
+def enable(trace_memory=True):
+    """Start recording stages and counters (replaces any previous profiler)."""
+    global _profiler
+    disable()
+    _profiler = Profiler(trace_memory)
+    return _profiler
+
+
+def disable():
+    """Stop recording and return the profiler that was active, if any."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if profiler is not None:
+        profiler.close()
+    return profiler
+
+
+def enabled():
+    return _profiler is not None
+
+
+def stage(name, items=None, **labels):
+    """Context manager timing one stage (no-op unless profiling is enabled)."""
+    if _profiler is None:
+        return _NULL_STAGE
+    return Stage(_profiler, name, items, **labels)
+
+
+def count(name, n=1):
+    """Add n to an event counter (no-op unless profiling is enabled)."""
+    if _profiler is None:
+        return
+    with _profiler.lock:
+        _profiler.counters[name] = _profiler.counters.get(name, 0) + n
+
+
+def report():
+    """Report of the active profiler, or None when profiling is off."""
+    return _profiler.report() if _profiler is not None else None
+
+
+def print_report(report):
+    """Console summary: one line per stage, nested stages indented."""
+    print('\n' + '='*80)
+    print('PROFILE')
+    print('='*80)
+    print(f"{'Stage':<40} {'Wall (s)':>9} {'CPU (s)':>9} {'Peak MB':>9} {'Items':>7}  Counters")
+    print('-'*80)
+    # Records are appended on exit; show parents before their children
+    for record in _tree_order(report['stages']):
+        label = ' '.join(str(v) for k, v in record.items()
+                         if k not in ('name', 'depth', 'wall', 'cpu', 'peak_mb', 'items', 'counters'))
+        name = '  ' * record['depth'] + record['name'] + (f' {label}' if label else '')
+        peak = f"{record['peak_mb']:9.1f}" if 'peak_mb' in record else f"{'':>9}"
+        items = f"{record['items']:>7}" if 'items' in record else f"{'':>7}"
+        counters = ', '.join(f'{k}={v}' for k, v in sorted(record.get('counters', {}).items()))
+        print(f"{name[:40]:<40} {record['wall']:9.3f} {record['cpu']:9.3f} {peak} {items}  {counters}")
+    print('-'*80)
+    print(f"{'Total':<40} {report['wall']:9.3f} {report['cpu']:9.3f}   max RSS {report['max_rss_mb']:.0f} MB")
+    if report['counters']:
+        print('Counters: ' + ', '.join(f'{k}={v}' for k, v in sorted(report['counters'].items())))
+
+
+def write_report(report, path):
+    """Write a report as JSON."""
+    path = Path(path)
+    path.write_text(json.dumps(report, indent=2, default=str))
+    print(f'Profile saved to {path}')
+
+
+def _tree_order(stages):
+    """Reorder exit-ordered records so every parent precedes its children."""
+    ordered = []
+    pending = []  # children waiting for their parent, per depth
+    for record in stages:
+        depth = record['depth']
+        children = []
+        while pending and pending[-1][0] > depth:
+            children = pending.pop()[1] + children
+        pending.append((depth, [record] + children))
+    for _, records in pending:
+        ordered.extend(records)
+    return ordered
@@ -0,0 +1,293 @@
+"""
+Performance metrics for backtest portfolio histories.
+
+calc_metrics summarizes one portfolio. metrics_matrix computes the same
+numbers for every column of a (date x portfolio) value matrix in one
+vectorized pass (e.g. for sweeps), and the rolling / benchmark-relative
+helpers below work on the same matrices. compare_portfolios combines them
+into the metrics tables of run_backtest_v2, the sweep and walk_forward.
+"""
+import numpy as np
+import pandas as pd
+
+
+def calc_metrics(df, name):
+    """
+    Summary statistics for one portfolio history ('value' / 'invested' columns).
+
+    Returns total return, CAGR, volatility and max drawdown in percent, and a
+    Sharpe ratio using a 4% risk-free rate. Days with zero value (before the
+    first investment) are ignored.
+    """
+    df_valid = df[df['value'] > 0].copy()
+    if len(df_valid) == 0:
+        return {'name': name, 'invested': 0, 'final': 0, 'return': 0, 'cagr': 0, 'vol': 0, 'sharpe': 0, 'max_dd': 0}
+
+    total_invested = df_valid['invested'].iloc[-1]
+    final_value = df_valid['value'].iloc[-1]
+    total_return = (final_value - total_invested) / total_invested * 100
+
+    years = (df_valid.index[-1] - df_valid.index[0]).days / 365.25
+    first_value = df_valid['value'].iloc[0]
+    cagr = ((final_value / first_value) ** (1/years) - 1) * 100 if first_value > 0 and years > 0 else 0
+
+    daily_ret = df_valid['value'].pct_change().dropna()
+    daily_ret = daily_ret[daily_ret != 0]
+    vol = daily_ret.std() * np.sqrt(252) * 100 if len(daily_ret) > 0 else 0
+    sharpe = (cagr/100 - 0.04) / (vol/100) if vol > 0 else 0
+
+    rolling_max = df_valid['value'].cummax()
+    drawdown = (df_valid['value'] - rolling_max) / rolling_max
+    max_dd = drawdown.min() * 100
+
+    return {
+        'name': name, 'invested': total_invested, 'final': final_value,
+        'return': total_return, 'cagr': cagr, 'vol': vol, 'sharpe': sharpe, 'max_dd': max_dd
+    }
+
+
+# =============================================================================
+# Vectorized metrics for many portfolios at once
+# =============================================================================
+
+TRADING_DAYS = 252
+RISK_FREE_RATE = 0.04
+METRIC_COLUMNS = ['name', 'invested', 'final', 'return', 'cagr', 'vol', 'sharpe', 'max_dd']
+# Tracking error below this fraction of the return volatility is rounding
+# noise (a portfolio that holds the benchmark itself); no information ratio
+TE_TOLERANCE = 1e-8
+
+
+def portfolio_matrix(portfolios):
+    """
+    Align portfolio histories into (date x portfolio) value / invested frames.
+
+    portfolios maps name -> DataFrame with 'value' and 'invested' columns
+    (as returned by the engine); dates missing for a portfolio become NaN.
+    """
+    values = pd.DataFrame({name: df['value'] for name, df in portfolios.items()})
+    invested = pd.DataFrame({name: df['invested'] for name, df in portfolios.items()})
+    return values, invested
+
+
+def _previous_valid(values):
+    """For every row, the last value before it on a row where valid (NaN if none)."""
+    filled = pd.DataFrame(values).ffill().to_numpy()
+    prev = np.full(values.shape, np.nan)
+    prev[1:] = filled[:-1]
+    return prev
+
+
+def _masked_std(x, count):
+    """Column std (ddof=1) ignoring NaN, two-pass like pandas; NaN for count < 2."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.nansum(x, axis=0) / count
+        ss = np.nansum((x - mean) ** 2, axis=0)
+        return np.where(count > 1, np.sqrt(ss / (count - 1)), np.nan)
+
+
+def metrics_matrix(values, invested, names=None):
+    """
+    calc_metrics for every column of a (date x portfolio) value matrix.
+
+    values / invested are DataFrames (or arrays with names given) of the same
+    shape. Each column is treated exactly like calc_metrics treats one
+    portfolio: rows with a non-positive value are dropped, returns are taken
+    between consecutive remaining rows and zero returns are ignored for the
+    volatility. Returns a DataFrame with one calc_metrics row per column.
+    """
+    if names is None:
+        names = list(values.columns)
+    dates = pd.DatetimeIndex(values.index)
+    v = np.asarray(values, dtype=np.float64)
+    inv = np.asarray(invested, dtype=np.float64)
+    n_rows, n_cols = v.shape
+
+    valid = v > 0
+    count = valid.sum(axis=0)
+    has_data = count > 0
+    rows = np.arange(n_rows)[:, None]
+    first = np.where(valid, rows, n_rows).min(axis=0)
+    last = np.where(valid, rows, -1).max(axis=0)
+    first_c, last_c = np.minimum(first, n_rows - 1), np.maximum(last, 0)
+    cols = np.arange(n_cols)
+
+    final_value = v[last_c, cols]
+    first_value = v[first_c, cols]
+    total_invested = inv[last_c, cols]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        total_return = (final_value - total_invested) / total_invested * 100
+        day_index = dates.values.astype('datetime64[D]').astype(np.int64)
+        years = (day_index[last_c] - day_index[first_c]) / 365.25
+        cagr = np.where((first_value > 0) & (years > 0),
+                        ((final_value / first_value) ** (1 / np.where(years > 0, years, 1)) - 1) * 100, 0.0)
+
+        # Returns between consecutive valid rows, zeros dropped
+        masked = np.where(valid, v, np.nan)
+        ret = masked / _previous_valid(masked) - 1
+        ret[~valid] = np.nan
+        ret[ret == 0] = np.nan
+        n_ret = (~np.isnan(ret)).sum(axis=0)
+        vol = np.where(n_ret > 0, _masked_std(ret, n_ret) * np.sqrt(TRADING_DAYS) * 100, 0.0)
+        sharpe = np.where(vol > 0, (cagr / 100 - RISK_FREE_RATE) / (vol / 100), 0.0)
+
+        running_max = np.fmax.accumulate(masked, axis=0)
+        drawdown = np.where(valid, (masked - running_max) / running_max, np.nan)
+        max_dd = np.nanmin(np.where(has_data, drawdown, 0.0), axis=0) * 100
+
+    result = pd.DataFrame({
+        'name': names, 'invested': total_invested, 'final': final_value, 'return': total_return,
+        'cagr': cagr, 'vol': vol, 'sharpe': sharpe, 'max_dd': max_dd,
+    }, columns=METRIC_COLUMNS)
+    result.loc[~has_data, METRIC_COLUMNS[1:]] = 0
+    return result
+
+
+def daily_returns(values, invested=None):
+    """
+    Daily returns of a (date x portfolio) value matrix, NaN where undefined.
+
+    With invested given, new contributions are taken out of the day they
+    arrive on, so rebalance days show the market return rather than the
+    cash added.
+    """
+    v = pd.DataFrame(values)
+    masked = v.where(v > 0)
+    prev = masked.shift(1)
+    gain = masked
+    if invested is not None:
+        gain = masked - pd.DataFrame(invested).diff().fillna(0)
+    return gain / prev - 1
+
+
+def rolling_sharpe(returns, window=TRADING_DAYS, rf=RISK_FREE_RATE, min_periods=None):
+    """
+    Annualized Sharpe ratio over a trailing window of daily returns.
+
+    Computed from running sums of returns and squared returns, i.e. O(n) per
+    column regardless of the window length.
+    """
+    min_periods = window if min_periods is None else min_periods
+    r = np.asarray(returns, dtype=np.float64)
+    ok = ~np.isnan(r)
+    x = np.where(ok, r, 0.0)
+
+    def window_sum(a):
+        c = np.cumsum(a, axis=0)
+        out = c.copy()
+        out[window:] -= c[:-window]
+        return out
+
+    n = window_sum(ok.astype(np.float64))
+    s = window_sum(x)
+    ss = window_sum(x * x)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = s / n
+        var = (ss - n * mean * mean) / (n - 1)
+        std = np.sqrt(np.maximum(var, 0))
+        sharpe = (mean * TRADING_DAYS - rf) / (std * np.sqrt(TRADING_DAYS))
+    sharpe[(n < max(min_periods, 2)) | ~(std > 0)] = np.nan
+    return pd.DataFrame(sharpe, index=getattr(returns, 'index', None), columns=getattr(returns, 'columns', None))
+
+
+def rolling_max(a, window):
+    """
+    Trailing-window maximum along axis 0, ignoring NaN (van Herk/Gil-Werman).
+
+    Uses block-wise prefix and suffix maxima, so it costs O(n) per column for
+    any window length.
+    """
+    a = np.asarray(a, dtype=np.float64)
+    n = len(a)
+    if n == 0:
+        return a.copy()
+    pad = (-n) % window
+    padded = np.concatenate([a, np.full((pad,) + a.shape[1:], np.nan)])
+    blocks = padded.reshape((-1, window) + a.shape[1:])
+    with np.errstate(invalid='ignore'):
+        prefix = np.fmax.accumulate(blocks, axis=1).reshape(padded.shape)[:n]
+        suffix = np.fmax.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(padded.shape)
+    # The first window - 1 rows lie in block 0, where prefix is the running max
+    out = prefix.copy()
+    start = np.arange(n) - window + 1
+    ok = start >= 0
+    out[ok] = np.fmax(suffix[start[ok]], prefix[ok])
+    return out
+
+
+def rolling_drawdown(values, window=TRADING_DAYS):
+    """Drawdown (fraction) from the highest value of the trailing window."""
+    v = pd.DataFrame(values)
+    masked = v.where(v > 0).to_numpy()
+    peak = rolling_max(masked, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        drawdown = (masked - peak) / peak
+    return pd.DataFrame(drawdown, index=v.index, columns=v.columns)
+
+
+def relative_metrics(returns, benchmark_returns, rf=RISK_FREE_RATE):
+    """
+    Tracking error, information ratio, alpha and beta of every column of a
+    (date x portfolio) daily return matrix against one benchmark series.
+
+    Only dates where both returns are known are used. Tracking error and
+    alpha are annualized percentages; alpha is Jensen's alpha over the
+    risk-free rate. The information ratio is NaN when the tracking error is
+    negligible next to the returns themselves (TE_TOLERANCE).
+    """
+    returns = pd.DataFrame(returns)
+    bench = pd.Series(benchmark_returns).reindex(returns.index).to_numpy(dtype=np.float64)
+    r = returns.to_numpy(dtype=np.float64)
+    both = ~np.isnan(r) & ~np.isnan(bench)[:, None]
+    n = both.sum(axis=0)
+    rf_daily = rf / TRADING_DAYS
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rp = np.where(both, r, np.nan)
+        rb = np.where(both, bench[:, None], np.nan)
+        mean_p = np.nansum(rp, axis=0) / n
+        mean_b = np.nansum(rb, axis=0) / n
+        cov = np.nansum((rp - mean_p) * (rb - mean_b), axis=0) / (n - 1)
+        var_b = np.nansum((rb - mean_b) ** 2, axis=0) / (n - 1)
+        beta = cov / var_b
+        alpha = ((mean_p - rf_daily) - beta * (mean_b - rf_daily)) * TRADING_DAYS * 100
+
+        active = rp - rb
+        te = _masked_std(active, n) * np.sqrt(TRADING_DAYS)
+        scale = np.fmax(_masked_std(rp, n), _masked_std(rb, n)) * np.sqrt(TRADING_DAYS)
+        ir = (mean_p - mean_b) * TRADING_DAYS / te
+
+    valid = n > 1
+    return pd.DataFrame({
+        'tracking_error': np.where(valid, te * 100, np.nan),
+        'information_ratio': np.where(valid & (te > TE_TOLERANCE * scale), ir, np.nan),
+        'alpha': np.where(valid, alpha, np.nan),
+        'beta': np.where(valid, beta, np.nan),
+    }, index=returns.columns)
+
+
+def compare_portfolios(portfolios, benchmark=None, window=TRADING_DAYS, names=None):
+    """
+    Point metrics for many portfolios, plus rolling and benchmark-relative
+    statistics.
+
+    portfolios maps name -> engine portfolio history; benchmark is a price
+    series (e.g. SPY) the relative statistics are measured against. Next to
+    the calc_metrics columns, every row has the lowest and median Sharpe
+    ratio over trailing windows of window days and the worst drawdown from a
+    trailing-window peak (percent). Returns one row per portfolio indexed by
+    name (names overrides the keys of portfolios, e.g. for tuple keys).
+    """
+    values, invested = portfolio_matrix(portfolios)
+    table = metrics_matrix(values, invested, names)
+    returns = daily_returns(values, invested)
+    sharpe = rolling_sharpe(returns, window)
+    table['rolling_sharpe_min'] = sharpe.min().to_numpy()
+    table['rolling_sharpe_median'] = sharpe.median().to_numpy()
+    table['rolling_max_dd'] = rolling_drawdown(values, window).min().to_numpy() * 100
+    if benchmark is not None:
+        bench = pd.Series(benchmark).reindex(values.index)
+        relative = relative_metrics(returns, bench.pct_change(fill_method=None))
+        for column in relative.columns:
+            table[column] = relative[column].to_numpy()
+    return table.set_index('name', drop=False)
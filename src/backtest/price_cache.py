@@ -0,0 +1,276 @@
+"""
+Incremental on-disk store for daily prices downloaded with yfinance.
+
+Each ticker gets its own directory of .npy columns (dates plus OHLCV and
+adjusted close) that are memory-mapped when read. An index.json records the
+date range that has already been requested for every ticker, so repeat runs
+only download the missing head / tail ranges and append them.
+
+Yahoo rescales the whole Adj Close history after every dividend or split, so
+rows downloaded later can be on a different basis from the cached ones. Each
+incremental download therefore reaches OVERLAP_DAYS into the cached range;
+when the fresh Adj Close of those days differs from the cached values by more
+than ADJ_TOLERANCE, the ticker's full range is downloaded again and replaces
+its cached rows instead of a false jump being stored at the join.
+
+Ranges that come back empty from a download that otherwise worked (a ticker
+Yahoo has no data for, or a range without trading days) are recorded as
+covered too, so they are not requested again on every run.
+
+Layout:
+    <root>/index.json
+    <root>/<TICKER>/date.npy       datetime64[D], sorted
+    <root>/<TICKER>/<field>.npy    float64, one file per field
+"""
+import json
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from src.backtest import instrumentation
+
+DEFAULT_CACHE_DIR = Path.home() / 'stocks_cache'
+OVERLAP_DAYS = 10  # calendar days re-downloaded next to the cached range
+ADJ_TOLERANCE = 1e-4  # relative Adj Close difference treated as a rebase
+
+# yfinance column -> file name
+FIELDS = {
+    'Open': 'open',
+    'High': 'high',
+    'Low': 'low',
+    'Close': 'close',
+    'Adj Close': 'adj_close',
+    'Volume': 'volume',
+}
+
+
+class PriceStore:
+    """Per-ticker columnar price files with requested-range bookkeeping."""
+
+    def __init__(self, root=None):
+        self.root = Path(root) if root is not None else DEFAULT_CACHE_DIR / 'prices'
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.index_file = self.root / 'index.json'
+        self.index = json.loads(self.index_file.read_text()) if self.index_file.exists() else {}
+
+    # -------------------------------------------------------------------------
+    # Bookkeeping
+    # -------------------------------------------------------------------------
+
+    def tickers(self):
+        """Tickers with data in the store (not those only known to have none)."""
+        return [ticker for ticker in sorted(self.index) if (self.root / ticker / 'date.npy').exists()]
+
+    def coverage(self, ticker):
+        """(start, end) already requested for ticker (end exclusive), or None."""
+        entry = self.index.get(ticker)
+        if entry is None:
+            return None
+        return pd.Timestamp(entry['start']), pd.Timestamp(entry['end'])
+
+    def missing_ranges(self, ticker, start, end):
+        """Date ranges (end exclusive) in [start, end) not yet requested for ticker."""
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        cov = self.coverage(ticker)
+        if cov is None:
+            return [(start, end)]
+        ranges = []
+        if start < cov[0]:
+            ranges.append((start, cov[0]))
+        if end > cov[1]:
+            ranges.append((max(start, cov[1]), end))
+        return ranges
+
+    def with_overlap(self, ticker, rng, days=OVERLAP_DAYS):
+        """A missing range widened by days into the cached range it adjoins (if it has rows)."""
+        cov = self.coverage(ticker)
+        if cov is None or not (self.root / ticker / 'date.npy').exists():
+            return rng
+        start, end = rng
+        pad = pd.Timedelta(days=days)
+        if end == cov[0]:
+            end = min(end + pad, cov[1])
+        if start == cov[1]:
+            start = max(start - pad, cov[0])
+        return start, end
+
+    def rebased(self, ticker, frame, tolerance=ADJ_TOLERANCE):
+        """Whether frame's Adj Close disagrees with the cached rows on common dates."""
+        if 'Adj Close' not in frame:
+            return False
+        fresh = frame['Adj Close'].astype(np.float64)
+        fresh.index = pd.DatetimeIndex(fresh.index).tz_localize(None).normalize()
+        cached = self.read(ticker, fields=['Adj Close'], start=fresh.index.min(),
+                           end=fresh.index.max() + pd.Timedelta(days=1))
+        if cached is None or cached.empty:
+            return False
+        old, new = cached['Adj Close'].align(fresh, join='inner')
+        both = old.notna() & new.notna() & (old != 0)
+        if not both.any():
+            return False
+        return bool((np.abs(new[both] / old[both] - 1) > tolerance).any())
+
+    def mark_covered(self, ticker, start, end):
+        """Record [start, end) as requested for ticker (merged with its current coverage)."""
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        cov = self.coverage(ticker)
+        if cov is not None:
+            start, end = min(start, cov[0]), max(end, cov[1])
+        self.index[ticker] = {'start': start.strftime('%Y-%m-%d'), 'end': end.strftime('%Y-%m-%d')}
+
+    def flush(self):
+        """Write the coverage index to disk (after mark_covered / write)."""
+        tmp = self.index_file.with_suffix('.tmp')
+        tmp.write_text(json.dumps(self.index, indent=1, sort_keys=True))
+        tmp.replace(self.index_file)
+
+    # -------------------------------------------------------------------------
+    # Reading / writing
+    # -------------------------------------------------------------------------
+
+    def read(self, ticker, fields=None, mmap=True, start=None, end=None):
+        """
+        Cached rows for ticker as a DataFrame (None if not cached).
+
+        With start / end only the rows in [start, end) are read; with mmap
+        the rest of the files is never touched.
+        """
+        ticker_dir = self.root / ticker
+        date_file = ticker_dir / 'date.npy'
+        if not date_file.exists():
+            return None
+        mode = 'r' if mmap else None
+        dates = np.load(date_file, mmap_mode=mode)
+        lo = 0 if start is None else int(dates.searchsorted(np.datetime64(pd.Timestamp(start), 'D')))
+        hi = len(dates) if end is None else int(dates.searchsorted(np.datetime64(pd.Timestamp(end), 'D')))
+        fields = list(FIELDS) if fields is None else fields
+        data = {}
+        for field in fields:
+            path = ticker_dir / f'{FIELDS[field]}.npy'
+            data[field] = np.load(path, mmap_mode=mode)[lo:hi] if path.exists() else np.full(hi - lo, np.nan)
+        return pd.DataFrame(data, index=pd.DatetimeIndex(dates[lo:hi], name='Date'))
+
+    def write(self, ticker, frame, replace=False):
+        """Merge frame (DatetimeIndex x FIELDS) into the cached rows for ticker (replace: overwrite them)."""
+        frame = frame.reindex(columns=list(FIELDS)).astype(np.float64)
+        frame.index = pd.DatetimeIndex(frame.index).tz_localize(None).normalize()
+        existing = None if replace else self.read(ticker, mmap=False)
+        if existing is not None:
+            # New rows win over cached ones for the same date
+            frame = pd.concat([existing, frame])
+            frame = frame[~frame.index.duplicated(keep='last')]
+        frame = frame.sort_index()
+
+        ticker_dir = self.root / ticker
+        ticker_dir.mkdir(parents=True, exist_ok=True)
+        np.save(ticker_dir / 'date.npy', frame.index.to_numpy().astype('datetime64[D]'))
+        for field, name in FIELDS.items():
+            np.save(ticker_dir / f'{name}.npy', frame[field].to_numpy(dtype=np.float64))
+
+    def load_field(self, tickers, field='Adj Close', start=None, end=None):
+        """
+        One field for many tickers as a (date x ticker) DataFrame.
+
+        Rows are restricted to [start, end). Tickers missing from the store
+        are left out.
+        """
+        columns = {}
+        for ticker in tickers:
+            frame = self.read(ticker, fields=[field], start=start, end=end)
+            if frame is None:
+                continue
+            columns[ticker] = frame[field]
+        if not columns:
+            return pd.DataFrame(index=pd.DatetimeIndex([], name='Date'))
+        return pd.DataFrame(columns)
+
+    # -------------------------------------------------------------------------
+    # Incremental download
+    # -------------------------------------------------------------------------
+
+    def update(self, tickers, start, end, download=None):
+        """
+        Download the ranges of [start, end) that are not cached yet.
+
+        Tickers with the same missing range are fetched in one batched call.
+        Ranges next to cached data overlap it by OVERLAP_DAYS; tickers whose
+        Adj Close was rebased since are downloaded again in full (see the
+        module docstring). Returns the number of download calls made.
+        """
+        if download is None:
+            import yfinance as yf
+            download = yf.download
+
+        # Never mark dates after today as covered: they have no data yet
+        today = pd.Timestamp.today().normalize()
+        groups = {}
+        for ticker in tickers:
+            missing = [self.with_overlap(ticker, rng) for rng in self.missing_ranges(ticker, start, end)
+                       if rng[0] < min(rng[1], today + pd.Timedelta(days=1))]
+            for rng in missing:
+                groups.setdefault(rng, []).append(ticker)
+            instrumentation.count('cache_misses' if missing else 'cache_hits')
+
+        calls = 0
+        rebased = set()
+        for (range_start, range_end), group in groups.items():
+            raw = download(group, start=range_start.strftime('%Y-%m-%d'), end=range_end.strftime('%Y-%m-%d'),
+                           auto_adjust=False, progress=False, threads=True)
+            calls += 1
+            instrumentation.count('network_calls')
+            frames = {ticker: frame.dropna(how='all') for ticker, frame in _split_download(raw, group)}
+            # An empty result only means "no data" when the call itself
+            # worked: another ticker of the batch got rows, or the range has
+            # no trading days at all (e.g. a weekend)
+            answered = (any(not frame.empty for frame in frames.values())
+                        or len(pd.bdate_range(range_start, range_end - pd.Timedelta(days=1))) == 0)
+            for ticker in group:
+                frame = frames.get(ticker)
+                if ticker in rebased:
+                    continue
+                if frame is None or frame.empty:
+                    if answered:
+                        self.mark_covered(ticker, range_start, min(range_end, today))
+                        instrumentation.count('price_no_data')
+                    continue
+                if self.rebased(ticker, frame):
+                    rebased.add(ticker)
+                    continue
+                self.write(ticker, frame)
+                self.mark_covered(ticker, range_start, min(range_end, today))
+
+        # Full history again for rebased tickers, replacing the cached rows
+        full = {}
+        for ticker in sorted(rebased):
+            cov = self.coverage(ticker)
+            rng = (min(pd.Timestamp(start), cov[0]), max(pd.Timestamp(end), cov[1]))
+            full.setdefault(rng, []).append(ticker)
+        for (range_start, range_end), group in full.items():
+            raw = download(group, start=range_start.strftime('%Y-%m-%d'), end=range_end.strftime('%Y-%m-%d'),
+                           auto_adjust=False, progress=False, threads=True)
+            calls += 1
+            instrumentation.count('network_calls')
+            instrumentation.count('price_rebased', len(group))
+            for ticker, frame in _split_download(raw, group):
+                frame = frame.dropna(how='all')
+                if frame.empty:
+                    continue
+                self.write(ticker, frame, replace=True)
+                self.index[ticker] = {'start': range_start.strftime('%Y-%m-%d'),
+                                      'end': min(range_end, today).strftime('%Y-%m-%d')}
+        self.flush()
+        return calls
+
+
+def _split_download(raw, tickers):
+    """Yield (ticker, DataFrame of FIELDS) from a yf.download result."""
+    if raw is None or raw.empty:
+        return
+    if isinstance(raw.columns, pd.MultiIndex):
+        level = 1 if set(raw.columns.get_level_values(0)) & set(FIELDS) else 0
+        available = set(raw.columns.get_level_values(level))
+        for ticker in tickers:
+            if ticker in available:
+                yield ticker, raw.xs(ticker, axis=1, level=level)
+    elif len(tickers) == 1:
+        yield tickers[0], raw
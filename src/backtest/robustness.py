@@ -0,0 +1,233 @@
+"""
+Monte Carlo robustness check of backtest results (stationary block bootstrap).
+
+A backtest gives one historical path per strategy, so calc_metrics reports
+point estimates only. This module resamples the daily returns of the
+strategies and of SPY together and recomputes CAGR, volatility, Sharpe ratio
+and max drawdown on every synthetic path, so each metric becomes a
+distribution:
+
+    python -m src.backtest.robustness --offline --paths 10000
+
+Resampling uses the stationary bootstrap (Politis & Romano): each path is
+built from blocks of consecutive days with geometrically distributed lengths
+(mean --block days) starting at random days, wrapping around at the end of
+the history. This keeps volatility clustering and short-term autocorrelation
+intact. All series are resampled with the same day indices, so their
+cross-correlation on each path matches history and "strategy beat SPY" can
+be counted path by path.
+
+Returns are contribution-adjusted (metrics.daily_returns), i.e. each path is
+the growth of one dollar. Paths are generated as (paths x days x series)
+arrays in chunks of at most CHUNK_ELEMENTS values per series, spread over a
+process pool; every chunk has its own seed derived from --seed, so results
+do not depend on the number of processes.
+"""
+import argparse
+import multiprocessing
+import os
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from src.backtest.metrics import RISK_FREE_RATE, TRADING_DAYS, daily_returns
+
+BLOCK_LENGTH = 20  # mean block length in trading days
+CHUNK_ELEMENTS = 2_000_000  # days x paths per chunk and series
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+DIST_COLUMNS = ['path', 'series', 'cagr', 'vol', 'sharpe', 'max_dd']
+
+
+def return_matrix(portfolios):
+    """
+    (day x series) contribution-adjusted daily returns of portfolio
+    histories (name -> DataFrame with 'value' / 'invested'), on the days
+    where every series has a return.
+    """
+    values = pd.DataFrame({name: df['value'] for name, df in portfolios.items()})
+    invested = pd.DataFrame({name: df['invested'] for name, df in portfolios.items()})
+    returns = daily_returns(values, invested)
+    return returns[returns.notna().all(axis=1)]
+
+
+def bootstrap_indices(rng, n, paths, days, block_length=BLOCK_LENGTH):
+    """
+    (paths x days) day indices into a history of n days for the stationary
+    bootstrap: a new block starts with probability 1 / block_length.
+    """
+    starts = rng.integers(0, n, size=(paths, days))
+    new_block = rng.random((paths, days)) < 1.0 / block_length
+    new_block[:, 0] = True
+    steps = np.arange(days)
+    # Column where the current block started, for every (path, day)
+    block_start = np.maximum.accumulate(np.where(new_block, steps, 0), axis=1)
+    rows = np.arange(paths)[:, None]
+    return (starts[rows, block_start] + (steps - block_start)) % n
+
+
+def path_metrics(returns):
+    """
+    CAGR, volatility, Sharpe ratio and max drawdown (percent, like
+    calc_metrics) for (paths x days x series) daily returns.
+
+    Years are counted in trading days, and the Sharpe ratio is the CAGR over
+    the risk-free rate divided by the volatility, as in calc_metrics.
+    """
+    growth = np.cumprod(1.0 + returns, axis=1)
+    years = returns.shape[1] / TRADING_DAYS
+    cagr = growth[:, -1] ** (1 / years) - 1
+    vol = returns.std(axis=1, ddof=1) * np.sqrt(TRADING_DAYS)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sharpe = np.where(vol > 0, (cagr - RISK_FREE_RATE) / vol, 0.0)
+    # Drawdowns against the running peak, starting from the initial dollar
+    peak = np.maximum(np.maximum.accumulate(growth, axis=1), 1.0)
+    max_dd = np.minimum((growth / peak - 1).min(axis=1), 0.0)
+    return {'cagr': cagr * 100, 'vol': vol * 100, 'sharpe': sharpe, 'max_dd': max_dd * 100}
+
+
+def simulate_chunk(returns, paths, days, seed, block_length=BLOCK_LENGTH):
+    """Metrics for `paths` bootstrap paths of `days` days from one seed."""
+    rng = np.random.default_rng(seed)
+    idx = bootstrap_indices(rng, len(returns), paths, days, block_length)
+    return path_metrics(returns[idx])
+
+
+def chunk_sizes(paths, days, chunk_elements=CHUNK_ELEMENTS):
+    """Split paths into chunks of at most chunk_elements (paths x days) values."""
+    per_chunk = max(1, chunk_elements // max(days, 1))
+    sizes = [per_chunk] * (paths // per_chunk)
+    if paths % per_chunk:
+        sizes.append(paths % per_chunk)
+    return sizes
+
+
+# Per-worker state, set once by _init_worker
+_returns = None
+
+
+def _init_worker(returns):
+    global _returns
+    _returns = returns
+
+
+def _run_chunk(job):
+    paths, days, seed, block_length = job
+    return simulate_chunk(_returns, paths, days, seed, block_length)
+
+
+def bootstrap(returns, paths=10_000, days=None, block_length=BLOCK_LENGTH, seed=0, processes=None,
+              chunk_elements=CHUNK_ELEMENTS):
+    """
+    Metric distributions over bootstrap paths of a (day x series) return
+    matrix (see return_matrix).
+
+    days defaults to the length of the history. Returns a long DataFrame
+    with one row per (path, series) and the columns of DIST_COLUMNS.
+    processes=1 runs in-process; otherwise chunks go to a process pool.
+    """
+    names = list(returns.columns)
+    r = np.ascontiguousarray(returns.to_numpy(dtype=np.float64))
+    days = len(r) if days is None else days
+    sizes = chunk_sizes(paths, days, chunk_elements)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(size, days, child, block_length) for size, child in zip(sizes, seeds)]
+
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(jobs) == 1:
+        _init_worker(r)
+        chunks = [_run_chunk(job) for job in jobs]
+    else:
+        with multiprocessing.Pool(min(processes, len(jobs)), initializer=_init_worker, initargs=(r,)) as pool:
+            chunks = pool.map(_run_chunk, jobs)
+
+    # (paths x series) per metric, then one row per (path, series)
+    metrics = {key: np.concatenate([chunk[key] for chunk in chunks]) for key in DIST_COLUMNS[2:]}
+    path_ids = np.repeat(np.arange(paths), len(names))
+    frame = {'path': path_ids, 'series': np.tile(np.array(names, dtype=object), paths)}
+    frame.update({key: values.ravel() for key, values in metrics.items()})
+    return pd.DataFrame(frame, columns=DIST_COLUMNS)
+
+
+def summarize(dist, quantiles=QUANTILES):
+    """Quantiles of every metric per series: rows (series, metric), one column per quantile."""
+    table = dist.groupby('series', sort=False)[DIST_COLUMNS[2:]].quantile(list(quantiles)).unstack(level=-1)
+    table = table.stack(level=0, future_stack=True)
+    table.columns = [f'p{round(q * 100):02d}' for q in table.columns]
+    return table
+
+
+def outperformance(dist, benchmark):
+    """Share of paths on which each series beat the benchmark, per metric (max_dd: shallower)."""
+    wide = dist.pivot(index='path', columns='series')
+    result = {}
+    for metric in DIST_COLUMNS[2:]:
+        if metric == 'vol':
+            continue
+        values = wide[metric]
+        result[metric] = (values.gt(values[benchmark], axis=0)).mean()
+    return pd.DataFrame(result).drop(index=benchmark)
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def main():
+    from src.backtest.config import ANNUAL_INVESTMENT, CACHE_DIR, REBALANCE_DATES
+    from src.backtest.schedule import (
+        FREQUENCIES, add_asof_argument, period_investment, rebalance_schedule, resolve_asof,
+    )
+    from src.backtest.session import BacktestSession
+
+    parser = argparse.ArgumentParser(description='Block-bootstrap robustness check of the V2 strategies')
+    parser.add_argument('--paths', type=int, default=10_000)
+    parser.add_argument('--years', type=float, default=None, help='Path length (default: length of the history)')
+    parser.add_argument('--block', type=float, default=BLOCK_LENGTH, help='Mean block length in trading days')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--rebalance', choices=sorted(FREQUENCIES), default=None)
+    add_asof_argument(parser)
+    parser.add_argument('--offline', action='store_true', help='Run entirely from the local cache')
+    parser.add_argument('--cache-dir', type=Path, default=CACHE_DIR)
+    parser.add_argument('--output', type=Path, default=Path('robustness.parquet'),
+                        help='Per-path metrics (Parquet)')
+    args = parser.parse_args()
+
+    session = BacktestSession(cache_dir=args.cache_dir, offline=args.offline)
+    if args.rebalance is None:
+        schedule = {'rebalance_dates': tuple(REBALANCE_DATES), 'investment': ANNUAL_INVESTMENT}
+    else:
+        schedule = {'rebalance_dates': tuple(rebalance_schedule(args.rebalance)),
+                    'investment': period_investment(args.rebalance)}
+    results = session.run_many({'Value-Only': 'value', 'Multi-Factor': 'multifactor'},
+                               benchmarks={'S&P 500': session.data.spy},
+                               asof=resolve_asof(args.asof, args.rebalance), **schedule)
+    portfolios = {name: portfolio for name, (portfolio, _) in results.items()}
+
+    returns = return_matrix(portfolios)
+    days = None if args.years is None else int(round(args.years * 252))
+    print(f'\nBootstrapping {args.paths:,} paths of {days or len(returns)} days '
+          f'(history: {len(returns)} days, mean block {args.block:g} days)...')
+    start = time.perf_counter()
+    dist = bootstrap(returns, args.paths, days, args.block, args.seed, args.processes)
+    print(f'  Done in {time.perf_counter() - start:.1f}s')
+
+    # The historical path on the same (contribution-adjusted) basis
+    historical = path_metrics(returns.to_numpy(dtype=np.float64)[None])
+    print('\nHistorical (growth of $1):')
+    for i, name in enumerate(returns.columns):
+        print(f"  {name:<14} CAGR {historical['cagr'][0, i]:6.1f}%  Sharpe {historical['sharpe'][0, i]:5.2f}  "
+              f"Max DD {historical['max_dd'][0, i]:6.1f}%")
+    pd.set_option('display.float_format', '{:.2f}'.format)
+    print('\nBootstrap quantiles:')
+    print(summarize(dist).to_string())
+    print('\nShare of paths beating the S&P 500:')
+    print(outperformance(dist, 'S&P 500').to_string())
+
+    dist.to_parquet(args.output, compression='zstd')
+    print(f'\nPer-path metrics saved to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
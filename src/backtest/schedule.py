@@ -0,0 +1,89 @@
+"""
+Rebalance calendars for the backtests.
+
+REBALANCE_DATES in config.py is a hand-picked annual calendar. This module
+generates calendars of any frequency from an anchor date, so the same
+experiment can be run with quarterly, monthly or weekly rebalancing:
+
+    dates = rebalance_schedule('monthly', start='2021-04-01', end='2026-01-22')
+    investment = period_investment('monthly')   # ANNUAL_INVESTMENT / 12
+
+Dates are calendar dates ('YYYY-MM-DD'); the engine executes each one on the
+first trading day on or after it, as it does for REBALANCE_DATES.
+"""
+import argparse
+import pandas as pd
+
+from src.backtest.config import ANNUAL_INVESTMENT, END_DATE, REBALANCE_DATES
+
+# Rebalances per year
+FREQUENCIES = {'annual': 1, 'quarterly': 4, 'monthly': 12, 'weekly': 52}
+
+# Step between consecutive rebalances
+_STEPS = {
+    'annual': pd.DateOffset(years=1),
+    'quarterly': pd.DateOffset(months=3),
+    'monthly': pd.DateOffset(months=1),
+    'weekly': pd.DateOffset(weeks=1),
+}
+
+
+def rebalance_schedule(frequency='annual', start=REBALANCE_DATES[0], end=END_DATE, dates=None):
+    """
+    Rebalance dates from start (the anchor) up to, but excluding, end.
+
+    Steps are taken from the anchor, so a monthly schedule starting on
+    2021-04-01 rebalances on the first of every month and an annual one every
+    April 1st. frequency='custom' returns the given dates, sorted and
+    de-duplicated.
+    """
+    if frequency == 'custom':
+        if dates is None:
+            raise ValueError("frequency='custom' needs dates")
+        return sorted({pd.Timestamp(d).strftime('%Y-%m-%d') for d in dates})
+    if frequency not in _STEPS:
+        raise ValueError(f'Unknown frequency: {frequency} (expected one of {sorted(FREQUENCIES)} or custom)')
+
+    anchor, end = pd.Timestamp(start), pd.Timestamp(end)
+    schedule = []
+    k = 0
+    while True:
+        # Offsets from the anchor (not chained) keep month-end anchors stable
+        date = anchor + _STEPS[frequency] * k
+        if date >= end:
+            break
+        schedule.append(date.strftime('%Y-%m-%d'))
+        k += 1
+    return schedule
+
+
+def period_investment(frequency='annual', annual=ANNUAL_INVESTMENT):
+    """
+    Cash added at each rebalance so that the yearly total stays `annual`.
+
+    Custom calendars invest `annual` at every date, like REBALANCE_DATES.
+    """
+    return annual / FREQUENCIES.get(frequency, 1)
+
+
+def needs_asof(frequency):
+    """
+    Whether a generated calendar needs fundamentals resolved as of each
+    rebalance date. The default fiscal-year lookup (date.year - 1) is only
+    free of look-ahead for the April calendar (REBALANCE_DATES, or 'annual'
+    anchored on its first date), when last year's reports are out; other
+    frequencies rebalance in January-March too.
+    """
+    return frequency not in (None, 'annual')
+
+
+def resolve_asof(asof, frequency):
+    """An explicit --asof / --no-asof, else needs_asof(frequency)."""
+    return needs_asof(frequency) if asof is None else asof
+
+
+def add_asof_argument(parser):
+    """--asof / --no-asof for scripts with a --rebalance option (see resolve_asof)."""
+    parser.add_argument('--asof', action=argparse.BooleanOptionalAction, default=None,
+                        help='Use the latest SimFin statements published by each rebalance date (default: on '
+                             'for every --rebalance calendar except annual; --no-asof: the previous fiscal year)')
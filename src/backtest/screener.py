@@ -0,0 +1,291 @@
+"""
+Vectorized cross-sectional screener for the value and multi-factor strategies.
+
+Instead of slicing the price history and calling the P/E, market cap and
+momentum helpers once per ticker, every metric is computed for the whole
+universe from a single row of the price matrix, the filters are applied as
+boolean masks and ranking / top-N selection is done with array operations.
+
+Selections are identical to the original per-ticker loops, including the
+order of tied candidates (ties are broken exactly like pandas' default
+quicksort-based sort_values).
+"""
+import numpy as np
+import pandas as pd
+
+from src.backtest.factors import FactorCache
+
+
+def rank_average(values, ascending=True):
+    """Rank values 1..n, giving ties their average rank (like Series.rank())."""
+    n = len(values)
+    keys = values if ascending else -values
+    order = np.argsort(keys, kind='mergesort')
+    sorted_keys = keys[order]
+    starts = np.r_[0, np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1]
+    ends = np.r_[starts[1:], n]
+    ranks = np.empty(n)
+    ranks[order] = np.repeat((starts + ends + 1) / 2, ends - starts)
+    return ranks
+
+
+def sort_order(values, ascending=True):
+    """Positions that sort values, breaking ties like DataFrame.sort_values()."""
+    if ascending:
+        return np.argsort(values, kind='quicksort')
+    # pandas sorts the reversed array and reverses the result for descending
+    reversed_idx = np.arange(len(values))[::-1]
+    order = reversed_idx[values[::-1].argsort(kind='quicksort')]
+    return order[::-1]
+
+
+class Screener:
+    """
+    Screens all tickers of a price matrix on a given date.
+
+    fundamentals is a FundamentalsStore; eps_fallback (ticker -> EPS) is used
+    for fiscal years >= fallback_year when SimFin has no data; market_caps
+    (ticker -> current market cap) are scaled by price when SimFin has no
+    share count. current_prices defaults to the last row of prices_df.
+    factors is a FactorCache over prices_df (an in-memory one by default);
+    momentum is read from its precomputed matrix one row per date. universe
+    is an optional universe.Membership: only tickers that were index members on
+    the rebalance date are eligible (point-in-time universe).
+
+    By default the fundamentals in effect on a date are those of fiscal year
+    date.year - 1, which assumes calendar fiscal years filed by April. With
+    asof=True they are those of each ticker's latest statement published on
+    or before the date (FundamentalsStore.asof), which is correct for any
+    fiscal calendar and rebalance date.
+
+    Fundamentals only change when a new fiscal year becomes current, so the
+    EPS, shares and EPS growth vectors are built once per fiscal year and
+    reused by every rebalance in that year (and by shallow copies of the
+    screener, e.g. sweep grid points). Frequent rebalancing then only pays
+    for the price-dependent part of the screen.
+    """
+
+    def __init__(self, prices_df, fundamentals, eps_fallback=None, market_caps=None,
+                 current_prices=None, factors=None, fallback_year=2024, min_market_cap=10e9,
+                 pe_multiplier=0.5, momentum_lookback=126, universe=None, asof=False):
+        self.prices_df = prices_df
+        self.fundamentals = fundamentals
+        self.tickers = np.asarray(prices_df.columns, dtype=object)
+        self.dates = prices_df.index
+        self.values = prices_df.to_numpy(dtype=np.float64)
+        self.rows = fundamentals.rows_for(self.tickers)
+
+        eps_fallback = eps_fallback or {}
+        market_caps = market_caps or {}
+        self.eps_fallback = np.array([eps_fallback.get(t, np.nan) for t in self.tickers], dtype=np.float64)
+        self.market_caps = np.array([market_caps.get(t, np.nan) for t in self.tickers], dtype=np.float64)
+        if current_prices is None:
+            self.current_prices = self.values[-1] if len(self.values) else np.full(len(self.tickers), np.nan)
+        else:
+            self.current_prices = current_prices.reindex(prices_df.columns).to_numpy(dtype=np.float64)
+
+        self.factors = factors if factors is not None else FactorCache(prices_df)
+        self.by_fiscal_year = {}
+        self.by_asof = {}
+        self.asof = asof
+        self.universe = universe
+        self.universe_ids = universe.ids(self.tickers) if universe is not None else None
+
+        self.fallback_year = fallback_year
+        self.min_market_cap = min_market_cap
+        self.pe_multiplier = pe_multiplier
+        self.momentum_lookback = momentum_lookback
+
+    @classmethod
+    def for_rows(cls, tickers, fundamentals, current_prices, **kwargs):
+        """
+        Screener without a resident price matrix (see streaming.py): every
+        select_* call must pass that date's price row (and momentum row).
+        current_prices is an array aligned with tickers.
+        """
+        tickers = list(tickers)
+        empty = pd.DataFrame(np.empty((0, len(tickers))), index=pd.DatetimeIndex([]), columns=tickers)
+        return cls(empty, fundamentals, current_prices=pd.Series(current_prices, index=tickers), **kwargs)
+
+    # -------------------------------------------------------------------------
+    # Per-date metric rows
+    # -------------------------------------------------------------------------
+
+    def position(self, date):
+        """Row of the last price on or before date (-1 if none)."""
+        return int(self.dates.searchsorted(date, side='right')) - 1
+
+    def fiscal_year_data(self, fiscal_year):
+        """EPS (with fallback), shares and EPS growth for one fiscal year, built once."""
+        data = self.by_fiscal_year.get(fiscal_year)
+        if data is None:
+            eps = self.fundamentals.eps_for_year(self.rows, fiscal_year)
+            if fiscal_year >= self.fallback_year:
+                eps = np.where(np.isnan(eps), self.eps_fallback, eps)
+            data = {
+                'eps': eps,
+                'shares': self.fundamentals.shares_for_year(self.rows, fiscal_year),
+                'eps_growth': self.fundamentals.eps_growth(self.rows, fiscal_year),
+            }
+            self.by_fiscal_year[fiscal_year] = data
+        return data
+
+    def asof_data(self, date):
+        """
+        EPS, shares and EPS growth of the latest statements published by date,
+        built once per distinct set of published statements. Tickers without
+        any statement get the EPS fallback from fallback_year on.
+        """
+        use_fallback = date.year - 1 >= self.fallback_year
+        key = (self.fundamentals.asof_key(date), use_fallback)
+        data = self.by_asof.get(key)
+        if data is None:
+            data = self.fundamentals.asof(self.rows, date)
+            if use_fallback:
+                data['eps'] = np.where(np.isnan(data['eps']), self.eps_fallback, data['eps'])
+            self.by_asof[key] = data
+        return data
+
+    def fundamentals_data(self, date):
+        """Fundamentals in effect on date (by fiscal year, or as of date with asof=True)."""
+        if self.asof:
+            return self.asof_data(date)
+        return self.fiscal_year_data(date.year - 1)
+
+    def eps(self, date):
+        """Trailing EPS: SimFin (see fundamentals_data), else the fallback."""
+        return self.fundamentals_data(date)['eps']
+
+    def shares(self, date):
+        """Diluted shares outstanding from the statement in effect on date."""
+        return self.fundamentals_data(date)['shares']
+
+    def eps_growth(self, date):
+        """EPS growth between the statement in effect and the fiscal year before it."""
+        return self.fundamentals_data(date)['eps_growth']
+
+    def momentum(self, date):
+        """Momentum for every ticker as of date."""
+        return self.factors.momentum_row(self.position(date), self.momentum_lookback)
+
+    def metrics(self, date, with_momentum=False, price=None, momentum=None):
+        """
+        Price, P/E and market cap (plus EPS growth and momentum if requested)
+        for every ticker, NaN wherever the metric is unavailable.
+
+        price / momentum rows for date can be passed in instead of being read
+        from the price and factor matrices.
+        """
+        pos = self.position(date)
+        if price is None:
+            price = np.full(len(self.tickers), np.nan) if pos < 0 else self.values[pos]
+        price = np.where(price > 0, price, np.nan)
+
+        eps = self.eps(date)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pe = np.where(eps > 0, price / eps, np.nan)
+
+            # Historical market cap from shares, else current cap scaled by price
+            shares = self.shares(date)
+            scaled = np.where(self.current_prices > 0,
+                              self.market_caps * (price / self.current_prices), np.nan)
+        market_cap = np.where(np.isnan(shares), scaled, price * shares)
+
+        metrics = {'price': price, 'pe_ratio': pe, 'market_cap': market_cap}
+        if with_momentum:
+            metrics['eps_growth'] = self.eps_growth(date)
+            if momentum is None:
+                momentum = self.factors.momentum_row(pos, self.momentum_lookback)
+            metrics['momentum'] = momentum
+        return metrics
+
+    def in_universe(self, date):
+        """Tickers eligible on date (all of them without a universe)."""
+        if self.universe is None:
+            return np.ones(len(self.tickers), dtype=bool)
+        return self.universe.mask(date, self.universe_ids)
+
+    def value_mask(self, metrics):
+        """Large cap, positive P/E and P/E < multiplier x market cap (billions)."""
+        pe = metrics['pe_ratio']
+        mcap_billions = metrics['market_cap'] / 1e9
+        keep = ~np.isnan(metrics['price']) & ~np.isnan(pe) & ~np.isnan(mcap_billions)
+        keep &= ~(mcap_billions < self.min_market_cap / 1e9)
+        keep &= ~(pe <= 0)
+        keep &= ~(pe >= self.pe_multiplier * mcap_billions)
+        return keep
+
+    # -------------------------------------------------------------------------
+    # Strategies
+    # -------------------------------------------------------------------------
+
+    def select_value(self, date, num_stocks=25, price=None):
+        """Value-only: pass the value filters, top num_stocks by market cap."""
+        m = self.metrics(date, price=price)
+        idx = np.flatnonzero(self.value_mask(m) & self.in_universe(date))
+        if len(idx) == 0:
+            return []
+
+        idx = idx[sort_order(m['market_cap'][idx], ascending=False)][:num_stocks]
+        return [
+            {
+                'ticker': self.tickers[i],
+                'market_cap': float(m['market_cap'][i]),
+                'pe_ratio': float(m['pe_ratio'][i]),
+                'price': float(m['price'][i]),
+            }
+            for i in idx
+        ]
+
+    def select_multifactor(self, date, num_stocks=25, price=None, momentum=None):
+        """
+        Multi-factor: value filters, positive momentum and non-negative EPS
+        growth (when known), ranked by value + growth + momentum ranks.
+
+        EPS growth is optional to handle years where historical data is
+        unavailable (e.g. 2019 data aged out of the SimFin free tier): stocks
+        missing it get the median growth rank, stocks with negative growth
+        are excluded.
+        """
+        m = self.metrics(date, with_momentum=True, price=price, momentum=momentum)
+        growth = m['eps_growth']
+        momentum = m['momentum']
+        keep = self.value_mask(m) & self.in_universe(date) & ~np.isnan(momentum)
+        keep &= ~(~np.isnan(growth) & (growth <= 0))
+        keep &= ~(momentum <= 0)
+        idx = np.flatnonzero(keep)
+        if len(idx) == 0:
+            return []
+
+        n = len(idx)
+        value_rank = rank_average(m['pe_ratio'][idx], ascending=True)
+        momentum_rank = rank_average(momentum[idx], ascending=False)
+
+        # Stocks missing EPS growth get the median growth rank (neutral)
+        cand_growth = growth[idx]
+        has_growth = ~np.isnan(cand_growth)
+        growth_rank = np.full(n, n / 2)
+        if has_growth.any():
+            ranks = rank_average(cand_growth[has_growth], ascending=False)
+            growth_rank[has_growth] = ranks
+            if not has_growth.all():
+                growth_rank[~has_growth] = np.median(ranks)
+
+        composite = value_rank + growth_rank + momentum_rank
+        order = sort_order(composite, ascending=True)[:num_stocks]
+        any_growth = has_growth.any()
+        return [
+            {
+                'ticker': self.tickers[idx[j]],
+                'market_cap': float(m['market_cap'][idx[j]]),
+                'pe_ratio': float(m['pe_ratio'][idx[j]]),
+                'eps_growth': float(cand_growth[j]) if any_growth else None,
+                'momentum': float(momentum[idx[j]]),
+                'price': float(m['price'][idx[j]]),
+                'value_rank': float(value_rank[j]),
+                'momentum_rank': float(momentum_rank[j]),
+                'growth_rank': float(growth_rank[j]),
+                'composite_score': float(composite[j]),
+            }
+            for j in order
+        ]
@@ -0,0 +1,140 @@
+"""
+Long-lived backtest session that keeps data resident between runs.
+
+Loading SimFin, constituents, prices and yfinance fundamentals is the slow
+part of a backtest. A BacktestSession does it once and then answers repeated
+"run strategy X with params Y" requests in milliseconds, e.g. from a
+notebook:
+
+    from src.backtest.session import BacktestSession
+    session = BacktestSession(offline=True)
+    portfolio = session.run('multifactor', num_stocks=10)
+    session.evaluate('value', pe_multiplier=0.3)
+    results = session.run_many({'Value': 'value', 'MF': 'multifactor'}, benchmarks={'SPY': session.data.spy})
+
+Before every request the session stats the files it was loaded from (SimFin
+CSV, price index, JSON snapshots) and reloads from the caches if any of them
+changed, e.g. because another process refreshed prices.
+"""
+from pathlib import Path
+
+from src.backtest.config import CACHE_DIR, DATA_START_DATE, END_DATE, SIMFIN_INCOME_FILE
+from src.backtest.data import load_backtest_data, price_dir
+from src.backtest.metrics import calc_metrics
+from src.backtest.strategies import run_strategies
+from src.backtest.sweep import DEFAULT_PARAMS, SCREENER_PARAMS, param_grid, run_params, run_portfolio, run_sweep
+
+
+class BacktestSession:
+    """Loads backtest data once and reruns strategies against it."""
+
+    def __init__(self, simfin_file=SIMFIN_INCOME_FILE, start=DATA_START_DATE, end=END_DATE,
+                 cache_dir=CACHE_DIR, offline=False, price_source='yfinance', universe='current', auto_reload=True,
+                 **fetch_kwargs):
+        self.simfin_file = Path(simfin_file)
+        self.start = start
+        self.end = end
+        self.cache_dir = Path(cache_dir)
+        self.offline = offline
+        self.price_source = price_source
+        self.universe = universe
+        self.auto_reload = auto_reload
+        self.fetch_kwargs = fetch_kwargs
+        self._data = None
+        self._screener = None
+        self._signature = None
+
+    # -------------------------------------------------------------------------
+    # Data lifecycle
+    # -------------------------------------------------------------------------
+
+    def watched_files(self):
+        """Files whose changes trigger a reload."""
+        files = [
+            self.simfin_file,
+            self.cache_dir / 'universe' / 'snapshots',  # directory mtime changes with new snapshots
+            self.cache_dir / 'universe' / 'changes.json',
+            price_dir(self.cache_dir, 'yfinance') / 'index.json',
+            self.cache_dir / 'yf_fundamentals_2025.json',
+            self.cache_dir / 'market_caps.json',
+        ]
+        if self.price_source != 'yfinance':
+            files.append(price_dir(self.cache_dir, self.price_source) / 'index.json')
+        return files
+
+    def _cache_signature(self):
+        signature = []
+        for path in self.watched_files():
+            try:
+                stat = path.stat()
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def reload(self, offline=None):
+        """(Re)load all data; later reloads read the caches only by default."""
+        offline = self.offline if offline is None else offline
+        self._data = load_backtest_data(self.simfin_file, self.start, self.end, self.cache_dir,
+                                        offline=offline, price_source=self.price_source, universe=self.universe,
+                                        **self.fetch_kwargs)
+        self._screener = self._data.screener()
+        # Taken after loading, since an online load rewrites the caches itself
+        self._signature = self._cache_signature()
+        return self._data
+
+    @property
+    def data(self):
+        """The resident BacktestData, reloaded from the caches if they changed."""
+        if self._data is None:
+            self.reload()
+        elif self.auto_reload and self._cache_signature() != self._signature:
+            print('Cache changed on disk, reloading...')
+            self.reload(offline=True)
+        return self._data
+
+    # -------------------------------------------------------------------------
+    # Requests
+    # -------------------------------------------------------------------------
+
+    def params(self, strategy='multifactor', **overrides):
+        """Full parameter set: DEFAULT_PARAMS with overrides applied."""
+        unknown = set(overrides) - set(DEFAULT_PARAMS)
+        if unknown:
+            raise ValueError(f'Unknown parameters: {sorted(unknown)}')
+        params = dict(DEFAULT_PARAMS, strategy=strategy, **overrides)
+        params['rebalance_dates'] = tuple(params['rebalance_dates'])
+        return params
+
+    def run(self, strategy='multifactor', name=None, verbose=False, with_holdings=False, **overrides):
+        """Daily portfolio history (and holdings log) for one strategy / parameter set."""
+        data = self.data
+        return run_portfolio(data, self.params(strategy, **overrides), self._screener, name, verbose, with_holdings)
+
+    def run_many(self, strategies, benchmarks=None, verbose=False, **overrides):
+        """
+        Several strategies and benchmarks in one shared pass (see
+        strategies.run_strategies); overrides apply to all of them.
+        """
+        data = self.data
+        params = self.params(**overrides)
+        shared = {key: params[key] for key in SCREENER_PARAMS}
+        specs = {}
+        for name, spec in strategies.items():
+            strategy, own = (spec, {}) if isinstance(spec, str) else spec
+            specs[name] = (strategy, dict(shared, **own))
+        return run_strategies(data, specs, benchmarks, params['rebalance_dates'], params['investment'],
+                              params['num_stocks'], self._screener, verbose)
+
+    def evaluate(self, strategy='multifactor', **overrides):
+        """calc_metrics row (plus parameters) for one strategy / parameter set."""
+        data = self.data
+        return run_params(data, self.params(strategy, **overrides), self._screener)
+
+    def metrics(self, portfolio, name):
+        """calc_metrics for a portfolio history returned by run()."""
+        return calc_metrics(portfolio, name)
+
+    def sweep(self, processes=None, **axes):
+        """Parameter sweep over the resident data (see sweep.param_grid)."""
+        return run_sweep(self.data, param_grid(**axes), processes=processes)
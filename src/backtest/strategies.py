@@ -0,0 +1,121 @@
+"""
+Strategy registry and a runner that backtests many strategies in one pass.
+
+A strategy is a selection function registered under a name:
+
+    @register('value')
+    def select_value(screener, date, num_stocks, rows):
+        return screener.select_value(date, num_stocks, price=rows.price)
+
+rows is a SharedRows for the rebalance date: the price row and the momentum
+rows are read from the price / factor matrices once per date and shared by
+every strategy selecting on that date, so adding a strategy to a run only
+adds its own selection logic. run_strategies() evaluates any number of
+registered strategies (each with its own screener parameters) together with
+dollar-cost-averaging benchmarks such as SPY:
+
+    results = run_strategies(data, {'Value-Only': 'value', 'Multi-Factor': 'multifactor'},
+                             benchmarks={'S&P 500': data.spy})
+    value_portfolio, value_holdings = results['Value-Only']
+"""
+import copy
+
+from src.backtest import engine
+from src.backtest.config import ANNUAL_INVESTMENT, NUM_STOCKS, REBALANCE_DATES
+
+STRATEGIES = {}
+
+
+def register(name):
+    """Decorator registering select(screener, date, num_stocks, rows) under name."""
+    def decorator(select):
+        STRATEGIES[name] = select
+        return select
+    return decorator
+
+
+@register('value')
+def select_value(screener, date, num_stocks, rows):
+    """Value-only: large caps with a low P/E, top num_stocks by market cap."""
+    return screener.select_value(date, num_stocks, price=rows.price)
+
+
+@register('multifactor')
+def select_multifactor(screener, date, num_stocks, rows):
+    """Value filters plus EPS growth and momentum, ranked by composite score."""
+    return screener.select_multifactor(date, num_stocks, price=rows.price,
+                                       momentum=rows.momentum(screener.momentum_lookback))
+
+
+class SharedRows:
+    """Per-date price and momentum rows, read once and shared by all strategies."""
+
+    def __init__(self, screener, date):
+        self.screener = screener
+        self.date = date
+        self.position = screener.position(date)
+        self.price = screener.values[self.position] if self.position >= 0 else None
+        self._momentum = {}
+
+    def momentum(self, lookback):
+        row = self._momentum.get(lookback)
+        if row is None:
+            row = self.screener.factors.momentum_row(self.position, lookback)
+            self._momentum[lookback] = row
+        return row
+
+
+def run_strategies(data, strategies, benchmarks=None, rebalance_dates=REBALANCE_DATES,
+                   investment=ANNUAL_INVESTMENT, num_stocks=NUM_STOCKS, base_screener=None, verbose=False,
+                   selections=None, asof=None):
+    """
+    Backtest strategies and benchmarks together over data (a BacktestData).
+
+    strategies maps a display name to a registered strategy name, or to a
+    (strategy name, screener params) pair, e.g.
+    {'MF 63d': ('multifactor', {'momentum_lookback': 63})}. benchmarks maps
+    a display name to a price series that is bought at every rebalance.
+    Returns name -> (portfolio, holdings) as engine.simulate() does.
+
+    asof=True resolves fundamentals as of each rebalance date
+    (Screener.asof) for every strategy; None keeps the screener's setting.
+
+    Picks only depend on the date, so callers running the same strategies on
+    overlapping calendars (walk_forward.py) can pass the same selections dict
+    to every call to reuse them per (name, date, num_stocks, asof).
+    """
+    if base_screener is None:
+        base_screener = data.screener(asof=bool(asof))
+    shared = {}
+
+    def rows_for(date):
+        # Only the current date is kept; every strategy selects on it in turn
+        if date not in shared:
+            shared.clear()
+            shared[date] = SharedRows(base_screener, date)
+        return shared[date]
+
+    funcs = {}
+    for name, spec in strategies.items():
+        strategy, params = (spec, {}) if isinstance(spec, str) else spec
+        if asof is not None:
+            params = dict(params, asof=asof)
+        if strategy not in STRATEGIES:
+            raise ValueError(f'Unknown strategy: {strategy} (registered: {sorted(STRATEGIES)})')
+        screener = copy.copy(base_screener)
+        for key, value in params.items():
+            setattr(screener, key, value)
+        select = STRATEGIES[strategy]
+        funcs[name] = (lambda prices_df, date, n, name=name, select=select, screener=screener:
+                       pick(name, select, screener, date, n))
+
+    def pick(name, select, screener, date, n):
+        if selections is None:
+            return select(screener, date, n, rows_for(date))
+        key = (name, date, n, screener.asof)
+        if key not in selections:
+            selections[key] = select(screener, date, n, rows_for(date))
+        return selections[key]
+
+    return engine.simulate_many(funcs, data.prices, list(rebalance_dates), investment, num_stocks, verbose,
+                                benchmarks)
@@ -0,0 +1,366 @@
+"""
+Out-of-core backtest engine that streams prices date by date.
+
+engine.simulate() works on the whole (date x ticker) price frame, which
+load_backtest_data() builds in memory (plus a second copy for ffill/bfill).
+Here the matrix lives on disk instead: build_price_matrix() writes it once
+from a PriceStore as a memory-mapped .npy file, forward/back-filled exactly
+like load_backtest_data() does, and stream_backtest() walks it row by row.
+While streaming, RAM holds only
+    - one block of BLOCK_ROWS price rows
+    - a ring buffer of the last momentum_lookback rows (multi-factor only)
+    - the current holdings and running metric accumulators (Welford)
+so memory grows with the number of tickers but not with the length of the
+history. The daily value / invested series (16 bytes per day) is kept as the
+result.
+
+    matrix = build_price_matrix(PriceStore(root), tickers, start, end, path)
+    screener = Screener.for_rows(matrix.tickers, fundamentals, matrix.last_row())
+    portfolio, holdings, metrics = stream_backtest(matrix, screener, 'multifactor', REBALANCE_DATES)
+
+Selections and holdings are identical to engine.simulate() on the same
+prices; daily values and metrics agree to floating-point rounding (rows are
+valued one at a time instead of as one matrix product). Usage (reads the
+local caches only):
+
+    python -m src.backtest.streaming [--price-source simfin] [--all-tickers] [--rebalance monthly]
+"""
+import argparse
+import json
+import math
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from src.backtest import instrumentation
+from src.backtest.engine import rebalance_positions
+
+BLOCK_ROWS = 64
+MEMORY_BUDGET = 256 * 2**20  # bytes of column buffer while building a matrix
+
+
+# =============================================================================
+# On-disk price matrix
+# =============================================================================
+
+class PriceMatrix:
+    """
+    A filled (date x ticker) price matrix stored under one directory:
+        values.npy   float64, memory-mapped read-only
+        dates.npy    datetime64[D]
+        meta.json    tickers, field, start, end
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        meta = json.loads((self.path / 'meta.json').read_text())
+        self.tickers = meta['tickers']
+        self.field = meta['field']
+        self.start = meta['start']
+        self.end = meta['end']
+        self.dates = pd.DatetimeIndex(np.load(self.path / 'dates.npy'))
+        self.values = np.load(self.path / 'values.npy', mmap_mode='r')
+
+    def __len__(self):
+        return len(self.dates)
+
+    @staticmethod
+    def exists(path):
+        return (Path(path) / 'meta.json').exists()
+
+    def last_row(self):
+        """Most recent prices (an in-memory copy)."""
+        if not len(self.dates):
+            return np.full(len(self.tickers), np.nan)
+        return np.array(self.values[-1])
+
+    def blocks(self, start=0, block_rows=BLOCK_ROWS):
+        """Yield (first row position, in-memory block of up to block_rows rows)."""
+        for lo in range(start, len(self.dates), block_rows):
+            yield lo, np.array(self.values[lo:lo + block_rows])
+
+
+def build_price_matrix(store, tickers, start, end, path, field='Adj Close', memory_budget=MEMORY_BUDGET):
+    """
+    Write the filled (date x ticker) matrix of one PriceStore field to path.
+
+    Rows are the union of all trading dates in [start, end); tickers missing
+    from the store are left out, like PriceStore.load_field(). Columns are
+    filled in batches sized to memory_budget, so building never holds more
+    than that (plus one ticker's history) in RAM.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    calendar = np.empty(0, dtype='datetime64[D]')
+    present = []
+    for ticker in tickers:
+        frame = store.read(ticker, fields=[], start=start, end=end)
+        if frame is None:
+            continue
+        present.append(ticker)
+        calendar = np.union1d(calendar, frame.index.to_numpy().astype('datetime64[D]'))
+
+    tmp = path / 'values.tmp.npy'
+    values = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float64, shape=(len(calendar), len(present)))
+    # The fill makes a second copy of the batch, hence the factor 2
+    batch = max(1, memory_budget // max(1, 2 * 8 * len(calendar)))
+    for lo in range(0, len(present), batch):
+        chunk = np.full((len(calendar), min(batch, len(present) - lo)), np.nan)
+        for j, ticker in enumerate(present[lo:lo + batch]):
+            frame = store.read(ticker, fields=[field], start=start, end=end)
+            rows = calendar.searchsorted(frame.index.to_numpy().astype('datetime64[D]'))
+            chunk[rows, j] = frame[field].to_numpy()
+        values[:, lo:lo + chunk.shape[1]] = pd.DataFrame(chunk).ffill().bfill().to_numpy()
+    values.flush()
+    del values
+    tmp.replace(path / 'values.npy')
+
+    np.save(path / 'dates.npy', calendar)
+    meta = {'tickers': present, 'field': field, 'start': str(start), 'end': str(end)}
+    (path / 'meta.json').write_text(json.dumps(meta))
+    missing = len(tickers) - len(present)
+    print(f'  Price matrix: {len(calendar):,} days x {len(present):,} tickers -> {path}'
+          + (f' ({missing} tickers not cached)' if missing else ''))
+    return PriceMatrix(path)
+
+
+# =============================================================================
+# Streaming state
+# =============================================================================
+
+class MomentumWindow:
+    """
+    Ring buffer of the last lookback price rows.
+
+    momentum() gives the same values as factors.momentum_matrix() for the
+    most recently pushed row, without the full matrix.
+    """
+
+    def __init__(self, width, lookback, min_history=20):
+        self.lookback = lookback
+        self.min_history = min_history
+        self.buffer = np.full((lookback, width), np.nan)
+        self.count = 0
+
+    def push(self, row):
+        self.buffer[self.count % self.lookback] = row
+        self.count += 1
+
+    def momentum(self):
+        i = self.count - 1
+        span = min(self.lookback, i)
+        if i < self.min_history or span < self.min_history:
+            return np.full(self.buffer.shape[1], np.nan)
+        current = self.buffer[i % self.lookback]
+        past = self.buffer[(i + 1 - span) % self.lookback]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mom = (current - past) / past
+        return np.where(past > 0, mom, np.nan)
+
+
+class RunningMetrics:
+    """
+    calc_metrics() computed incrementally, one daily value at a time.
+
+    Return volatility uses Welford's algorithm; drawdown tracks the running
+    peak. Days with zero value are skipped like in calc_metrics().
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.first_date = self.first_value = None
+        self.last_date = self.last_value = None
+        self.invested = 0.0
+        self.peak = -math.inf
+        self.max_dd = 0.0
+
+    def update(self, date, value, invested):
+        if not value > 0:
+            return
+        if self.first_value is None:
+            self.first_date, self.first_value = date, value
+        else:
+            ret = (value - self.last_value) / self.last_value
+            if ret != 0:
+                self.count += 1
+                delta = ret - self.mean
+                self.mean += delta / self.count
+                self.m2 += delta * (ret - self.mean)
+        self.last_date, self.last_value = date, value
+        self.invested = invested
+        self.peak = max(self.peak, value)
+        self.max_dd = min(self.max_dd, (value - self.peak) / self.peak)
+
+    def result(self, name):
+        """The calc_metrics() row for the values seen so far."""
+        if self.first_value is None:
+            return {'name': name, 'invested': 0, 'final': 0, 'return': 0, 'cagr': 0, 'vol': 0, 'sharpe': 0, 'max_dd': 0}
+        total_return = (self.last_value - self.invested) / self.invested * 100
+        years = (self.last_date - self.first_date).days / 365.25
+        cagr = ((self.last_value / self.first_value) ** (1/years) - 1) * 100 if years > 0 else 0
+        std = math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan
+        vol = std * np.sqrt(252) * 100 if self.count > 0 else 0
+        sharpe = (cagr/100 - 0.04) / (vol/100) if vol > 0 else 0
+        return {
+            'name': name, 'invested': self.invested, 'final': self.last_value,
+            'return': total_return, 'cagr': cagr, 'vol': vol, 'sharpe': sharpe, 'max_dd': self.max_dd * 100
+        }
+
+
+# =============================================================================
+# Engine
+# =============================================================================
+
+def stream_backtest(matrix, screener, strategy, rebalance_dates, investment=1000.0, num_stocks=25, name=None,
+                    verbose=False, block_rows=BLOCK_ROWS):
+    """
+    Run 'value' or 'multifactor' over a PriceMatrix, one row at a time.
+
+    screener must be built for matrix.tickers (Screener.for_rows). Trading
+    rules match engine.simulate(). Returns (portfolio, holdings, metrics)
+    with metrics the calc_metrics() row of the portfolio.
+    """
+    if strategy == 'value':
+        select = screener.select_value
+    elif strategy == 'multifactor':
+        select = screener.select_multifactor
+    else:
+        raise ValueError(f'Unknown strategy: {strategy}')
+    name = name or strategy
+
+    dates = matrix.dates
+    positions = rebalance_positions(dates, rebalance_dates)
+    start = int(dates.searchsorted(pd.Timestamp(rebalance_dates[0]), side='left')) if len(rebalance_dates) else len(dates)
+    n = len(dates) - start
+    column = {ticker: i for i, ticker in enumerate(matrix.tickers)}
+
+    # Momentum needs the rows before the first rebalance, valuation does not
+    window = None
+    if strategy == 'multifactor':
+        window = MomentumWindow(len(matrix.tickers), screener.momentum_lookback, screener.factors.min_history)
+
+    portfolio_value = np.zeros(n)
+    invested = np.zeros(n)
+    holdings_log = []
+    running = RunningMetrics()
+
+    cols = np.empty(0, dtype=np.int64)
+    shares = np.empty(0)
+    cash = 0.0
+    total_invested = 0.0
+    rebalances = iter(positions)
+    next_rebalance = next(rebalances, None)
+
+    with instrumentation.stage('valuation', strategy=name, items=n):
+        for lo, block in matrix.blocks(0 if window is not None else start, block_rows):
+            for pos in range(lo, lo + len(block)):
+                row = block[pos - lo]
+                if window is not None:
+                    window.push(row)
+                if pos < start:
+                    continue
+
+                if pos == next_rebalance:
+                    date = dates[pos]
+                    if len(cols):
+                        sell_prices = row[cols]
+                        cash += float(np.where(np.isnan(sell_prices), 0.0, sell_prices) @ shares)
+                        cols = np.empty(0, dtype=np.int64)
+                        shares = np.empty(0)
+                    cash += investment
+                    total_invested += investment
+
+                    with instrumentation.stage('selection', strategy=name, date=str(date.date())) as stage:
+                        if window is not None:
+                            selected = select(date, num_stocks, price=row, momentum=window.momentum())
+                        else:
+                            selected = select(date, num_stocks, price=row)
+                        stage.items = len(selected)
+                    if selected:
+                        buy_prices = np.array([stock['price'] for stock in selected], dtype=np.float64)
+                        allocation = cash / len(selected)
+                        cols = np.array([column[stock['ticker']] for stock in selected], dtype=np.int64)
+                        shares = allocation / buy_prices
+                        for stock, price in zip(selected, buy_prices):
+                            holdings_log.append({'date': date, 'ticker': stock['ticker'],
+                                                 'shares': allocation / price, 'price': price})
+                        cash = 0.0
+                        if verbose:
+                            print(f'{name} - {date.date()}: {len(selected)} stocks, invested ${total_invested:,.0f}')
+                    elif verbose:
+                        print(f'{name}: No stocks selected on {date.date()}')
+                    next_rebalance = next(rebalances, None)
+
+                held = row[cols]
+                value = float(np.where(np.isnan(held), 0.0, held) @ shares) + cash
+                portfolio_value[pos - start] = value
+                invested[pos - start] = total_invested
+                running.update(dates[pos], value, total_invested)
+
+    portfolio = pd.DataFrame(
+        {'value': portfolio_value, 'invested': invested},
+        index=pd.Index(dates[start:], name='date'),
+    )
+    holdings = pd.DataFrame(holdings_log, columns=['date', 'ticker', 'shares', 'price'])
+    return portfolio, holdings, running.result(name)
+
+
+def main():
+    from src.backtest.config import (
+        ANNUAL_INVESTMENT, CACHE_DIR, DATA_START_DATE, END_DATE, NUM_STOCKS, REBALANCE_DATES, SIMFIN_INCOME_FILE,
+    )
+    from src.backtest.data import cached_json, load_sp500_tickers, price_dir
+    from src.backtest.fundamentals import FundamentalsStore
+    from src.backtest.price_cache import PriceStore
+    from src.backtest.schedule import (
+        FREQUENCIES, add_asof_argument, period_investment, rebalance_schedule, resolve_asof,
+    )
+    from src.backtest.screener import Screener
+
+    parser = argparse.ArgumentParser(description='Streaming (out-of-core) V2 backtest from the local caches')
+    parser.add_argument('--cache-dir', type=Path, default=CACHE_DIR)
+    parser.add_argument('--price-source', choices=['yfinance', 'simfin'], default='yfinance')
+    parser.add_argument('--all-tickers', action='store_true',
+                        help='Every ticker in the price store instead of the S&P 500 constituents')
+    parser.add_argument('--start', default=DATA_START_DATE)
+    parser.add_argument('--end', default=END_DATE)
+    parser.add_argument('--rebalance', choices=sorted(FREQUENCIES), default=None)
+    add_asof_argument(parser)
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild the on-disk price matrix')
+    args = parser.parse_args()
+
+    store = PriceStore(price_dir(args.cache_dir, args.price_source))
+    tickers = store.tickers() if args.all_tickers else load_sp500_tickers(args.cache_dir, offline=True)
+    universe = 'all' if args.all_tickers else 'sp500'
+    path = args.cache_dir / 'price_matrix' / f'{args.price_source}-{universe}-{args.start}-{args.end}'
+    with instrumentation.stage('price_matrix'):
+        if args.rebuild or not PriceMatrix.exists(path):
+            print('Building price matrix...')
+            matrix = build_price_matrix(store, tickers, args.start, args.end, path)
+        else:
+            matrix = PriceMatrix(path)
+
+    fundamentals = FundamentalsStore.load(SIMFIN_INCOME_FILE)
+    eps_2025 = cached_json(args.cache_dir / 'yf_fundamentals_2025.json', None, offline=True)
+    market_caps = cached_json(args.cache_dir / 'market_caps.json', None, offline=True)
+    screener = Screener.for_rows(matrix.tickers, fundamentals, matrix.last_row(),
+                                 eps_fallback={t: f['eps'] for t, f in eps_2025.items()}, market_caps=market_caps,
+                                 asof=resolve_asof(args.asof, args.rebalance))
+
+    if args.rebalance is None:
+        rebalance_dates, investment = REBALANCE_DATES, ANNUAL_INVESTMENT
+    else:
+        rebalance_dates, investment = rebalance_schedule(args.rebalance), period_investment(args.rebalance)
+
+    rows = []
+    for strategy, name in [('value', 'Value-Only'), ('multifactor', 'Multi-Factor')]:
+        _, _, metrics = stream_backtest(matrix, screener, strategy, rebalance_dates, investment, NUM_STOCKS, name)
+        rows.append(metrics)
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""
+Multi-core parameter sweeps over the V2 strategies.
+
+Data is loaded once in the parent process and handed to every worker of a
+process pool when it starts; each grid point then only runs the screener and
+valuation engine and reports the same metrics as calc_metrics, plus rolling
+and SPY-relative statistics (see metrics.compare_portfolios).
+
+Usage:
+    python -m src.backtest.sweep --num-stocks 10 25 50 --pe-multiplier 0.3 0.5 1.0 \
+        --momentum-lookback 63 126 252 --offline --output sweep-results.csv
+
+--charts DIR re-runs the best grid points (by Sharpe ratio) and renders their
+result charts in parallel (see src/backtest/charts.py).
+"""
+import argparse
+import copy
+import itertools
+import multiprocessing
+import os
+import time
+import pandas as pd
+from pathlib import Path
+
+from src.backtest import charts, engine
+from src.backtest.config import (
+    ANNUAL_INVESTMENT, CACHE_DIR, DATA_START_DATE, END_DATE, MIN_MARKET_CAP,
+    MOMENTUM_LOOKBACK, NUM_STOCKS, PE_MULTIPLIER, REBALANCE_DATES, SIMFIN_INCOME_FILE,
+)
+from src.backtest.metrics import calc_metrics, compare_portfolios
+from src.backtest.schedule import FREQUENCIES, add_asof_argument, period_investment, rebalance_schedule, resolve_asof
+from src.backtest.strategies import STRATEGIES, SharedRows
+
+DEFAULT_PARAMS = {
+    'strategy': 'multifactor',
+    'num_stocks': NUM_STOCKS,
+    'rebalance_dates': tuple(REBALANCE_DATES),
+    'investment': ANNUAL_INVESTMENT,
+    'min_market_cap': MIN_MARKET_CAP,
+    'pe_multiplier': PE_MULTIPLIER,
+    'momentum_lookback': MOMENTUM_LOOKBACK,
+    'asof': False,
+}
+
+# Screener attributes that can be swept
+SCREENER_PARAMS = ('min_market_cap', 'pe_multiplier', 'momentum_lookback', 'asof')
+
+
+def param_grid(**axes):
+    """
+    Cartesian product of parameter axes as a list of dicts.
+
+    Each keyword maps a parameter name to the list of values to try; missing
+    parameters take their DEFAULT_PARAMS value.
+    """
+    unknown = set(axes) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f'Unknown sweep parameters: {sorted(unknown)}')
+    names = list(axes)
+    grid = []
+    for values in itertools.product(*(axes[name] for name in names)):
+        params = dict(DEFAULT_PARAMS)
+        params.update(zip(names, values))
+        params['rebalance_dates'] = tuple(params['rebalance_dates'])
+        grid.append(params)
+    return grid
+
+
+def run_portfolio(data, params, base_screener=None, name=None, verbose=False, with_holdings=False):
+    """
+    Run one parameter set against data and return its daily portfolio history
+    (plus the holdings log as a second value with with_holdings=True).
+    """
+    if base_screener is None:
+        base_screener = data.screener()
+    screener = copy.copy(base_screener)
+    for key in SCREENER_PARAMS:
+        setattr(screener, key, params[key])
+
+    if params['strategy'] not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {params['strategy']}")
+    select = STRATEGIES[params['strategy']]
+
+    portfolio, holdings = engine.simulate(
+        lambda prices_df, date, num_stocks: select(screener, date, num_stocks, SharedRows(screener, date)),
+        data.prices, name or params['strategy'], list(params['rebalance_dates']),
+        params['investment'], params['num_stocks'], verbose=verbose,
+    )
+    return (portfolio, holdings) if with_holdings else portfolio
+
+
+def run_params(data, params, base_screener=None):
+    """Run one grid point against data and return its metrics row."""
+    portfolio = run_portfolio(data, params, base_screener)
+    metrics = compare_portfolios({params['strategy']: portfolio}, benchmark=data.spy).iloc[0]
+    row = dict(params)
+    row['rebalance_dates'] = ','.join(params['rebalance_dates'])
+    row.update({k: v for k, v in metrics.items() if k != 'name'})
+    return row
+
+
+# Per-worker state, set once by _init_worker
+_data = None
+_screener = None
+
+
+def _init_worker(data):
+    global _data, _screener
+    _data = data
+    _screener = data.screener()
+    # Momentum matrices for every lookback in the grid are computed lazily
+    # and then shared by all grid points handled by this worker
+
+
+def _run_worker(params):
+    return run_params(_data, params, _screener)
+
+
+def run_sweep(data, grid, processes=None, chunksize=None):
+    """
+    Run every grid point and return a DataFrame with one metrics row each.
+
+    processes=1 runs in-process (handy for debugging); otherwise a process
+    pool with one worker per core is used.
+    """
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(grid) == 1:
+        _init_worker(data)
+        rows = [_run_worker(params) for params in grid]
+    else:
+        if chunksize is None:
+            chunksize = max(1, len(grid) // (processes * 4))
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(data,)) as pool:
+            rows = pool.map(_run_worker, grid, chunksize=chunksize)
+    return pd.DataFrame(rows)
+
+
+def sweep_charts(data, grid, results, directory, top=10, processes=None):
+    """
+    Render the results figure for the top grid points by Sharpe ratio.
+
+    results must be the run_sweep() frame for grid (rows in grid order).
+    Returns the chart paths, best first.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    base_screener = data.screener()
+    jobs = []
+    for rank, i in enumerate(results['sharpe'].nlargest(top).index, start=1):
+        params = grid[i]
+        portfolio = run_portfolio(data, params, base_screener)
+        portfolio = portfolio[portfolio.index >= params['rebalance_dates'][0]]
+        label = (f"{params['strategy']} n={params['num_stocks']} pe={params['pe_multiplier']} "
+                 f"mom={params['momentum_lookback']}")
+        chart = charts.prepare_chart(portfolio[['value']].rename(columns={'value': label}),
+                                     [calc_metrics(portfolio, label)], invested=portfolio['invested'].iloc[-1],
+                                     title=f'#{rank}: {label}')
+        jobs.append((chart, directory / f"{rank:02d}-{params['strategy']}.png"))
+    return charts.render_many(jobs, processes)
+
+
+def main():
+    from src.backtest.data import UNIVERSES, load_backtest_data
+
+    parser = argparse.ArgumentParser(description='Parameter sweep over the V2 strategies')
+    parser.add_argument('--strategy', nargs='+', default=['value', 'multifactor'], choices=sorted(STRATEGIES))
+    parser.add_argument('--num-stocks', nargs='+', type=int, default=[NUM_STOCKS])
+    parser.add_argument('--min-market-cap', nargs='+', type=float, default=[MIN_MARKET_CAP])
+    parser.add_argument('--pe-multiplier', nargs='+', type=float, default=[PE_MULTIPLIER])
+    parser.add_argument('--momentum-lookback', nargs='+', type=int, default=[MOMENTUM_LOOKBACK])
+    parser.add_argument('--rebalance', choices=sorted(FREQUENCIES), default=None,
+                        help='Generated rebalance calendar (default: REBALANCE_DATES from config)')
+    add_asof_argument(parser)
+    parser.add_argument('--processes', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--offline', action='store_true', help='Run entirely from the local cache')
+    parser.add_argument('--cache-dir', type=Path, default=CACHE_DIR)
+    parser.add_argument('--price-source', choices=['yfinance', 'simfin'], default='yfinance')
+    parser.add_argument('--universe', choices=UNIVERSES, default='current',
+                        help='Screen today\'s constituents or each date\'s members (point-in-time)')
+    parser.add_argument('--output', type=Path, default=Path('sweep-results.csv'))
+    parser.add_argument('--charts', type=Path, default=None, help='Render charts for the best grid points here')
+    parser.add_argument('--chart-top', type=int, default=10, help='Number of grid points to chart')
+    args = parser.parse_args()
+
+    data = load_backtest_data(SIMFIN_INCOME_FILE, DATA_START_DATE, END_DATE, args.cache_dir, offline=args.offline,
+                              price_source=args.price_source, universe=args.universe)
+    grid = param_grid(
+        strategy=args.strategy,
+        num_stocks=args.num_stocks,
+        min_market_cap=args.min_market_cap,
+        pe_multiplier=args.pe_multiplier,
+        momentum_lookback=args.momentum_lookback,
+        asof=[resolve_asof(args.asof, args.rebalance)],
+    )
+    if args.rebalance is not None:
+        schedule = tuple(rebalance_schedule(args.rebalance))
+        for params in grid:
+            params.update(rebalance_dates=schedule, investment=period_investment(args.rebalance))
+
+    print(f'\nRunning {len(grid)} parameter combinations...')
+    start = time.perf_counter()
+    results = run_sweep(data, grid, processes=args.processes)
+    elapsed = time.perf_counter() - start
+    print(f'  Done in {elapsed:.1f}s ({len(grid) / elapsed:.1f} runs/s)')
+
+    results.to_csv(args.output, index=False)
+    print(f'Results saved to {args.output}')
+    print(results.sort_values('sharpe', ascending=False).head(10).to_string(index=False))
+
+    if args.charts is not None:
+        paths = sweep_charts(data, grid, results, args.charts, args.chart_top, args.processes)
+        print(f'{len(paths)} charts saved to {args.charts}/')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+"""
+Point-in-time S&P 500 membership, stored locally.
+
+Applying today's constituent list to every historical rebalance adds
+survivorship bias, and fetching it from Wikipedia on every run costs a
+network round trip. This module keeps the raw inputs on disk:
+
+    <cache_dir>/universe/snapshots/<YYYY-MM-DD>.json   full constituent lists
+    <cache_dir>/universe/changes.json                  dated additions / removals
+    <cache_dir>/universe/membership/                   compiled bitmap (below)
+
+and compiles them into a Membership: every ticker ever seen gets an integer
+ID (tickers from data/sp500-constituents.xlsx first), and each period between
+two membership changes is one row of a bit-packed (period x ticker ID)
+bitmap. Membership before the earliest snapshot is reconstructed by undoing
+the change log backwards from it; later snapshots override the replayed
+changes. Looking up the universe for any date is a binary search over the
+period starts plus unpacking one row, O(tickers), with no network access:
+
+    membership = UniverseStore(cache_dir / 'universe').membership()
+    mask = membership.mask('2015-06-30', membership.ids(tickers))
+
+Wikipedia is only asked again (one request for both tables) when the newest
+snapshot is older than MAX_AGE_DAYS.
+"""
+import json
+import numpy as np
+import pandas as pd
+from datetime import date as _date
+from io import StringIO
+from pathlib import Path
+
+from src.backtest import instrumentation
+
+SP500_URL = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+SEED_FILE = Path(__file__).resolve().parents[2] / 'data' / 'sp500-constituents.xlsx'
+MAX_AGE_DAYS = 30
+CACHE_VERSION = 1
+EARLIEST = np.datetime64('1900-01-01', 'D')  # start of the first period
+
+
+def normalize_ticker(ticker):
+    """yfinance-style symbol ('BRK.B' -> 'BRK-B'), None for blanks."""
+    if ticker is None or (isinstance(ticker, float) and np.isnan(ticker)):
+        return None
+    ticker = str(ticker).strip().replace('.', '-')
+    return ticker or None
+
+
+def load_seed_tickers(path=SEED_FILE):
+    """Tickers from the constituents sheet of data/sp500-constituents.xlsx."""
+    path = Path(path)
+    if not path.exists():
+        return []
+    sheet = pd.read_excel(path, sheet_name='constituents', usecols=['Ticker'])
+    return [t for t in (normalize_ticker(t) for t in sheet['Ticker']) if t]
+
+
+def parse_changes(table):
+    """
+    Rows of Wikipedia's 'Selected changes' table as change records.
+
+    Columns are taken by position (date, added ticker, added name, removed
+    ticker, ...) since the two-level header has changed wording over time.
+    """
+    dates = pd.to_datetime(table.iloc[:, 0], format='mixed', errors='coerce')
+    records = []
+    for when, added, removed in zip(dates, table.iloc[:, 1], table.iloc[:, 3]):
+        added, removed = normalize_ticker(added), normalize_ticker(removed)
+        if pd.isna(when) or (added is None and removed is None):
+            continue
+        records.append({'date': when.strftime('%Y-%m-%d'), 'added': added, 'removed': removed})
+    return records
+
+
+def fetch_sp500_tables():
+    """Current constituents and the change log, from one Wikipedia request."""
+    import requests
+    instrumentation.count('network_calls')
+    resp = requests.get(SP500_URL, headers=HEADERS, timeout=30)
+    resp.raise_for_status()
+    tables = pd.read_html(StringIO(resp.text))
+    current = [t for t in (normalize_ticker(t) for t in tables[0]['Symbol']) if t]
+    return current, parse_changes(tables[1])
+
+
+class Membership:
+    """
+    Index membership per date as a bit-packed (period x ticker ID) bitmap.
+
+    Period i covers [starts[i], starts[i + 1]); ticker ID j is tickers[j].
+    """
+
+    def __init__(self, tickers, starts, bits):
+        self.tickers = list(tickers)
+        self.starts = np.asarray(starts, dtype='datetime64[D]')
+        self.bits = bits
+        self.ticker_index = {t: i for i, t in enumerate(self.tickers)}
+
+    @classmethod
+    def build(cls, snapshots, changes, seed_tickers=()):
+        """
+        Compile snapshots ({date: [tickers]}) and change records into a bitmap.
+
+        A change is effective from its date; a snapshot reflects every change
+        up to and including its date.
+        """
+        if not snapshots:
+            raise ValueError('Membership needs at least one constituent snapshot')
+        by_date = {}
+        for change in changes:
+            by_date.setdefault(change['date'], []).append((change.get('added'), change.get('removed')))
+
+        snapshot_dates = sorted(snapshots)
+        first = snapshot_dates[0]
+        states = {}
+
+        # Before the first snapshot: undo changes, newest first
+        state = set(snapshots[first])
+        for day in sorted((d for d in by_date if d <= first), reverse=True):
+            states[day] = set(state)
+            for added, removed in by_date[day]:
+                state.discard(added)
+                if removed:
+                    state.add(removed)
+        initial = state
+
+        # From the first snapshot on: replay changes, reset at every snapshot
+        state = set(snapshots[first])
+        states[first] = set(state)
+        for day in sorted((set(by_date) | set(snapshot_dates)) - {d for d in states if d <= first}):
+            for added, removed in by_date.get(day, ()):
+                state.discard(removed)
+                if added:
+                    state.add(added)
+            if day in snapshots:
+                state = set(snapshots[day])
+            states[day] = set(state)
+
+        # Ticker IDs: seed order first, then everything else alphabetically
+        seen = set(seed_tickers)
+        others = set().union(initial, *states.values()) - seen
+        tickers = list(dict.fromkeys(seed_tickers)) + sorted(others)
+        index = {t: i for i, t in enumerate(tickers)}
+
+        starts, rows = [EARLIEST], [initial]
+        for day in sorted(states):
+            if states[day] != rows[-1]:
+                starts.append(np.datetime64(day, 'D'))
+                rows.append(states[day])
+        bits = np.zeros((len(rows), len(tickers)), dtype=bool)
+        for i, members in enumerate(rows):
+            bits[i, [index[t] for t in members]] = True
+        return cls(tickers, np.array(starts, dtype='datetime64[D]'), np.packbits(bits, axis=1))
+
+    # -------------------------------------------------------------------------
+    # Lookups
+    # -------------------------------------------------------------------------
+
+    def ids(self, tickers):
+        """Ticker IDs for symbols (-1 for tickers never in the index)."""
+        get = self.ticker_index.get
+        return np.fromiter((get(t, -1) for t in tickers), dtype=np.int64, count=len(tickers))
+
+    def period(self, date):
+        return int(self.starts.searchsorted(np.datetime64(pd.Timestamp(date), 'D'), side='right')) - 1
+
+    def _row(self, period):
+        return np.unpackbits(self.bits[period], count=len(self.tickers)).astype(bool)
+
+    def mask(self, date, ids=None):
+        """
+        Members on date as a boolean mask over all ticker IDs, or over the
+        given IDs (from ids(); -1 is never a member).
+        """
+        row = self._row(self.period(date))
+        if ids is None:
+            return row
+        out = np.zeros(len(ids), dtype=bool)
+        known = ids >= 0
+        out[known] = row[ids[known]]
+        return out
+
+    def members(self, date):
+        """Member tickers on date."""
+        return [self.tickers[i] for i in np.flatnonzero(self.mask(date))]
+
+    def ever_members(self, start, end):
+        """Tickers that were members at any time in [start, end]."""
+        lo, hi = max(self.period(start), 0), self.period(end)
+        row = np.unpackbits(np.bitwise_or.reduce(self.bits[lo:hi + 1], axis=0), count=len(self.tickers))
+        return [self.tickers[i] for i in np.flatnonzero(row)]
+
+    # -------------------------------------------------------------------------
+    # Persistence
+    # -------------------------------------------------------------------------
+
+    def save(self, directory, source=None):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / 'starts.npy', self.starts)
+        np.save(directory / 'bits.npy', np.ascontiguousarray(self.bits))
+        # Written last so a partially written cache is never considered fresh
+        meta = {'version': CACHE_VERSION, 'source': source, 'tickers': self.tickers}
+        (directory / 'meta.json').write_text(json.dumps(meta))
+
+    @classmethod
+    def load(cls, directory, source=None):
+        """Cached membership, or None if missing or built from other sources."""
+        directory = Path(directory)
+        try:
+            meta = json.loads((directory / 'meta.json').read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        if meta.get('version') != CACHE_VERSION or (source is not None and meta.get('source') != source):
+            return None
+        return cls(meta['tickers'], np.load(directory / 'starts.npy'), np.load(directory / 'bits.npy', mmap_mode='r'))
+
+
+class UniverseStore:
+    """Constituent snapshots and change log on disk (see module docstring)."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.snapshot_dir = self.root / 'snapshots'
+        self.changes_file = self.root / 'changes.json'
+        self.membership_dir = self.root / 'membership'
+
+    def snapshot_dates(self):
+        if not self.snapshot_dir.exists():
+            return []
+        return sorted(path.stem for path in self.snapshot_dir.glob('*.json'))
+
+    def snapshot(self, day):
+        return json.loads((self.snapshot_dir / f'{day}.json').read_text())['tickers']
+
+    def snapshots(self):
+        return {day: self.snapshot(day) for day in self.snapshot_dates()}
+
+    def add_snapshot(self, day, tickers):
+        """Store the full constituent list as of day ('YYYY-MM-DD')."""
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        tickers = [t for t in (normalize_ticker(t) for t in tickers) if t]
+        (self.snapshot_dir / f'{day}.json').write_text(json.dumps({'date': day, 'tickers': tickers}))
+
+    def changes(self):
+        if not self.changes_file.exists():
+            return []
+        return json.loads(self.changes_file.read_text())['data']
+
+    def add_changes(self, records):
+        """Merge change records into the log (duplicates are dropped)."""
+        merged = {(c['date'], c.get('added'), c.get('removed')): c for c in self.changes() + list(records)}
+        data = [merged[key] for key in sorted(merged, key=lambda k: (k[0], str(k[1]), str(k[2])))]
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.changes_file.write_text(json.dumps({'updated': _date.today().isoformat(), 'data': data}))
+
+    def import_ticker_list(self, path):
+        """Turn a cached sp500_tickers.json (see data.cached_json) into a snapshot."""
+        path = Path(path)
+        payload = json.loads(path.read_text())
+        try:
+            day = _date.fromisoformat(payload['fetched'][:10])
+        except (KeyError, ValueError):
+            day = _date.fromtimestamp(path.stat().st_mtime)
+        self.add_snapshot(day.isoformat(), payload['data'])
+
+    def refresh(self, offline=False, max_age_days=MAX_AGE_DAYS):
+        """
+        Fetch a new snapshot and the change log when the newest snapshot is
+        missing or older than max_age_days. Returns True if it fetched.
+        """
+        dates = self.snapshot_dates()
+        today = _date.today()
+        if offline or (dates and (today - _date.fromisoformat(dates[-1])).days <= max_age_days):
+            return False
+        current, changes = fetch_sp500_tables()
+        self.add_snapshot(today.isoformat(), current)
+        self.add_changes(changes)
+        return True
+
+    def latest(self):
+        """The newest snapshot's tickers."""
+        dates = self.snapshot_dates()
+        if not dates:
+            raise FileNotFoundError(f'No constituent snapshots in {self.snapshot_dir}. Run once without --offline first.')
+        instrumentation.count('cache_hits')
+        return self.snapshot(dates[-1])
+
+    def source_signature(self, seed=SEED_FILE):
+        """Size / mtime of every input, to detect a stale compiled bitmap."""
+        paths = [self.snapshot_dir / f'{day}.json' for day in self.snapshot_dates()]
+        paths += [p for p in (self.changes_file, Path(seed)) if p.exists()]
+        return [[str(p.name), p.stat().st_size, p.stat().st_mtime_ns] for p in paths]
+
+    def membership(self, seed=SEED_FILE):
+        """Compiled Membership, rebuilt only when the snapshots, log or seed changed."""
+        source = self.source_signature(seed)
+        membership = Membership.load(self.membership_dir, source)
+        if membership is not None:
+            instrumentation.count('cache_hits')
+            return membership
+        instrumentation.count('cache_misses')
+        membership = Membership.build(self.snapshots(), self.changes(), load_seed_tickers(seed))
+        membership.save(self.membership_dir, source)
+        return Membership.load(self.membership_dir, source)
@@ -0,0 +1,187 @@
+"""
+Walk-forward / rolling-start sensitivity of the V2 strategies.
+
+The headline results start in April 2021 and rebalance every April. This
+module reruns Value-Only, Multi-Factor and the SPY benchmark from the first
+of every month in a range of start dates (optionally also with the annual
+rebalance moved to every other month of the year) and tabulates the metrics
+of each variant:
+
+    python -m src.backtest.walk_forward --offline --min-years 2 --all-anchors
+
+Data is loaded once and handed to every worker of a process pool, like the
+parameter sweep. Within a worker all variants share one screener, so the
+momentum matrix and the per-fiscal-year fundamentals vectors are built once,
+and picks are memoized per (strategy, trading day): variants whose calendars
+overlap (same anchor month, later start) only value their portfolios. A few
+dozen variants therefore cost a small multiple of a single run.
+
+Start dates and rebalances fall in every month, so fundamentals are resolved
+as of each rebalance date by default (the latest statement published by
+then, Screener(asof=True)); the fiscal-year lookup of the headline run
+(date.year - 1) would read statements before they were published for
+January-March dates. --no-asof restores it.
+"""
+import argparse
+import multiprocessing
+import os
+import time
+import pandas as pd
+from pathlib import Path
+
+from src.backtest.config import (
+    ANNUAL_INVESTMENT, BACKTEST_START_DATE, CACHE_DIR, DATA_START_DATE, END_DATE, NUM_STOCKS, SIMFIN_INCOME_FILE,
+)
+from src.backtest.metrics import compare_portfolios
+from src.backtest.schedule import FREQUENCIES, period_investment, rebalance_schedule
+from src.backtest.strategies import run_strategies
+
+STRATEGIES = {'Value-Only': 'value', 'Multi-Factor': 'multifactor'}
+BENCHMARK = 'S&P 500'
+MIN_YEARS = 2
+
+
+def start_dates(first=BACKTEST_START_DATE, end=END_DATE, min_years=MIN_YEARS):
+    """First of every month from first on, leaving at least min_years before end."""
+    last = pd.Timestamp(end) - pd.DateOffset(months=round(min_years * 12))
+    first = pd.Timestamp(first)
+    first = first if first.day == 1 else first + pd.offsets.MonthBegin(1)
+    return [d.strftime('%Y-%m-%d') for d in pd.date_range(first, last, freq='MS')]
+
+
+def variant_schedule(start, anchor_month=None, frequency='annual', end=END_DATE):
+    """
+    Rebalance dates of one variant: the start date, then annual rebalances on
+    the first of anchor_month (default: the start's month) or, for other
+    frequencies, the usual calendar anchored on the start.
+    """
+    start = pd.Timestamp(start)
+    if frequency != 'annual' or anchor_month is None or anchor_month == start.month:
+        return rebalance_schedule(frequency, start, end)
+    first = pd.Timestamp(start.year, anchor_month, 1)
+    if first <= start:
+        first += pd.DateOffset(years=1)
+    return [start.strftime('%Y-%m-%d')] + rebalance_schedule('annual', first, end)
+
+
+def variants(starts, all_anchors=False, frequency='annual'):
+    """
+    (start, anchor month) pairs, ordered by anchor month so that variants
+    sharing rebalance dates land in the same worker chunk.
+    """
+    anchors = range(1, 13) if all_anchors and frequency == 'annual' else [None]
+    pairs = [(start, anchor) for start in starts for anchor in anchors]
+    return sorted(pairs, key=lambda pair: (pair[1] or pd.Timestamp(pair[0]).month, pair[0]))
+
+
+def run_variant(data, variant, frequency='annual', num_stocks=NUM_STOCKS, base_screener=None, selections=None,
+                asof=True):
+    """Daily portfolio histories (name -> DataFrame) of the strategies and the benchmark for one variant."""
+    start, anchor = variant
+    dates = variant_schedule(start, anchor, frequency)
+    investment = ANNUAL_INVESTMENT if frequency == 'annual' else period_investment(frequency)
+    results = run_strategies(data, STRATEGIES, {BENCHMARK: data.spy}, dates, investment, num_stocks,
+                             base_screener, selections=selections, asof=asof)
+    return {name: portfolio for name, (portfolio, _) in results.items()}
+
+
+# Per-worker state, set once by _init_worker
+_data = None
+_screener = None
+_selections = None
+
+
+def _init_worker(data, asof=True):
+    global _data, _screener, _selections
+    _data = data
+    _screener = data.screener(asof=asof)
+    # Picks memoized across all variants handled by this worker
+    _selections = {}
+
+
+def _run_worker(job):
+    variant, frequency, num_stocks, asof = job
+    return run_variant(_data, variant, frequency, num_stocks, _screener, _selections, asof)
+
+
+def walk_forward(data, variant_list, frequency='annual', num_stocks=NUM_STOCKS, processes=None, asof=True):
+    """
+    Run every variant and return a DataFrame with one metrics row per
+    (variant, strategy). processes=1 runs in-process.
+    """
+    processes = processes or os.cpu_count() or 1
+    jobs = [(variant, frequency, num_stocks, asof) for variant in variant_list]
+    if processes == 1 or len(jobs) == 1:
+        _init_worker(data, asof)
+        runs = [_run_worker(job) for job in jobs]
+    else:
+        # Contiguous chunks keep variants with the same anchor month together
+        chunksize = max(1, -(-len(jobs) // processes))
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(data, asof)) as pool:
+            runs = pool.map(_run_worker, jobs, chunksize=chunksize)
+
+    # calc_metrics plus rolling / SPY-relative statistics for every
+    # (variant, strategy) column in one vectorized pass
+    portfolios = {(i, name): portfolio for i, run in enumerate(runs) for name, portfolio in run.items()}
+    metrics = compare_portfolios(portfolios, benchmark=data.spy, names=[name for _, name in portfolios])
+    metrics = metrics.reset_index(drop=True).rename(columns={'name': 'strategy'})
+    variant_of = [i for i, _ in portfolios]
+    bench_cagr = metrics['cagr'][metrics['strategy'] == BENCHMARK].to_numpy()
+    metrics['excess_cagr'] = metrics['cagr'].to_numpy() - bench_cagr[variant_of]
+    metrics.insert(0, 'rebalances', [len(variant_schedule(*variant_list[i], frequency)) for i in variant_of])
+    metrics.insert(0, 'anchor_month', [variant_list[i][1] or pd.Timestamp(variant_list[i][0]).month
+                                       for i in variant_of])
+    metrics.insert(0, 'start', [variant_list[i][0] for i in variant_of])
+    return metrics
+
+
+def summarize(results):
+    """Spread of the metrics across variants, plus the share of variants beating the benchmark."""
+    table = results.groupby('strategy', sort=False)[['cagr', 'sharpe', 'max_dd', 'excess_cagr']].describe(
+        percentiles=[0.1, 0.5, 0.9])
+    table = table.loc[:, (slice(None), ['min', '10%', '50%', '90%', 'max'])]
+    table[('excess_cagr', 'beat')] = results.groupby('strategy', sort=False)['excess_cagr'].apply(lambda s: (s > 0).mean())
+    return table
+
+
+def main():
+    from src.backtest.data import load_backtest_data
+
+    parser = argparse.ArgumentParser(description='Walk-forward / rolling-start runs of the V2 strategies')
+    parser.add_argument('--first-start', default=BACKTEST_START_DATE, help='Earliest start date')
+    parser.add_argument('--min-years', type=float, default=MIN_YEARS,
+                        help='Minimum length of a run (limits the latest start date)')
+    parser.add_argument('--all-anchors', action='store_true',
+                        help='Also move the annual rebalance to every month of the year')
+    parser.add_argument('--rebalance', choices=sorted(FREQUENCIES), default='annual')
+    parser.add_argument('--num-stocks', type=int, default=NUM_STOCKS)
+    parser.add_argument('--asof', action=argparse.BooleanOptionalAction, default=True,
+                        help='Use the latest SimFin statements published by each rebalance date '
+                             '(--no-asof: the previous fiscal year, as in the headline run)')
+    parser.add_argument('--processes', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--offline', action='store_true', help='Run entirely from the local cache')
+    parser.add_argument('--cache-dir', type=Path, default=CACHE_DIR)
+    parser.add_argument('--price-source', choices=['yfinance', 'simfin'], default='yfinance')
+    parser.add_argument('--output', type=Path, default=Path('walk-forward-results.csv'))
+    args = parser.parse_args()
+
+    data = load_backtest_data(SIMFIN_INCOME_FILE, DATA_START_DATE, END_DATE, args.cache_dir, offline=args.offline,
+                              price_source=args.price_source)
+    variant_list = variants(start_dates(args.first_start, END_DATE, args.min_years), args.all_anchors,
+                            args.rebalance)
+
+    print(f'\nRunning {len(variant_list)} start-date variants...')
+    start = time.perf_counter()
+    results = walk_forward(data, variant_list, args.rebalance, args.num_stocks, args.processes, args.asof)
+    elapsed = time.perf_counter() - start
+    print(f'  Done in {elapsed:.1f}s ({len(variant_list) / elapsed:.1f} variants/s)')
+
+    results.to_csv(args.output, index=False)
+    print(f'Results saved to {args.output}')
+    pd.set_option('display.float_format', '{:.2f}'.format)
+    pd.set_option('display.width', 200)
+    print(summarize(results).to_string())
+
+
+if __name__ == '__main__':
+    main()
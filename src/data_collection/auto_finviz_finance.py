@@ -5,21 +5,32 @@
 
 
 import os
+import sys
 import openpyxl
 from datetime import datetime
+from pathlib import Path
 import pandas as pd
-from finvizfinance.screener.valuation import Valuation
 
-foverview = Valuation()
-filters_dict = {
-    'Exchange': 'Any',
-    'Country': 'USA',
-    'Market Cap.': '+Large (over $10bln)',
-    'Industry': 'Stocks only (ex-Funds)',
-}
-foverview.set_filter(filters_dict=filters_dict)
+# Allow running as a plain script (python src/data_collection/auto_finviz_finance.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from src.data_collection.finviz_collector import PageCache, collect, large_cap_screen
+from src.data_collection.snapshot_store import SnapshotStore
 
-df = foverview.ScreenerView()
+foverview = large_cap_screen()
+
+# Pages are fetched concurrently and reused for PAGE_TTL seconds (see
+# finviz_collector.py); set to False for finvizfinance's one-by-one fetch
+CONCURRENT = True
+
+if CONCURRENT:
+    df = collect(foverview, cache=PageCache())
+else:
+    df = foverview.screener_view()
+
+# Keep the raw screen; history is queryable with SnapshotStore.as_of /
+# ticker_history
+captured = datetime.now()
+SnapshotStore('stock-data').append(df, captured)
 
 
 sorted_stocks = df.sort_values('Market Cap', ascending=False)
@@ -69,6 +80,17 @@ def save_excel_sheet(df, filepath, sheetname, index=False):
             df.to_excel(writer, sheet_name=sheetname, index=index)
 
 
+# The processed table goes to its own store (its columns differ from the raw
+# screen), captured at the same time as the raw snapshot
+SnapshotStore('stock-data/processed').append(joined_stocks, captured)
+
+# Appending a sheet rewrites the whole workbook, which gets slower with every
+# run; the Excel copy is optional, the snapshot stores are the primary output
+# (older workbooks hold this processed table and can be imported with
+# SnapshotStore('stock-data/processed').import_excel)
+SAVE_EXCEL = False
+
 sheetname = datetime.now().strftime("%m-%d-%Y--%H-%M")
 
-save_excel_sheet(joined_stocks, 'stock-data.xlsx', sheetname)
+if SAVE_EXCEL:
+    save_excel_sheet(joined_stocks, 'stock-data.xlsx', sheetname)
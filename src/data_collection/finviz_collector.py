@@ -0,0 +1,317 @@
+"""
+Concurrent, cached collection of Finviz screener pages.
+
+finvizfinance's screener_view() fetches a screen one page (20 rows) at a time,
+sleeping a second between pages, and parses every page again on every run.
+collect() fetches the first page (which tells how many pages there are) and
+then the remaining pages from a bounded thread pool, parsing each page in the
+calling thread as soon as it arrives while the others are still in flight:
+
+    screen = large_cap_screen()
+    df = collect(screen, cache=PageCache(PAGE_CACHE_DIR))
+
+The result has the same columns and rows as screen.screener_view(); the page
+count and table parsing are done here (page_count / parse_page) rather than
+through finvizfinance's private helpers, and pyproject.toml pins the
+finvizfinance versions this was tested with. Pages go through
+finvizfinance's shared session, so its retry / backoff on 429s and
+Cloudflare walls still applies; keep the pool small (WORKERS) to stay within
+Finviz's rate limits. With a PageCache, pages fetched less than ttl seconds
+ago are read from disk instead, so re-running a screen within a few minutes
+costs no requests at all.
+
+For offline runs, --record saves the raw HTML of every page of a screen, and
+FixtureServer serves a recorded screen on localhost with an optional delay
+per request to mimic Finviz's latency:
+
+    python -m src.data_collection.finviz_collector --record fixtures/large-cap
+    python -m src.data_collection.finviz_collector --fixtures fixtures/large-cap --latency 0.3 --compare
+"""
+import argparse
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import pandas as pd
+from bs4 import BeautifulSoup
+from finvizfinance.constants import NUMBER_COL, order_dict
+from finvizfinance.screener.valuation import Valuation
+from finvizfinance.util import fetch, number_convert
+
+WORKERS = 4
+PAGE_SIZE = 20  # rows per screener page (finvizfinance's Base.size)
+PAGE_TTL = 15 * 60  # seconds
+PAGE_CACHE_DIR = Path('stock-data') / 'pages'
+SCREEN_FILTERS = {
+    'Exchange': 'Any',
+    'Country': 'USA',
+    'Market Cap.': '+Large (over $10bln)',
+    'Industry': 'Stocks only (ex-Funds)',
+}
+
+
+def large_cap_screen(filters=SCREEN_FILTERS):
+    """The Valuation screen used by auto_finviz_finance.py."""
+    screen = Valuation()
+    screen.set_filter(filters_dict=dict(filters))
+    return screen
+
+
+class PageCache:
+    """Raw page HTML on disk, keyed by URL and query, fresh for ttl seconds."""
+
+    def __init__(self, root=PAGE_CACHE_DIR, ttl=PAGE_TTL):
+        self.root = Path(root)
+        self.ttl = ttl
+
+    def path(self, url, params):
+        query = urlencode(sorted((str(k), str(v)) for k, v in params.items()))
+        return self.root / f'{hashlib.sha1(f"{url}?{query}".encode()).hexdigest()}.html'
+
+    def get(self, url, params):
+        """Cached HTML, or None if missing or older than ttl."""
+        path = self.path(url, params)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl:
+                return None
+            return path.read_text(encoding='utf-8')
+        except FileNotFoundError:
+            return None
+
+    def put(self, url, params, html):
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.path(url, params)
+        # Write-then-rename so concurrent readers never see a partial page
+        tmp = path.with_suffix(f'.{threading.get_ident()}.tmp')
+        tmp.write_text(html, encoding='utf-8')
+        os.replace(tmp, path)
+
+
+def page_params(screen, page, order='Ticker', ascend=True):
+    """Query parameters of one page (1-based) of a finvizfinance screen."""
+    params = dict(screen.request_params)
+    params['o'] = ('' if ascend else '-') + order_dict[order]
+    if page > 1:
+        params['r'] = (page - 1) * PAGE_SIZE + 1
+    return params
+
+
+def page_count(soup):
+    """Number of pages of a screen, from the page selector (0: no rows)."""
+    select = soup.find(id='pageSelect')
+    return 0 if select is None else len(select.find_all('option'))
+
+
+def parse_page(soup, url=''):
+    """
+    Rows of one screener page as a DataFrame, converted like screener_view():
+    numeric columns (finvizfinance's NUMBER_COL) become floats, tickers come
+    from the cell's data-boxover-ticker attribute when present.
+    """
+    table = soup.find('table', class_='screener_table')
+    if table is None:
+        raise ValueError(f'No screener table in the page from {url}')
+    rows = table.find_all('tr')
+    header = [th.text.strip() for th in rows[0].find_all('th')][1:]
+    numeric = {i for i, name in enumerate(header) if name in NUMBER_COL}
+    records = []
+    for row in rows[1:]:
+        values = []
+        for i, col in enumerate(row.find_all('td')[1:len(header) + 1]):
+            if header[i] == 'Ticker' and col.has_attr('data-boxover-ticker'):
+                values.append(col['data-boxover-ticker'])
+            elif i in numeric:
+                values.append(number_convert(col.text))
+            else:
+                values.append(col.text)
+        values.extend([None] * (len(header) - len(values)))
+        records.append(values)
+    return pd.DataFrame(records, columns=header)
+
+
+def fetch_page(url, params, cache=None):
+    """HTML of one page, from the cache when it is fresh."""
+    html = cache.get(url, params) if cache is not None else None
+    if html is None:
+        html = fetch(url, params).text
+        if cache is not None:
+            cache.put(url, params, html)
+    return html
+
+
+def collect(screen, order='Ticker', ascend=True, workers=WORKERS, cache=None, url=None, on_page=None):
+    """
+    All rows of a finvizfinance screen as a DataFrame (None if it is empty).
+
+    url overrides the screener URL (e.g. a FixtureServer). on_page(page,
+    html) is called with the raw HTML of every page as it arrives.
+    """
+    url = url or screen.url
+    html = fetch_page(url, page_params(screen, 1, order, ascend), cache)
+    if on_page is not None:
+        on_page(1, html)
+    soup = BeautifulSoup(html, 'lxml')
+    pages = page_count(soup)
+    if pages == 0:
+        return None
+    frames = {1: parse_page(soup, url)}
+
+    with ThreadPoolExecutor(max(1, workers)) as pool:
+        futures = {pool.submit(fetch_page, url, page_params(screen, page, order, ascend), cache): page
+                   for page in range(2, pages + 1)}
+        try:
+            for future in as_completed(futures):
+                page, html = futures[future], future.result()
+                if on_page is not None:
+                    on_page(page, html)
+                frames[page] = parse_page(BeautifulSoup(html, 'lxml'), url)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    return pd.concat([frames[page] for page in sorted(frames)], ignore_index=True)
+
+
+def record(screen, directory, order='Ticker', ascend=True, workers=WORKERS, url=None):
+    """Save the raw HTML of every page of a screen as directory/page-NNN.html."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    def save(page, html):
+        (directory / f'page-{page:03d}.html').write_text(html, encoding='utf-8')
+
+    return collect(screen, order, ascend, workers, url=url, on_page=save)
+
+
+class FixtureServer:
+    """
+    Serves a recorded screen (see record()) on localhost, picking the page
+    from the 'r' query parameter. Every request waits latency seconds first.
+    requests counts the requests served and peak the most that were in
+    flight at once.
+
+        with FixtureServer('fixtures/large-cap', latency=0.3) as server:
+            df = collect(screen, url=server.url)
+    """
+
+    def __init__(self, directory, latency=0.0, port=0):
+        self.directory = Path(directory)
+        self.latency = latency
+        self.requests = 0
+        self.peak = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with fixture._lock:
+                    fixture.requests += 1
+                    fixture._in_flight += 1
+                    fixture.peak = max(fixture.peak, fixture._in_flight)
+                # Leave the count before responding: once the client has the
+                # page it may send its next request
+                try:
+                    if fixture.latency:
+                        time.sleep(fixture.latency)
+                finally:
+                    with fixture._lock:
+                        fixture._in_flight -= 1
+                query = parse_qs(urlparse(self.path).query)
+                page = (int(query.get('r', ['1'])[0]) - 1) // PAGE_SIZE + 1
+                path = fixture.directory / f'page-{page:03d}.html'
+                if not path.exists():
+                    self.send_error(404, f'No recorded page {page}')
+                    return
+                body = path.read_bytes()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/screener.ashx'
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Collect the Finviz large-cap screen concurrently')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='Concurrent page requests')
+    parser.add_argument('--ttl', type=float, default=PAGE_TTL, help='Seconds a cached page stays fresh')
+    parser.add_argument('--cache-dir', type=Path, default=PAGE_CACHE_DIR)
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--full-market', action='store_true', help='Drop the market-cap filter')
+    parser.add_argument('--record', type=Path, default=None, help='Save the raw pages to this directory')
+    parser.add_argument('--fixtures', type=Path, default=None,
+                        help='Collect from recorded pages served on localhost instead of Finviz')
+    parser.add_argument('--latency', type=float, default=0.0, help='Delay per fixture request (seconds)')
+    parser.add_argument('--compare', action='store_true',
+                        help="Also time finvizfinance's sequential screener_view() and check the rows match")
+    parser.add_argument('--sleep', type=float, default=1.0, help='Pause between pages of screener_view()')
+    args = parser.parse_args()
+
+    filters = dict(SCREEN_FILTERS)
+    if args.full_market:
+        filters['Market Cap.'] = 'Any'
+    screen = large_cap_screen(filters)
+
+    if args.record:
+        start = time.perf_counter()
+        df = record(screen, args.record, workers=args.workers)
+        print(f'Recorded {len(df)} rows to {args.record} in {time.perf_counter() - start:.1f}s')
+        return
+
+    server = FixtureServer(args.fixtures, args.latency).start() if args.fixtures else None
+    url = server.url if server else screen.url
+    cache = None if args.no_cache else PageCache(args.cache_dir, args.ttl)
+    try:
+        start = time.perf_counter()
+        df = collect(screen, workers=args.workers, cache=cache, url=url)
+        elapsed = time.perf_counter() - start
+        print(f'Collected {len(df)} rows with {args.workers} workers in {elapsed:.2f}s')
+
+        if args.compare:
+            # screener_view() always fetches from the class URL
+            screen.url = url
+            start = time.perf_counter()
+            sequential = screen.screener_view(verbose=0, sleep_sec=args.sleep)
+            baseline = time.perf_counter() - start
+            print(f'screener_view() took {baseline:.2f}s ({baseline / elapsed:.1f}x); '
+                  f'rows match: {sequential.equals(df)}')
+    finally:
+        if server:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Convert SimFin's us-shareprices-daily.csv into a PriceStore.
+
+The bulk file holds the full daily history of every ticker and is too big
+to load at once. It is streamed once in chunks (see simfin_reader); rows are
+appended to one binary staging file per ticker, and each staging file is
+then sorted and written out as memory-mapped .npy columns in the same layout
+the yfinance price cache uses. Peak memory is bounded by the chunk size and
+the longest single-ticker history, not by the size of the file.
+
+Tickers are normalized with universe.normalize_ticker (yfinance style,
+'.' -> '-') so they match the constituent lists. Usage:
+
+    python -m src.data_collection.simfin_prices [--csv PATH] [--output DIR]
+"""
+import argparse
+import shutil
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from src.backtest.config import CACHE_DIR, SIMFIN_DATA_DIR
+from src.backtest.price_cache import FIELDS, PriceStore
+from src.backtest.universe import normalize_ticker
+from src.data_collection.simfin_reader import DEFAULT_CHUNKSIZE, iter_simfin
+
+SIMFIN_PRICES_FILE = SIMFIN_DATA_DIR / 'us-shareprices-daily.csv'
+SIMFIN_PRICE_DIR = CACHE_DIR / 'simfin_prices'
+
+# SimFin column -> PriceStore field
+SIMFIN_FIELDS = {
+    'Open': 'Open',
+    'High': 'High',
+    'Low': 'Low',
+    'Close': 'Close',
+    'Adj. Close': 'Adj Close',
+    'Volume': 'Volume',
+}
+
+# One staged row: date plus every price field
+RECORD = np.dtype([('date', 'M8[D]')] + [(name, 'f8') for name in FIELDS.values()])
+
+
+def convert_simfin_prices(csv_path=SIMFIN_PRICES_FILE, root=SIMFIN_PRICE_DIR, tickers=None,
+                          chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Stream csv_path into a PriceStore at root and return the store.
+
+    tickers (SimFin symbols) restricts the conversion to part of the file.
+    Existing rows in the store are kept; rows from the file win on the same
+    date.
+    """
+    root = Path(root)
+    staging = root / '_staging'
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir(parents=True)
+
+    columns = ['Ticker', 'Date'] + list(SIMFIN_FIELDS)
+    rows = 0
+    for chunk in iter_simfin(csv_path, columns=columns, tickers=tickers, chunksize=chunksize):
+        chunk = chunk.dropna(subset=['Date'])
+        rows += len(chunk)
+        for ticker, group in chunk.groupby('Ticker', observed=True, sort=False):
+            ticker = normalize_ticker(ticker)
+            if ticker is None:
+                continue
+            records = np.empty(len(group), dtype=RECORD)
+            records['date'] = group['Date'].to_numpy().astype('datetime64[D]')
+            for column, field in SIMFIN_FIELDS.items():
+                records[FIELDS[field]] = group[column].to_numpy(dtype=np.float64)
+            with open(staging / f'{ticker}.bin', 'ab') as f:
+                records.tofile(f)
+        print(f'  Streamed {rows:,} rows...')
+
+    store = PriceStore(root)
+    for path in sorted(staging.glob('*.bin')):
+        records = np.fromfile(path, dtype=RECORD)
+        frame = pd.DataFrame({field: records[name] for field, name in FIELDS.items()},
+                             index=pd.DatetimeIndex(records['date']))
+        frame = frame[~frame.index.duplicated(keep='last')]
+        store.write(path.stem, frame)
+        dates = store.read(path.stem, fields=[]).index
+        store.mark_covered(path.stem, dates[0], dates[-1] + pd.Timedelta(days=1))
+        path.unlink()
+    store.flush()
+    staging.rmdir()
+    print(f'  Converted {rows:,} rows for {len(store.index):,} tickers into {root}')
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert SimFin's daily share prices into a price store")
+    parser.add_argument('--csv', type=Path, default=SIMFIN_PRICES_FILE)
+    parser.add_argument('--output', type=Path, default=SIMFIN_PRICE_DIR)
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args()
+
+    if not args.csv.exists():
+        raise FileNotFoundError(f'{args.csv} not found. Download it with simfin.load_shareprices() first.')
+    print(f'Converting {args.csv}...')
+    convert_simfin_prices(args.csv, args.output, chunksize=args.chunksize)
+
+
+if __name__ == '__main__':
+    main()
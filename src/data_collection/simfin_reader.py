@@ -0,0 +1,106 @@
+"""
+Chunked, typed reader for SimFin bulk CSV files (';'-separated).
+
+SimFin statement files have dozens of columns and hundreds of thousands of
+rows, while the backtests only use a handful of them. read_simfin() streams
+the file in chunks, parses only the requested columns with compact dtypes
+and applies ticker / fiscal-year filters inside the chunk loop, so peak
+memory is bounded by the chunk size plus the rows that are kept:
+
+    df = read_simfin(SIMFIN_INCOME_FILE, tickers=sp500, years=range(2019, 2025))
+
+Dtypes: Ticker and other text columns are categorical, Fiscal Year is
+int16, dates are datetime64 and all other columns float64 (or float32 with
+value_dtype='float32').
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+DEFAULT_COLUMNS = ('Ticker', 'Fiscal Year', 'Net Income', 'Shares (Diluted)')
+DEFAULT_CHUNKSIZE = 100_000
+SEP = ';'
+
+TEXT_COLUMNS = {'Ticker', 'Currency', 'Fiscal Period', 'Company Name', 'IndustryId', 'ISIN', 'Market'}
+DATE_COLUMNS = {'Report Date', 'Publish Date', 'Restated Date', 'Date'}
+INT_COLUMNS = {'SimFinId': 'Int64', 'Fiscal Year': 'float64'}  # Fiscal Year -> int16 after NaN rows are dropped
+
+
+def read_columns(path):
+    """Column names of a SimFin CSV (reads the header only)."""
+    return list(pd.read_csv(path, sep=SEP, nrows=0).columns)
+
+
+def column_dtypes(columns, value_dtype='float64'):
+    """read_csv dtypes for SimFin columns (dates are handled by parse_dates)."""
+    dtypes = {}
+    for col in columns:
+        if col in TEXT_COLUMNS:
+            dtypes[col] = 'category'
+        elif col in INT_COLUMNS:
+            dtypes[col] = INT_COLUMNS[col]
+        elif col not in DATE_COLUMNS:
+            dtypes[col] = value_dtype
+    return dtypes
+
+
+def iter_simfin(path, columns=DEFAULT_COLUMNS, tickers=None, years=None, value_dtype='float64',
+                chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Yield filtered, typed chunks of a SimFin CSV.
+
+    columns=None reads every column. tickers / years restrict the rows kept;
+    filter columns are read even if not requested and dropped again. Rows
+    without a fiscal year are always dropped, since it is stored as int16.
+    """
+    all_columns = read_columns(path)
+    if columns is None:
+        columns = all_columns
+    columns = list(columns)
+    missing = [col for col in columns if col not in all_columns]
+    if missing:
+        raise KeyError(f'{path} has no columns {missing}')
+
+    usecols = list(columns)
+    if tickers is not None and 'Ticker' not in usecols:
+        usecols.append('Ticker')
+    if 'Fiscal Year' in all_columns and 'Fiscal Year' not in usecols and years is not None:
+        usecols.append('Fiscal Year')
+    tickers = None if tickers is None else pd.Index(list(tickers))
+    years = None if years is None else np.asarray(list(years), dtype=np.int64)
+
+    reader = pd.read_csv(path, sep=SEP, usecols=usecols, dtype=column_dtypes(usecols, value_dtype),
+                         parse_dates=[col for col in usecols if col in DATE_COLUMNS], chunksize=chunksize)
+    for chunk in reader:
+        keep = np.ones(len(chunk), dtype=bool)
+        if tickers is not None:
+            keep &= chunk['Ticker'].isin(tickers).to_numpy()
+        if 'Fiscal Year' in chunk:
+            fiscal_year = chunk['Fiscal Year'].to_numpy()
+            keep &= ~np.isnan(fiscal_year)
+            if years is not None:
+                keep &= np.isin(fiscal_year, years)
+        chunk = chunk[keep]
+        if 'Fiscal Year' in chunk:
+            chunk = chunk.astype({'Fiscal Year': np.int16})
+        for col in chunk.select_dtypes('category').columns:
+            chunk[col] = chunk[col].cat.remove_unused_categories()
+        yield chunk[columns]
+
+
+def read_simfin(path, columns=DEFAULT_COLUMNS, tickers=None, years=None, value_dtype='float64',
+                chunksize=DEFAULT_CHUNKSIZE):
+    """Read a SimFin CSV into one DataFrame (see iter_simfin for the arguments)."""
+    chunks = list(iter_simfin(path, columns, tickers, years, value_dtype, chunksize))
+    if not chunks:
+        return pd.DataFrame(columns=list(columns if columns is not None else read_columns(path)))
+    if len(chunks) == 1:
+        return chunks[0].reset_index(drop=True)
+
+    # Categories differ per chunk; union them so the result stays categorical
+    categorical = {col: union_categoricals([chunk[col] for chunk in chunks])
+                   for col in chunks[0].select_dtypes('category').columns}
+    df = pd.concat([chunk.drop(columns=list(categorical)) for chunk in chunks], ignore_index=True)
+    for col, values in categorical.items():
+        df[col] = values
+    return df[chunks[0].columns]
@@ -0,0 +1,200 @@
+"""
+Append-only store of Finviz screener snapshots.
+
+Every screen (the raw ScreenerView() DataFrame) is written as its own
+zstd-compressed Parquet partition, keyed by capture time, and recorded as one
+line in an append-only JSON-lines index:
+
+    <root>/parts/<YYYYMMDDTHHMMSS>.parquet
+    <root>/index.jsonl    {"captured": ..., "file": ..., "rows": ..., "tickers": [...]}
+
+Writing a snapshot creates one file and appends one line, so it takes the
+same time however much history has accumulated. The index lists the tickers
+of every capture, which answers the two common queries without opening
+unrelated partitions:
+
+    store = SnapshotStore('stock-data')
+    store.append(df)                     # df from ScreenerView()
+    store.as_of('2025-06-30')            # the screen as it was on that date
+    store.ticker_history('AAPL')         # one row per capture containing AAPL
+
+Captures may have different columns (Finviz adds fields, imported workbook
+sheets have their own layout); reads spanning several captures return the
+union of their columns, with missing values where a capture lacks one.
+
+The partition is written before its index line, so an interrupted write
+leaves at most an orphaned file that is never read.
+"""
+import json
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from datetime import datetime
+from pathlib import Path
+
+COMPRESSION = 'zstd'
+TICKER_COLUMN = 'Ticker'
+
+
+class SnapshotStore:
+    """Screener snapshots under root (see module docstring)."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.part_dir = self.root / 'parts'
+        self.index_file = self.root / 'index.jsonl'
+        self._index = None
+
+    # -------------------------------------------------------------------------
+    # Index
+    # -------------------------------------------------------------------------
+
+    def index(self):
+        """Captures as a DataFrame (captured, file, rows, tickers), oldest first."""
+        if self._index is None:
+            records = []
+            if self.index_file.exists():
+                with open(self.index_file) as f:
+                    records = [json.loads(line) for line in f if line.strip()]
+            index = pd.DataFrame(records, columns=['captured', 'file', 'rows', 'tickers'])
+            index['captured'] = pd.to_datetime(index['captured'])
+            # Imports may add older captures after newer ones
+            self._index = index.sort_values('captured', kind='stable').reset_index(drop=True)
+        return self._index
+
+    def captures(self):
+        """Capture times, oldest first."""
+        return list(self.index()['captured'])
+
+    # -------------------------------------------------------------------------
+    # Writing
+    # -------------------------------------------------------------------------
+
+    def append(self, df, captured=None):
+        """Write df as a new snapshot captured at `captured` (default: now) and return its path."""
+        captured = pd.Timestamp(captured or datetime.now()).floor('s')
+        self.part_dir.mkdir(parents=True, exist_ok=True)
+        stem = captured.strftime('%Y%m%dT%H%M%S')
+        path = self.part_dir / f'{stem}.parquet'
+        suffix = 1
+        while path.exists():
+            path = self.part_dir / f'{stem}-{suffix}.parquet'
+            suffix += 1
+
+        df = df.reset_index(drop=True)
+        df.columns = [str(col) for col in df.columns]
+        df.to_parquet(path, compression=COMPRESSION, index=False)
+
+        tickers = sorted(df[TICKER_COLUMN].dropna().astype(str).unique()) if TICKER_COLUMN in df else []
+        record = {'captured': captured.isoformat(), 'file': str(path.relative_to(self.root)),
+                  'rows': len(df), 'tickers': tickers}
+        with open(self.index_file, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+        self._index = None
+        return path
+
+    def import_excel(self, path, time_format='%m-%d-%Y--%H-%M'):
+        """
+        Import the sheets of a workbook written by save_excel_sheet (one
+        sheet per run, named by capture time). Returns the number imported.
+        Those sheets hold the processed table of auto_finviz_finance.py, so
+        import them into the processed store, not the raw screens.
+        """
+        sheets = pd.read_excel(path, sheet_name=None)
+        imported = 0
+        for name, df in sheets.items():
+            try:
+                captured = datetime.strptime(name, time_format)
+            except ValueError:
+                continue
+            self.append(df, captured)
+            imported += 1
+        return imported
+
+    # -------------------------------------------------------------------------
+    # Reading
+    # -------------------------------------------------------------------------
+
+    def _read(self, entry):
+        df = pd.read_parquet(self.root / entry['file'])
+        df.insert(0, 'captured', entry['captured'])
+        return df
+
+    def as_of(self, date):
+        """The latest snapshot captured on or before date (None if there is none)."""
+        index = self.index()
+        pos = int(index['captured'].searchsorted(pd.Timestamp(date), side='right')) - 1
+        if pos < 0:
+            return None
+        return self._read(index.iloc[pos])
+
+    def latest(self):
+        """The most recent snapshot (None if the store is empty)."""
+        index = self.index()
+        return self._read(index.iloc[-1]) if len(index) else None
+
+    def read(self, start=None, end=None):
+        """All snapshots captured in [start, end] stacked, with a 'captured' column."""
+        index = self.index()
+        keep = pd.Series(True, index=index.index)
+        if start is not None:
+            keep &= index['captured'] >= pd.Timestamp(start)
+        if end is not None:
+            keep &= index['captured'] <= pd.Timestamp(end)
+        return self._scan(index[keep])
+
+    def ticker_history(self, ticker, start=None, end=None):
+        """
+        The rows for one ticker from every snapshot that contains it, oldest
+        first. Partitions without the ticker (per the index) are not opened.
+        """
+        index = self.index()
+        keep = index['tickers'].map(lambda tickers: ticker in tickers)
+        if start is not None:
+            keep &= index['captured'] >= pd.Timestamp(start)
+        if end is not None:
+            keep &= index['captured'] <= pd.Timestamp(end)
+        return self._scan(index[keep], ticker)
+
+    def _scan(self, entries, ticker=None):
+        """
+        Rows of several partitions (only those of ticker, if given) with a
+        'captured' column, in one multi-threaded scan over the union of the
+        partitions' columns.
+        """
+        if not len(entries):
+            return pd.DataFrame(columns=['captured'])
+        paths = [str(self.root / name) for name in entries['file']]
+        captured = dict(zip(paths, entries['captured']))
+        try:
+            # Columns can differ between captures; numeric types are widened
+            schema = pa.unify_schemas([pq.read_schema(path) for path in paths], promote_options='permissive')
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            schema = None
+
+        frames = []
+        if schema is None:
+            # Types that cannot be reconciled (e.g. text vs numbers): pandas per partition
+            for path in paths:
+                df = pd.read_parquet(path)
+                if ticker is not None:
+                    df = df[df[TICKER_COLUMN] == ticker] if TICKER_COLUMN in df else df.iloc[:0]
+                if len(df):
+                    df.insert(0, 'captured', captured[path])
+                    frames.append(df)
+        else:
+            filter = None
+            if ticker is not None:
+                if TICKER_COLUMN not in schema.names:
+                    return pd.DataFrame(columns=['captured'])
+                filter = ds.field(TICKER_COLUMN) == ticker
+            dataset = ds.dataset(paths, schema=schema, format='parquet')
+            for tagged in dataset.scanner(filter=filter).scan_batches():
+                if tagged.record_batch.num_rows:
+                    df = tagged.record_batch.to_pandas()
+                    df.insert(0, 'captured', captured[tagged.fragment.path])
+                    frames.append(df)
+        if not frames:
+            return pd.DataFrame(columns=['captured'])
+        return pd.concat(frames, ignore_index=True).sort_values('captured', kind='stable', ignore_index=True)
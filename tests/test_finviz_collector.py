@@ -0,0 +1,107 @@
+"""
+Offline tests of the concurrent Finviz collector against FixtureServer.
+
+A small screen in Finviz's page layout is generated, served locally and
+recorded with record(); the recording is then served again and collect() is
+checked against finvizfinance's own screener_view() on the same pages.
+
+    python -m unittest discover -s tests
+"""
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.data_collection.finviz_collector import (
+    PAGE_SIZE, FixtureServer, PageCache, collect, large_cap_screen, record,
+)
+
+HEADER = ['No.', 'Ticker', 'Company', 'Market Cap', 'P/E', 'Fwd P/E', 'EPS past 5Y', 'Price', 'Change', 'Volume']
+ROWS = 130  # 7 pages, the last one partial
+LATENCY = 0.1
+
+
+def screener_pages(rows=ROWS):
+    """HTML pages of a synthetic screen, as Finviz lays them out."""
+    pages = -(-rows // PAGE_SIZE)
+    options = ''.join(f'<option value="{(p - 1) * PAGE_SIZE + 1}">Page {p}</option>' for p in range(1, pages + 1))
+    head = '<tr>' + ''.join(f'<th>{name}</th>' for name in HEADER) + '</tr>'
+    html = []
+    for page in range(1, pages + 1):
+        body = []
+        for i in range((page - 1) * PAGE_SIZE, min(page * PAGE_SIZE, rows)):
+            ticker = f'T{i:03d}'
+            cells = [str(i + 1), f'<a>{ticker}</a><a>{ticker}</a>', f'Company {i}', f'{10 + i * 1.5:.2f}B',
+                     '-' if i % 17 == 0 else f'{5 + i % 40:.2f}', f'{4 + i % 30:.2f}', f'{(i % 25) - 5:.2f}%',
+                     f'{20 + i:.2f}', f'{(i % 7) - 3:.2f}%', f'{1000 + i * 37:,}']
+            tds = ''.join(f'<td data-boxover-ticker="{ticker}">{c}</td>' if k == 1 else f'<td>{c}</td>'
+                          for k, c in enumerate(cells))
+            body.append(f'<tr>{tds}</tr>')
+        html.append(f'<html><body><select id="pageSelect">{options}</select>'
+                    f'<table class="screener_table">{head}{"".join(body)}</table></body></html>')
+    return html
+
+
+class CollectorTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        root = Path(cls.tmp.name)
+        source = root / 'source'
+        source.mkdir()
+        for page, html in enumerate(screener_pages(), start=1):
+            (source / f'page-{page:03d}.html').write_text(html, encoding='utf-8')
+
+        # Record the screen through the collector, then serve the recording
+        cls.fixtures = root / 'recorded'
+        with FixtureServer(source) as server:
+            record(large_cap_screen(), cls.fixtures, workers=4, url=server.url)
+        cls.server = FixtureServer(cls.fixtures, latency=LATENCY).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        cls.tmp.cleanup()
+
+    def test_recorded_every_page(self):
+        pages = sorted(path.name for path in self.fixtures.glob('page-*.html'))
+        self.assertEqual(pages, [f'page-{p:03d}.html' for p in range(1, -(-ROWS // PAGE_SIZE) + 1)])
+
+    def test_matches_screener_view(self):
+        df = collect(large_cap_screen(), workers=4, url=self.server.url)
+        screen = large_cap_screen()
+        screen.url = self.server.url
+        expected = screen.screener_view(verbose=0, sleep_sec=0)
+        self.assertEqual(len(df), ROWS)
+        self.assertEqual(list(df['Ticker'][:2]), ['T000', 'T001'])
+        self.assertTrue(df.equals(expected))
+
+    def test_requests_overlap_up_to_workers(self):
+        self.server.peak = 0
+        collect(large_cap_screen(), workers=1, url=self.server.url)
+        self.assertEqual(self.server.peak, 1)
+
+        # Pages after the first are requested concurrently, never more than workers at once
+        self.server.peak = 0
+        collect(large_cap_screen(), workers=3, url=self.server.url)
+        self.assertGreater(self.server.peak, 1)
+        self.assertLessEqual(self.server.peak, 3)
+
+    def test_cache_reuses_fresh_pages(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = PageCache(cache_dir, ttl=60)
+            first = collect(large_cap_screen(), cache=cache, url=self.server.url)
+            requests = self.server.requests
+            second = collect(large_cap_screen(), cache=cache, url=self.server.url)
+            self.assertEqual(self.server.requests, requests)
+            self.assertTrue(first.equals(second))
+
+            cache.ttl = 0
+            collect(large_cap_screen(), cache=cache, url=self.server.url)
+            self.assertEqual(self.server.requests, requests + -(-ROWS // PAGE_SIZE))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+Vectorized metrics against calc_metrics on the three V2 portfolios.
+
+A synthetic price matrix is run through the engine with two selection rules
+standing in for Value-Only and Multi-Factor, plus the SPY dollar-cost
+averaging benchmark, so the portfolios have the same shape as the real ones
+(contributions on every rebalance, empty days before the first one).
+
+    python -m unittest discover -s tests
+"""
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.backtest import engine
+from src.backtest.metrics import calc_metrics, compare_portfolios, metrics_matrix, portfolio_matrix
+
+REBALANCE_DATES = ['2021-04-01', '2022-04-01', '2023-04-03', '2024-04-01', '2025-04-01']
+TICKERS = [f'T{i:02d}' for i in range(30)]
+
+
+def synthetic_prices(seed=7):
+    """Random-walk closes for TICKERS and SPY on business days 2020-2025."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2020-01-02', '2025-09-30')
+    returns = rng.normal(0.0004, 0.015, size=(len(dates), len(TICKERS) + 1))
+    prices = 50 * np.exp(np.cumsum(returns, axis=0))
+    return pd.DataFrame(prices, index=dates, columns=TICKERS + ['SPY'])
+
+
+def picks(rank):
+    """Selection rule: the 10 tickers ranked first by rank(row of closes)."""
+    def select(prices_df, date, num_stocks):
+        row = prices_df.loc[date, TICKERS]
+        return [{'ticker': t, 'price': row[t]} for t in rank(row).index[:num_stocks]]
+    return select
+
+
+def v2_portfolios():
+    prices = synthetic_prices()
+    results = engine.simulate_many(
+        {'Value-Only': picks(lambda row: row.sort_values()),
+         'Multi-Factor': picks(lambda row: row.sort_values(ascending=False))},
+        prices[TICKERS], REBALANCE_DATES, num_stocks=10, verbose=False, benchmarks={'S&P 500 (SPY)': prices['SPY']})
+    return {name: portfolio for name, (portfolio, _) in results.items()}, prices['SPY']
+
+
+class MetricsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.portfolios, cls.spy = v2_portfolios()
+
+    def assert_matches_calc_metrics(self, table):
+        for name, portfolio in self.portfolios.items():
+            expected = calc_metrics(portfolio, name)
+            row = table.loc[name]
+            for key, value in expected.items():
+                if key == 'name':
+                    self.assertEqual(row[key], value)
+                else:
+                    self.assertAlmostEqual(row[key], value, delta=1e-9 * max(1.0, abs(value)), msg=f'{name} {key}')
+
+    def test_metrics_matrix_matches_calc_metrics(self):
+        values, invested = portfolio_matrix(self.portfolios)
+        self.assert_matches_calc_metrics(metrics_matrix(values, invested).set_index('name', drop=False))
+
+    def test_compare_portfolios_matches_calc_metrics(self):
+        self.assert_matches_calc_metrics(compare_portfolios(self.portfolios, benchmark=self.spy))
+
+    def test_relative_to_benchmark(self):
+        table = compare_portfolios(self.portfolios, benchmark=self.spy)
+        spy = table.loc['S&P 500 (SPY)']
+        # The benchmark tracks itself: no tracking error, no information ratio
+        self.assertLess(spy['tracking_error'], 1e-8)
+        self.assertTrue(np.isnan(spy['information_ratio']))
+        self.assertAlmostEqual(spy['beta'], 1.0, places=9)
+        for name in ('Value-Only', 'Multi-Factor'):
+            self.assertGreater(table.loc[name, 'tracking_error'], 1.0)
+            self.assertTrue(np.isfinite(table.loc[name, 'information_ratio']))
+            self.assertTrue(np.isfinite(table.loc[name, 'rolling_sharpe_min']))
+            self.assertLessEqual(table.loc[name, 'max_dd'], table.loc[name, 'rolling_max_dd'])
+
+
+if __name__ == '__main__':
+    unittest.main()